@@ -0,0 +1,120 @@
+import os
+from typing import Dict, List
+from pydantic import BaseSettings
+
+class Settings(BaseSettings):
+    # Theme storage backend: "sqlite" (durable) or "memory" (per-process)
+    THEME_STORE: str = "sqlite"
+    THEME_DB_PATH: str = os.path.join("data", "themes.db")
+    # How often an idle worker checks for theme writes made by other workers sharing the SQLite store, to notify
+    # its event subscribers; 0 disables. Requests check on every read and write regardless (a few microseconds),
+    # so this only bounds how late other workers' changes reach idle subscribers
+    THEME_SYNC_INTERVAL_SECONDS: float = 0.5
+
+    # Versions kept per theme for listing, diffing and rollback, stored next to the themes
+    THEME_VERSION_HISTORY: int = 100
+
+    # Theme change stream
+    EVENTS_QUEUE_SIZE: int = 16
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+
+    # Background theme builds
+    JOB_CONCURRENCY: int = 2
+    JOB_HISTORY_SIZE: int = 500
+
+    # Outbound HTTP connection pool (Figma API and asset downloads)
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 10
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_KEEPALIVE_SECONDS: float = 30.0
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_SECONDS: float = 0.5
+    HTTP_BACKOFF_MAX_SECONDS: float = 30.0
+
+    # On-disk cache of Figma file documents
+    FIGMA_CACHE_ENABLED: bool = True
+    FIGMA_CACHE_DIR: str = os.path.join("data", "figma_cache")
+    FIGMA_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # Serve Figma documents only from the cache, never from the network
+    FIGMA_OFFLINE: bool = False
+    # Parse Figma documents incrementally from the byte stream (requires ijson), on a worker thread.
+    # Holds a few MiB instead of the whole document tree, at about twice the CPU of json.loads
+    FIGMA_STREAMING: bool = True
+    # Fetch only component nodes: a shallow file fetch, then batched nodes?ids= requests
+    FIGMA_SELECTIVE_FETCH: bool = False
+    FIGMA_SHALLOW_DEPTH: int = 2
+    FIGMA_NODE_BATCH_SIZE: int = 50
+    FIGMA_NODE_CONCURRENCY: int = 4
+
+    # Theme asset pipeline
+    ASSETS_DIR: str = os.path.join("public", "assets")
+    # Theme-to-asset reference counts used to garbage-collect shared assets
+    ASSET_INDEX_PATH: str = os.path.join("data", "assets.db")
+    ASSET_CONCURRENCY: int = 16
+    ASSET_PER_HOST_CONCURRENCY: int = 6
+    # "fail_fast" aborts a build on the first failed asset, "best_effort" keeps the source URL
+    ASSET_FAILURE_POLICY: str = "fail_fast"
+    # Image decode/resize/encode runs in a "process" or "thread" pool, or "inline" on the event loop
+    ASSET_EXECUTOR: str = "process"
+    # Pool size; 0 uses the CPU count
+    ASSET_WORKERS: int = 0
+    # Downloaded images allowed to wait for a free worker before downloads are held back
+    ASSET_PROCESS_QUEUE_SIZE: int = 8
+    # Variant formats ("webp", "avif"); PNG is added only for images that need lossless encoding
+    ASSET_FORMATS: List[str] = ["webp"]
+    # Responsive width ladder; each image also keeps its own width, capped at 2000px
+    ASSET_WIDTHS: List[int] = [480, 960, 1440]
+    ASSET_WEBP_QUALITY: int = 80
+    ASSET_AVIF_QUALITY: int = 60
+    # Download limits: images over these sizes are refused, by header before decoding when possible
+    ASSET_MAX_BYTES: int = 32 * 1024 * 1024
+    ASSET_MAX_PIXELS: int = 40_000_000
+    # Bodies larger than this are streamed to a temporary file instead of held in memory
+    ASSET_SPILL_BYTES: int = 1024 * 1024
+    ASSET_CHUNK_SIZE: int = 64 * 1024
+    # Directory for spilled downloads; empty uses the system temporary directory
+    ASSET_SPILL_DIR: str = ""
+
+    # Static asset serving: files up to STATIC_CACHE_MAX_FILE_BYTES are held in memory
+    STATIC_CACHE_MAX_FILE_BYTES: int = 256 * 1024
+    STATIC_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # How often a cached file is checked for changes or garbage collection
+    STATIC_REVALIDATE_SECONDS: float = 5.0
+    STATIC_CHUNK_SIZE: int = 64 * 1024
+
+    # Compression of JSON and text API responses for clients sending Accept-Encoding: br or gzip
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_BROTLI_QUALITY: int = 6
+    COMPRESSION_GZIP_LEVEL: int = 6
+
+    # Logging: records are queued by the caller and written by a background thread
+    LOG_LEVEL: str = "INFO"
+    # Per-logger levels, e.g. {"app.utils.figma": "DEBUG"}
+    LOG_LEVELS: Dict[str, str] = {}
+    # "json" writes one structured object per line, "text" the plain format
+    LOG_FORMAT: str = "json"
+    # Records waiting to be written; further records are dropped and counted rather than blocking
+    LOG_QUEUE_SIZE: int = 10000
+    # Fraction of requests whose access line and sub-WARNING records are kept, by longest matching path prefix
+    LOG_SAMPLE_RATES: Dict[str, float] = {"/health": 0.01, "/api/themes/current": 0.1, "/assets/": 0.01}
+    # Requests slower than this are always logged, as are server errors
+    LOG_SLOW_REQUEST_MS: float = 1000.0
+    # Allow PUT /api/logging to change levels and sample rates; it is unauthenticated, so keep it off when exposed
+    LOG_RUNTIME_CHANGES: bool = False
+
+    # Theme validation results memoized by document hash
+    VALIDATION_CACHE_SIZE: int = 4096
+    # Longest NDJSON line accepted by the batch validation endpoint
+    VALIDATION_MAX_LINE_BYTES: int = 1024 * 1024
+
+    # On-demand request profiling, enabled by setting a token sent as X-Profile or ?profile=
+    PROFILE_TOKEN: str = ""
+    PROFILE_INTERVAL_SECONDS: float = 0.005
+    # Sampling stops after this long even if the request or its job is still running
+    PROFILE_MAX_SECONDS: float = 60.0
+    # One profile runs at a time; this caps how many start per hour
+    PROFILE_MAX_PER_HOUR: int = 12
+    PROFILE_DIR: str = os.path.join("data", "profiles")
+    PROFILE_HISTORY: int = 20
+
+settings = Settings()
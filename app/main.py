@@ -1,22 +1,60 @@
+from .utils.startup_timing import StartupTimingMiddleware, startup_timer
 import traceback
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from .routers import themes
+from fastapi.responses import JSONResponse, Response
+from .routers import themes, jobs, logs, profiles, validation
+from .services.registry import registry
 from .services.theme_service import ThemeService
+from .utils.http_client import HTTPClient
+from .utils.static_assets import StaticAssets
+from .utils.structured_logging import RequestLoggingMiddleware, log_manager
+from .utils.metrics import CONTENT_TYPE, MetricsMiddleware, metrics
+from .utils.profiler import ProfilingMiddleware
+from .utils.compression import CompressionMiddleware
+from .config import settings
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Records are queued here and written by a background thread
+log_manager.configure()
 logger = logging.getLogger(__name__)
+startup_timer.mark("import")
+
+metrics.gauge("log_queue_depth", "Log records waiting for the writer thread").set_function(
+    lambda: log_manager.state()["queue"]["size"]
+)
+metrics.counter("log_records_dropped_total", "Log records dropped because the queue was full").set_function(
+    lambda: log_manager.state()["queue"]["dropped"]
+)
+
+registry.register("http_client", HTTPClient)
+registry.register("theme_service", lambda: ThemeService(http_client=registry.get("http_client")))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build long-lived services once and share them across requests
+    startup_timer.mark("server start")
+    try:
+        await registry.startup()
+        for name, seconds in registry.build_times.items():
+            startup_timer.service_started(name, seconds)
+        startup_timer.mark("service startup")
+        logger.info("Theme service initialized successfully")
+    except Exception as e:
+        logger.exception("Failed to initialize theme service: %s", e)
+        raise
+    app.state.services = registry
+    try:
+        yield
+    finally:
+        await registry.shutdown()
 
 app = FastAPI(
     title="JARVIS Theme Service",
     description="Service for managing JARVIS UI themes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -28,25 +66,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize theme service
-try:
-    theme_service = ThemeService()
-    logger.info("Theme service initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize theme service: {str(e)}")
-    logger.error(traceback.format_exc())
-    raise
-
 # Include routers
 app.include_router(themes.router, prefix="/api/themes", tags=["themes"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(logs.router, prefix="/api/logging", tags=["logging"])
+app.include_router(profiles.router, prefix="/api/profiles", tags=["profiles"])
+app.include_router(validation.router, prefix="/api/validate", tags=["validation"])
+
+# Serve the content-addressed asset store at the paths the theme API returns
+app.mount("/assets", StaticAssets(settings.ASSETS_DIR), name="assets")
+
+# Innermost, so logging and metrics see the compressed response that was sent
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestLoggingMiddleware, manager=log_manager)
+
+# Outermost, so the first response is timed as the client sees it
+app.add_middleware(StartupTimingMiddleware, timer=startup_timer)
+startup_timer.mark("app setup")
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception: {str(exc)}")
-    logger.error(traceback.format_exc())
+    # Formatted once for both the log and the response
+    formatted = "".join(traceback.format_exception(exc))
+    logger.error("Unhandled exception: %s\n%s", exc, formatted)
     return JSONResponse(
         status_code=500,
-        content={"detail": str(exc), "traceback": traceback.format_exc()}
+        content={"detail": str(exc), "traceback": formatted}
     )
 
 @app.get("/")
@@ -63,4 +110,14 @@ async def health_check():
         "status": "healthy",
         "service": "theme_service",
         "version": "1.0.0"
-    } 
\ No newline at end of file
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Expose request latency, Figma, cache, asset pipeline and queue metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/health/startup")
+async def startup_report():
+    """Report how long this worker took to import, start services and first respond"""
+    return startup_timer.report() 
\ No newline at end of file
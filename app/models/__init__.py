@@ -1 +1,2 @@
-from .theme import Theme, ThemeCreate, ThemeUpdate, ThemeAsset 
\ No newline at end of file
+from .theme import Theme, ThemeCreate, ThemeUpdate, ThemeAsset
+from .job import Job
@@ -0,0 +1,32 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+from datetime import datetime
+
+JOB_STAGES = ["fetch", "parse", "assets", "store"]
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str = "queued"
+    stage: Optional[str] = None
+    stages: Dict[str, str] = Field(default_factory=lambda: {stage: "pending" for stage in JOB_STAGES})
+    assets_done: int = 0
+    assets_total: int = 0
+    theme_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    def enter_stage(self, stage: str) -> None:
+        """Mark the previous stage complete and start the given one"""
+        if self.stage is not None:
+            self.stages[self.stage] = "done"
+        self.stage = stage
+        self.stages[stage] = "running"
+        self.updated_at = datetime.utcnow()
+
+    def asset_progress(self, done: int, total: int) -> None:
+        """Record how many of the theme's assets have been processed"""
+        self.assets_done = done
+        self.assets_total = total
+        self.updated_at = datetime.utcnow()
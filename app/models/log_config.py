@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class LoggingUpdate(BaseModel):
+    level: Optional[str] = None
+    # Logger name to level; null returns a logger to its parent's level
+    levels: Optional[Dict[str, Optional[str]]] = None
+    # Merged into the current rates by path prefix
+    sample_rates: Optional[Dict[str, float]] = None
+    slow_request_ms: Optional[float] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Literal, Optional, Any
 from datetime import datetime
 
 class ThemeBase(BaseModel):
@@ -14,6 +14,20 @@ class ThemeUpdate(ThemeBase):
     figma_url: Optional[HttpUrl] = None
     components: Optional[Dict[str, Any]] = None
 
+class PatchOperation(BaseModel):
+    """One RFC 6902 operation; paths are JSON pointers into the theme's components"""
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str
+    value: Any = None
+    from_: Optional[str] = Field(None, alias="from")
+
+class ThemePatchResult(BaseModel):
+    id: str
+    etag: str
+    updated_at: datetime
+    # The applied change as an RFC 6902 patch of the components, one entry per changed path
+    changes: List[Dict[str, Any]]
+
 class Theme(ThemeBase):
     id: str
     figma_url: str = ""
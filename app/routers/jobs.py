@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Depends
+from ..models.job import Job
+from ..services.theme_service import ThemeService
+from .themes import get_theme_service
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: str, theme_service: ThemeService = Depends(get_theme_service)):
+    """Get the progress of a queued theme build"""
+    return await theme_service.get_job(job_id)
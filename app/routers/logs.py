@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+from ..config import settings
+from ..models.log_config import LoggingUpdate
+from ..utils.structured_logging import log_manager
+
+router = APIRouter()
+
+@router.get("/")
+async def get_logging():
+    """Get the log levels, per-route sample rates and queue state of this worker"""
+    return log_manager.state()
+
+# The endpoint is unauthenticated, so changing levels at runtime must be switched on explicitly
+def require_runtime_changes() -> None:
+    if not settings.LOG_RUNTIME_CHANGES:
+        raise HTTPException(status_code=403, detail="Runtime logging changes are disabled")
+
+@router.put("/", dependencies=[Depends(require_runtime_changes)])
+async def update_logging(update: LoggingUpdate):
+    """Change log levels and sample rates of this worker without a restart"""
+    try:
+        if update.level is not None or update.levels:
+            log_manager.set_levels(update.level, update.levels)
+        if update.sample_rates:
+            log_manager.set_sample_rates({**log_manager.sample_rates, **update.sample_rates})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if update.slow_request_ms is not None:
+        log_manager.slow_request_ms = update.slow_request_ms
+    return log_manager.state()
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from ..config import settings
+from ..utils.profiler import authorized, collapsed_stacks, profile_store
+
+router = APIRouter()
+
+# Profiles expose code paths, so reading them takes the same token as recording them
+def require_profile_token(x_profile: Optional[str] = Header(None)) -> None:
+    if not settings.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not authorized(x_profile):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@router.get("/", dependencies=[Depends(require_profile_token)])
+async def list_profiles():
+    """List stored request profiles, newest first"""
+    return profile_store.list()
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profile_token)])
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    """Get a profile as speedscope JSON, or as collapsed stacks for flamegraph.pl"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(profile))
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="Unknown profile format")
+    return profile
@@ -1,34 +1,170 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import List, Optional
-from ..models.theme import Theme, ThemeCreate, ThemeUpdate
+from ..config import settings
+from ..models.theme import PatchOperation, Theme, ThemeCreate, ThemePatchResult, ThemeUpdate
+from ..models.job import Job
+from ..services.registry import registry
 from ..services.theme_service import ThemeService
+from ..utils.compression import compressed_body_response, compressed_json_response
+from ..utils.static_assets import IMMUTABLE_CACHE_CONTROL
 
 router = APIRouter()
 
-# Create a dependency to get the theme service
-def get_theme_service():
-    return ThemeService()
+# Dependency returning the process-wide theme service
+def get_theme_service() -> ThemeService:
+    return registry.get("theme_service")
 
 @router.get("/", response_model=List[Theme])
-async def get_themes(theme_service: ThemeService = Depends(get_theme_service)):
+async def get_themes(request: Request, theme_service: ThemeService = Depends(get_theme_service)):
     """Get all available themes"""
-    return await theme_service.get_all_themes()
+    return await compressed_json_response(request, await theme_service.get_all_themes_response())
 
 @router.get("/current", response_model=Theme)
-async def get_current_theme(theme_service: ThemeService = Depends(get_theme_service)):
+async def get_current_theme(request: Request, theme_service: ThemeService = Depends(get_theme_service)):
     """Get the currently active theme"""
-    return await theme_service.get_current_theme()
+    return await compressed_json_response(request, await theme_service.get_current_theme_response())
 
-@router.post("/", response_model=Theme)
-async def create_theme(theme: ThemeCreate, theme_service: ThemeService = Depends(get_theme_service)):
-    """Create a new theme from Figma URL"""
-    return await theme_service.create_theme(theme)
+@router.get("/{theme_id}/css")
+async def get_theme_css(theme_id: str, request: Request, theme_service: ThemeService = Depends(get_theme_service)):
+    """Get a theme (or "current") as a stylesheet of CSS custom properties"""
+    stylesheet = await theme_service.get_theme_stylesheet(theme_id)
+    return await compressed_body_response(
+        request, stylesheet.css, f'"{stylesheet.digest}"', "text/css", stylesheet.encoded,
+        headers={"Content-Location": stylesheet.url}
+    )
 
-@router.put("/{theme_id}", response_model=Theme)
+@router.get("/{theme_id}/css/{filename}")
+async def get_theme_css_version(theme_id: str, filename: str, request: Request, theme_service: ThemeService = Depends(get_theme_service)):
+    """Get a content-hashed stylesheet, cached by clients for good"""
+    stylesheet = await theme_service.get_theme_stylesheet(theme_id)
+    if filename != f"{stylesheet.digest}.css":
+        raise HTTPException(status_code=404, detail="Stylesheet version not found")
+    return await compressed_body_response(
+        request, stylesheet.css, f'"{stylesheet.digest}"', "text/css", stylesheet.encoded, IMMUTABLE_CACHE_CONTROL
+    )
+
+@router.get("/{theme_id}/tokens")
+async def get_theme_tokens(theme_id: str, request: Request, theme_service: ThemeService = Depends(get_theme_service)):
+    """Get a theme's flat CSS token map and the content-hashed URL of its stylesheet"""
+    stylesheet = await theme_service.get_theme_stylesheet(theme_id)
+    return await compressed_body_response(
+        request, stylesheet.tokens_body, stylesheet.tokens_etag, "application/json", stylesheet.encoded
+    )
+
+@router.get("/events")
+async def theme_events(theme_service: ThemeService = Depends(get_theme_service)):
+    """Stream theme changes as server-sent events"""
+    # Subscribed before reading the current theme, so no change in between is missed
+    subscription = theme_service.events.subscribe()
+    try:
+        initial_event = await theme_service.get_current_theme_event()
+    except BaseException:
+        theme_service.events.unsubscribe(subscription)
+        raise
+
+    async def event_stream():
+        try:
+            yield initial_event.to_sse()
+            async for event in subscription.events(settings.EVENTS_HEARTBEAT_SECONDS):
+                yield event.to_sse() if event else ": heartbeat\n\n"
+        finally:
+            theme_service.events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the client disconnects before the stream starts, which skips the generator's cleanup
+        background=BackgroundTask(theme_service.events.unsubscribe, subscription)
+    )
+
+@router.websocket("/events")
+async def theme_events_websocket(websocket: WebSocket):
+    """Stream theme changes over a WebSocket"""
+    theme_service = get_theme_service()
+    await websocket.accept()
+    subscription = theme_service.events.subscribe()
+    try:
+        await websocket.send_json((await theme_service.get_current_theme_event()).to_dict())
+        async for event in subscription.events(settings.EVENTS_HEARTBEAT_SECONDS):
+            await websocket.send_json(event.to_dict() if event else {"event": "heartbeat"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        theme_service.events.unsubscribe(subscription)
+
+@router.get("/{theme_id}/versions")
+async def get_theme_versions(theme_id: str, theme_service: ThemeService = Depends(get_theme_service)):
+    """List the retained versions of a theme, oldest first"""
+    return await theme_service.get_theme_versions(theme_id)
+
+@router.get("/{theme_id}/versions/diff")
+async def diff_theme_versions(
+    theme_id: str,
+    source: int = Query(..., alias="from"),
+    target: Optional[int] = Query(None, alias="to"),
+    theme_service: ThemeService = Depends(get_theme_service)
+):
+    """Get the changes between two versions of a theme as a JSON Patch; `to` defaults to the latest"""
+    return await theme_service.diff_theme_versions(theme_id, source, target)
+
+@router.get("/{theme_id}/versions/{version}")
+async def get_theme_version(theme_id: str, version: int, theme_service: ThemeService = Depends(get_theme_service)):
+    """Get the content of one version of a theme"""
+    theme_version = await theme_service.get_theme_version(theme_id, version)
+    return {**theme_version.summary(), **theme_version.document()}
+
+@router.post("/{theme_id}/versions/{version}/rollback", response_model=Theme)
+async def rollback_theme(theme_id: str, version: int, theme_service: ThemeService = Depends(get_theme_service)):
+    """Restore a version of a theme, recorded as a new version"""
+    return await theme_service.rollback_theme(theme_id, version)
+
+@router.get("/{theme_id}/assets")
+async def get_theme_asset_report(theme_id: str, theme_service: ThemeService = Depends(get_theme_service)):
+    """Report the byte sizes of a theme's image variants and the savings over the source images"""
+    return await theme_service.get_asset_report(theme_id)
+
+@router.get("/{theme_id}", response_model=Theme)
+async def get_theme(theme_id: str, request: Request, theme_service: ThemeService = Depends(get_theme_service)):
+    """Get a theme, with the ETag to send as If-Match when patching it"""
+    return await compressed_json_response(request, await theme_service.get_theme_response(theme_id))
+
+@router.post("/", response_model=Job, status_code=202)
+async def create_theme(theme: ThemeCreate, response: Response, theme_service: ThemeService = Depends(get_theme_service)):
+    """Queue creation of a new theme from Figma URL"""
+    job = await theme_service.submit_create_theme(theme)
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return job
+
+@router.put("/{theme_id}", response_model=Theme, responses={202: {"model": Job}})
 async def update_theme(theme_id: str, theme: ThemeUpdate, theme_service: ThemeService = Depends(get_theme_service)):
-    """Update an existing theme"""
+    """Update an existing theme, queueing a rebuild when a new Figma URL is given"""
+    if theme.figma_url:
+        job = await theme_service.submit_update_theme(theme_id, theme)
+        return JSONResponse(
+            status_code=202,
+            content=jsonable_encoder(job),
+            headers={"Location": f"/api/jobs/{job.id}"}
+        )
     return await theme_service.update_theme(theme_id, theme)
 
+@router.patch("/{theme_id}", response_model=ThemePatchResult)
+async def patch_theme(
+    theme_id: str,
+    operations: List[PatchOperation],
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    theme_service: ThemeService = Depends(get_theme_service)
+):
+    """Apply a JSON Patch to a theme's components, returning only the changed paths"""
+    result = await theme_service.patch_theme(theme_id, operations, if_match)
+    response.headers["ETag"] = result.etag
+    return result
+
 @router.delete("/{theme_id}")
 async def delete_theme(theme_id: str, theme_service: ThemeService = Depends(get_theme_service)):
     """Delete a theme"""
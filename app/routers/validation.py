@@ -0,0 +1,82 @@
+import json
+from typing import AsyncIterator, List
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from ..config import settings
+from ..utils.theme_schema import ValidationResult, theme_validator
+
+router = APIRouter()
+
+class RequestStreamingResponse(StreamingResponse):
+    """A streaming response whose body is produced while the request body is still being read.
+
+    StreamingResponse listens for the client disconnecting by reading
+    `receive`, which would take request body chunks away from the
+    generator; here the generator reads them itself and sees a disconnect
+    as the request stream ending.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def _result(result: ValidationResult) -> dict:
+    return {"valid": result.valid, "errors": result.errors, "digest": result.digest}
+
+def _result_line(line_number: int, result: ValidationResult) -> bytes:
+    return json.dumps({"line": line_number, **_result(result)}, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def _too_long(line_number: int, max_line_bytes: int) -> bytes:
+    error = {"path": "", "message": f"line is longer than {max_line_bytes} bytes"}
+    return _result_line(line_number, ValidationResult(False, [error], ""))
+
+async def validate_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Validate each NDJSON line as it arrives, yielding the results of each request chunk together"""
+    buffer = bytearray()
+    line_number = 0
+    # Set while discarding the rest of a line that was already reported as too long
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        results: List[bytes] = []
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if skipping:
+                skipping = False
+                continue
+            line_number += 1
+            if len(line) > max_line_bytes:
+                results.append(_too_long(line_number, max_line_bytes))
+            elif line.strip():
+                results.append(_result_line(line_number, theme_validator.validate_json(line)))
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            if not skipping:
+                line_number += 1
+                results.append(_too_long(line_number, max_line_bytes))
+                skipping = True
+            buffer.clear()
+        if results:
+            yield b"".join(results)
+    if buffer.strip() and not skipping:
+        yield _result_line(line_number + 1, theme_validator.validate_json(bytes(buffer)))
+
+@router.post("/")
+async def validate_theme(request: Request):
+    """Validate one theme document, reporting every problem found"""
+    return _result(theme_validator.validate_json(await request.body()))
+
+@router.post("/batch")
+async def validate_batch(request: Request):
+    """Validate newline-delimited theme documents, streaming one result line per document"""
+    return RequestStreamingResponse(
+        validate_lines(request.stream(), settings.VALIDATION_MAX_LINE_BYTES),
+        media_type="application/x-ndjson"
+    )
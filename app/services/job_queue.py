@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Set
+from fastapi import HTTPException
+from ..models.job import Job
+from ..utils.profiler import follow_task
+
+logger = logging.getLogger(__name__)
+
+JobRunner = Callable[[Job], Awaitable[Optional[str]]]
+
+class JobQueue:
+    """Background runner for long theme builds.
+
+    Jobs run as tasks on the event loop, gated by a semaphore so at most
+    `concurrency` builds are active at once. Submitting a job whose key
+    matches one that is still queued or running returns the existing job.
+    Finished jobs are kept for polling up to `history_size` entries.
+    """
+
+    def __init__(self, concurrency: int = 2, history_size: int = 500):
+        self.concurrency = concurrency
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, Job] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs that are queued or running"""
+        return len(self._inflight)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def submit(self, key: str, kind: str, runner: JobRunner) -> Job:
+        """Queue a job, or return the in-flight job with the same key"""
+        existing = self._inflight.get(key)
+        if existing is not None:
+            logger.info("Deduplicated %s job for %s", kind, key)
+            return existing
+
+        now = datetime.utcnow()
+        job = Job(id=str(uuid.uuid4()), kind=kind, created_at=now, updated_at=now)
+        self._jobs[job.id] = job
+        self._inflight[key] = job
+        self._trim_history()
+
+        task = asyncio.create_task(self._run(key, job, runner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        follow_task(task, f"{kind} job {job.id}")
+        return job
+
+    async def _run(self, key: str, job: Job, runner: JobRunner) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                job.updated_at = datetime.utcnow()
+                job.theme_id = await runner(job)
+                if job.stage is not None:
+                    job.stages[job.stage] = "done"
+                job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except HTTPException as e:
+            self._fail(job, e.detail)
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            self._fail(job, str(e))
+        finally:
+            job.updated_at = datetime.utcnow()
+            self._inflight.pop(key, None)
+
+    def _fail(self, job: Job, error: str) -> None:
+        job.status = "failed"
+        job.error = error
+        if job.stage is not None:
+            job.stages[job.stage] = "failed"
+
+    def _trim_history(self) -> None:
+        inflight_ids = {job.id for job in self._inflight.values()}
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history_size:
+                break
+            if job_id not in inflight_ids:
+                del self._jobs[job_id]
+
+    async def close(self) -> None:
+        """Cancel every queued or running job"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
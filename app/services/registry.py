@@ -0,0 +1,68 @@
+import time
+import inspect
+import logging
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class ServiceRegistry:
+    """Process-lifetime container for long-lived services.
+
+    Services are registered as factories and built once, either eagerly at
+    application startup or lazily on first use. Shutdown closes them in the
+    reverse order of construction.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._services: Dict[str, Any] = {}
+        self._order: List[str] = []
+        # Seconds each service took to build
+        self.build_times: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Register a factory for a named service"""
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """Get a service, building it on first access"""
+        if name not in self._services:
+            if name not in self._factories:
+                raise KeyError(f"Service not registered: {name}")
+            logger.info("Starting service: %s", name)
+            started = time.perf_counter()
+            self._services[name] = self._factories[name]()
+            self.build_times[name] = time.perf_counter() - started
+            self._order.append(name)
+            logger.info("Started service: %s in %.1fms", name, self.build_times[name] * 1000)
+        return self._services[name]
+
+    def is_started(self, name: str) -> bool:
+        """Check whether a service has already been built"""
+        return name in self._services
+
+    async def startup(self) -> None:
+        """Build every registered service and start any background work it runs"""
+        for name in self._factories:
+            service = self.get(name)
+            start = getattr(service, "start", None)
+            if start is not None:
+                start()
+
+    async def shutdown(self) -> None:
+        """Close every built service in reverse construction order"""
+        while self._order:
+            name = self._order.pop()
+            service = self._services.pop(name)
+            close = getattr(service, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+                logger.info("Stopped service: %s", name)
+            except Exception:
+                logger.exception("Failed to stop service: %s", name)
+
+registry = ServiceRegistry()
@@ -0,0 +1,88 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from ..models.theme import Theme
+from ..utils.theme_css import ThemeStylesheet, compile_theme_css
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    # Compressed copies of the body, keyed by their coded ETag; dropped with the response
+    encoded: Dict[str, bytes]
+
+def make_etag(body: bytes) -> str:
+    """Build a strong ETag from the response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+class ThemeResponseCache:
+    """Serialized JSON bodies for theme reads, built once per theme version.
+
+    Entries are dropped by `invalidate` whenever the service writes a theme,
+    so the next read re-serializes exactly the themes that changed.
+    """
+
+    def __init__(self):
+        self._themes: Dict[str, CachedResponse] = {}
+        self._all: Optional[CachedResponse] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _theme_body(self, theme: Theme) -> bytes:
+        cached = self._themes.get(theme.id)
+        if cached is None:
+            self.misses += 1
+            body = theme.json().encode("utf-8")
+            cached = CachedResponse(body, make_etag(body), {})
+            self._themes[theme.id] = cached
+        else:
+            self.hits += 1
+        return cached.body
+
+    def theme(self, theme: Theme) -> CachedResponse:
+        """Get the serialized body for a single theme"""
+        self._theme_body(theme)
+        return self._themes[theme.id]
+
+    def theme_list(self, themes: Iterable[Theme]) -> CachedResponse:
+        """Get the serialized body for the full theme list"""
+        if self._all is None:
+            self.misses += 1
+            body = b"[" + b",".join(self._theme_body(theme) for theme in themes) + b"]"
+            self._all = CachedResponse(body, make_etag(body), {})
+        else:
+            self.hits += 1
+        return self._all
+
+    def invalidate(self, theme_id: Optional[str] = None) -> None:
+        """Drop a theme's cached body (or every body) and the list body"""
+        if theme_id is None:
+            self._themes.clear()
+        else:
+            self._themes.pop(theme_id, None)
+        self._all = None
+
+class ThemeStylesheetCache:
+    """Compiled CSS custom-property stylesheets, one per theme.
+
+    A stylesheet is rebuilt only when the theme's `updated_at` moves, so
+    flipping the active flag on apply or reset reuses the compiled one.
+    """
+
+    def __init__(self):
+        self._stylesheets: Dict[str, Tuple[datetime, ThemeStylesheet]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def stylesheet(self, theme: Theme) -> ThemeStylesheet:
+        """Get the compiled stylesheet for the theme's current components"""
+        cached = self._stylesheets.get(theme.id)
+        if cached is not None and cached[0] == theme.updated_at:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        stylesheet = compile_theme_css(theme.id, theme.components)
+        self._stylesheets[theme.id] = (theme.updated_at, stylesheet)
+        return stylesheet
+
+    def discard(self, theme_id: str) -> None:
+        self._stylesheets.pop(theme_id, None)
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_CLOSED = object()
+
+class ThemeEvent:
+    """A theme change notification sent to connected UIs"""
+
+    def __init__(self, sequence: int, theme_id: str, version: str, event: str = "theme_changed"):
+        self.sequence = sequence
+        self.theme_id = theme_id
+        self.version = version
+        self.event = event
+
+    def to_dict(self) -> dict:
+        return {
+            "event": self.event,
+            "sequence": self.sequence,
+            "theme_id": self.theme_id,
+            "version": self.version
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def to_sse(self) -> str:
+        return f"id: {self.sequence}\nevent: {self.event}\ndata: {self.to_json()}\n\n"
+
+class Subscription:
+    """A single client's bounded event queue"""
+
+    def __init__(self, max_queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.closed = False
+
+    def offer(self, event: ThemeEvent) -> bool:
+        """Queue an event, returning False if the client has fallen behind"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self) -> None:
+        """End the subscription, discarding anything still queued"""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSED)
+
+    async def events(self, heartbeat: float) -> AsyncIterator[Optional[ThemeEvent]]:
+        """Yield queued events, or None whenever `heartbeat` seconds pass idle"""
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is _CLOSED:
+                return
+            yield event
+
+class ThemeEventBroker:
+    """Fan-out of theme change events to SSE and WebSocket clients.
+
+    Each subscriber has its own bounded queue. A subscriber whose queue is
+    full is dropped rather than allowed to hold up the publisher; clients
+    are expected to reconnect and resynchronise from the initial event.
+    """
+
+    def __init__(self, max_queue_size: int = 16):
+        self.max_queue_size = max_queue_size
+        self.sequence = 0
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.max_queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        subscription.close()
+
+    def current_event(self, theme_id: str, version: str) -> ThemeEvent:
+        """Build an event describing the current state without publishing it"""
+        return ThemeEvent(self.sequence, theme_id, version, event="theme_current")
+
+    def publish(self, theme_id: str, version: str) -> ThemeEvent:
+        """Send a theme change to every subscriber"""
+        self.sequence += 1
+        event = ThemeEvent(self.sequence, theme_id, version)
+        for subscription in list(self._subscribers):
+            if not subscription.offer(event):
+                logger.warning("Dropping slow theme event subscriber")
+                self.unsubscribe(subscription)
+        return event
+
+    def close(self) -> None:
+        """Disconnect every subscriber"""
+        for subscription in list(self._subscribers):
+            self.unsubscribe(subscription)
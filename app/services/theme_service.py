@@ -1,76 +1,243 @@
 import uuid
+import asyncio
 import logging
-import traceback
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 from fastapi import HTTPException
-from ..models.theme import Theme, ThemeCreate, ThemeUpdate, ThemeAsset
+from ..models.theme import PatchOperation, Theme, ThemeCreate, ThemePatchResult, ThemeUpdate, ThemeAsset
+from ..models.job import Job
 from ..utils.figma import FigmaClient
 from ..utils.asset_processor import AssetProcessor
 from ..utils.theme_loader import ThemeLoader
+from ..utils.http_client import HTTPClient
+from ..utils.http_cache import if_match_satisfied
+from ..utils.json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch, diff_documents, diff_paths
+from ..utils.theme_css import ThemeStylesheet
+from ..utils.theme_schema import describe_errors, theme_validator
+from ..utils.figma_cache import FigmaDocumentCache
+from ..utils.metrics import CACHE_HITS, CACHE_MISSES, QUEUE_DEPTH, THEME_BUILDS, THEME_BUILD_STAGE_SECONDS
+from ..config import settings
+from .theme_store import StoreChange, ThemeStore, create_theme_store
+from .response_cache import CachedResponse, ThemeResponseCache, ThemeStylesheetCache
+from .theme_events import ThemeEvent, ThemeEventBroker
+from .job_queue import JobQueue
+from .theme_versions import ThemeVersion, ThemeVersionStore
 
 logger = logging.getLogger(__name__)
 
 class ThemeService:
-    def __init__(self):
+    def __init__(self, store: Optional[ThemeStore] = None, http_client: Optional[HTTPClient] = None):
         logger.info("Initializing ThemeService")
-        self.themes: Dict[str, Theme] = {}
-        self.current_theme_id: Optional[str] = None
-        self.figma_client = FigmaClient()
-        self.asset_processor = AssetProcessor()
+        self.store = store if store is not None else create_theme_store()
+        self._owns_http_client = http_client is None
+        self.http_client = http_client if http_client is not None else HTTPClient()
+        self.response_cache = ThemeResponseCache()
+        self.stylesheets = ThemeStylesheetCache()
+        self.events = ThemeEventBroker(settings.EVENTS_QUEUE_SIZE)
+        self.jobs = JobQueue(settings.JOB_CONCURRENCY, settings.JOB_HISTORY_SIZE)
+        document_cache = None
+        if settings.FIGMA_CACHE_ENABLED:
+            document_cache = FigmaDocumentCache(settings.FIGMA_CACHE_DIR, settings.FIGMA_CACHE_MAX_BYTES)
+        self.figma_client = FigmaClient(self.http_client, document_cache)
+        self.asset_processor = AssetProcessor(self.http_client)
+        self.versions = ThemeVersionStore(self.store, settings.THEME_VERSION_HISTORY, self.asset_processor.asset_digests)
         self.theme_loader = ThemeLoader()
+        # Picks up writes made by other workers sharing the store
+        self._sync_task: Optional[asyncio.Task] = None
+        # The (theme id, etag) last sent to subscribers as the active theme
+        self._published: Optional[Tuple[str, str]] = None
+        self._register_metrics()
         
         # Load default theme
         try:
             logger.info("Loading default theme")
             default_theme = self.theme_loader.load_default_theme()
-            self.themes[default_theme.id] = default_theme
-            self.current_theme_id = default_theme.id
+            current_theme_id = self.current_theme_id
+            if current_theme_id is None or self.store.get(current_theme_id) is None:
+                current_theme_id = default_theme.id
+            default_theme.is_active = current_theme_id == default_theme.id
+            self.store.put(default_theme)
+            self.current_theme_id = current_theme_id
             logger.info("Default theme loaded successfully")
         except Exception as e:
-            logger.error(f"Failed to load default theme: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to load default theme: %s", e)
             raise
 
+    def _register_metrics(self) -> None:
+        """Expose this service's cache counters and queue depths on /metrics"""
+        caches = {
+            ("theme_response",): self.response_cache,
+            ("theme_stylesheet",): self.stylesheets,
+            ("theme_validation",): theme_validator
+        }
+        if self.figma_client.document_cache is not None:
+            caches[("figma_document",)] = self.figma_client.document_cache
+        CACHE_HITS.set_function(lambda: {labels: cache.hits for labels, cache in caches.items()})
+        CACHE_MISSES.set_function(lambda: {labels: cache.misses for labels, cache in caches.items()})
+        QUEUE_DEPTH.set_function(lambda: {
+            ("theme_jobs",): self.jobs.depth,
+            ("asset_images_waiting",): self.asset_processor.images_queued,
+            ("asset_images_active",): self.asset_processor.images_active
+        })
+
+    @property
+    def current_theme_id(self) -> Optional[str]:
+        return self.store.get_meta("current_theme_id")
+
+    @current_theme_id.setter
+    def current_theme_id(self, theme_id: Optional[str]) -> None:
+        self.store.set_meta("current_theme_id", theme_id)
+
+    def start(self) -> None:
+        """Start following theme writes made by other worker processes"""
+        interval = settings.THEME_SYNC_INTERVAL_SECONDS
+        if self.store.shared and interval > 0 and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._follow_shared_state(interval))
+
+    async def _follow_shared_state(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sync_shared_state()
+            except Exception:
+                logger.exception("Failed to sync theme state from other workers")
+
+    def sync_shared_state(self) -> List[StoreChange]:
+        """Apply theme writes made by other worker processes to this worker's caches and subscribers"""
+        changes = self.store.sync()
+        if not changes:
+            return changes
+        current_theme_id = self.current_theme_id
+        current_changed = False
+        for change in changes:
+            if change.kind == "reset":
+                self.response_cache.invalidate()
+                current_changed = True
+            elif change.kind == "theme":
+                self._theme_changed(change.key)
+                self._remote_theme_changed(change.key)
+                current_changed = current_changed or change.key == current_theme_id
+            elif change.key == "current_theme_id":
+                current_changed = True
+        theme = self.store.get(current_theme_id) if current_changed and current_theme_id else None
+        # An apply on another worker deactivates the old theme before switching to the new one; wait for the switch
+        if theme is not None and theme.is_active and self._published != (theme.id, self.response_cache.theme(theme).etag):
+            self._current_theme_changed(theme)
+        logger.debug("Synced %d theme changes from other workers", len(changes))
+        return changes
+
+    def _remote_theme_changed(self, theme_id: str) -> None:
+        """Forget what this worker derived from a theme another worker deleted"""
+        if self.store.get(theme_id) is None:
+            self.stylesheets.discard(theme_id)
+            self.versions.discard(theme_id)
+
+    async def close(self) -> None:
+        """Release resources held by the service and its clients"""
+        logger.info("Closing ThemeService")
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+        self.events.close()
+        await self.jobs.close()
+        await self.figma_client.close()
+        await self.asset_processor.close()
+        if self._owns_http_client:
+            await self.http_client.close()
+        self.store.close()
+
     async def get_all_themes(self) -> List[Theme]:
         """Get all available themes"""
-        logger.info("Getting all themes")
-        return list(self.themes.values())
+        logger.debug("Getting all themes")
+        self.sync_shared_state()
+        return self.store.list()
 
     async def get_current_theme(self) -> Theme:
         """Get the currently active theme"""
-        logger.info("Getting current theme")
+        logger.debug("Getting current theme")
+        # Reads check for other workers' writes too, so every worker answers alike as soon as a write commits
+        self.sync_shared_state()
         if not self.current_theme_id:
             # If no theme is active, try to use the default theme
-            default_theme = self.themes.get("default")
+            default_theme = self.store.get("default")
             if default_theme:
                 logger.info("No active theme found, using default theme")
                 self.current_theme_id = "default"
                 return default_theme
             logger.error("No active theme found and default theme is missing")
             raise HTTPException(status_code=404, detail="No active theme found")
-        return self.themes[self.current_theme_id]
+        return self.store.get(self.current_theme_id)
+
+    async def get_all_themes_response(self) -> CachedResponse:
+        """Get all themes as a pre-serialized JSON body"""
+        self.sync_shared_state()
+        return self.response_cache.theme_list(self.store.list())
+
+    async def get_current_theme_response(self) -> CachedResponse:
+        """Get the currently active theme as a pre-serialized JSON body"""
+        return self.response_cache.theme(await self.get_current_theme())
+
+    async def get_theme_stylesheet(self, theme_id: str) -> ThemeStylesheet:
+        """Get a theme compiled to CSS custom properties, "current" meaning the active theme"""
+        self.sync_shared_state()
+        theme = await self.get_current_theme() if theme_id == "current" else self.store.get(theme_id)
+        if theme is None:
+            raise HTTPException(status_code=404, detail="Theme not found")
+        return self.stylesheets.stylesheet(theme)
+
+    async def get_current_theme_event(self) -> ThemeEvent:
+        """Describe the active theme for newly connected event subscribers"""
+        theme = await self.get_current_theme()
+        return self.events.current_event(theme.id, self.response_cache.theme(theme).etag)
+
+    async def get_asset_report(self, theme_id: str) -> dict:
+        """Summarize the stored size of a theme's image variants against their sources"""
+        self.sync_shared_state()
+        if theme_id not in self.store:
+            raise HTTPException(status_code=404, detail="Theme not found")
+        report = await self.asset_processor.asset_report(self.asset_processor.index.theme_assets(theme_id))
+        report["theme_id"] = theme_id
+        return report
+
+    async def submit_create_theme(self, theme_create: ThemeCreate) -> Job:
+        """Queue a theme build from Figma URL"""
+        return self.jobs.submit(
+            f"create:{theme_create.figma_url}",
+            "create_theme",
+            lambda job: self._run_job(self.create_theme(theme_create, job))
+        )
+
+    async def submit_update_theme(self, theme_id: str, theme_update: ThemeUpdate) -> Job:
+        """Queue a theme rebuild from a new Figma URL"""
+        self._check_updatable(theme_id)
+        return self.jobs.submit(
+            f"update:{theme_id}:{theme_update.figma_url}",
+            "update_theme",
+            lambda job: self._run_job(self.update_theme(theme_id, theme_update, job))
+        )
+
+    async def get_job(self, job_id: str) -> Job:
+        """Get the progress of a queued theme build"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
 
-    async def create_theme(self, theme_create: ThemeCreate) -> Theme:
+    async def _run_job(self, build) -> str:
+        theme = await build
+        return theme.id
+
+    async def create_theme(self, theme_create: ThemeCreate, job: Optional[Job] = None) -> Theme:
         """Create a new theme from Figma URL"""
+        # Generate unique ID for the theme
+        theme_id = str(uuid.uuid4())
         try:
-            logger.info(f"Creating new theme: {theme_create.name}")
-            # Generate unique ID for the theme
-            theme_id = str(uuid.uuid4())
+            logger.info("Creating new theme: %s", theme_create.name)
             
             # Extract components and assets from Figma
-            logger.info("Extracting components from Figma")
-            components = await self.figma_client.extract_components(theme_create.figma_url)
-            
-            # Validate theme structure
-            logger.info("Validating theme structure")
-            if not self.theme_loader.validate_theme_structure({"id": theme_id, "name": theme_create.name, "components": components}):
-                logger.error("Invalid theme structure")
-                raise ValueError("Invalid theme structure")
-            
-            # Process and store assets
-            logger.info("Processing theme assets")
-            processed_components = await self.asset_processor.process_assets(components)
+            processed_components = await self._build_components(
+                theme_id, theme_create.name, theme_create.figma_url, job
+            )
             
             # Create theme object
             theme = Theme(
@@ -85,61 +252,245 @@ class ThemeService:
             )
             
             # Store theme
-            self.themes[theme_id] = theme
-            logger.info(f"Theme created successfully: {theme_id}")
+            self._enter_stage(job, "store")
+            with THEME_BUILD_STAGE_SECONDS.labels("store").time():
+                self.store.put(theme)
+                await self._record_version(theme, "create")
+            self._theme_changed(theme_id)
+            THEME_BUILDS.labels("create", "success").inc()
+            logger.info("Theme created successfully: %s", theme_id)
             return theme
             
         except Exception as e:
-            logger.error(f"Failed to create theme: {str(e)}")
-            logger.error(traceback.format_exc())
+            THEME_BUILDS.labels("create", "failure").inc()
+            logger.exception("Failed to create theme: %s", e)
+            await self._release_build_assets(theme_id)
             raise HTTPException(status_code=400, detail=str(e))
 
-    async def update_theme(self, theme_id: str, theme_update: ThemeUpdate) -> Theme:
+    async def update_theme(self, theme_id: str, theme_update: ThemeUpdate, job: Optional[Job] = None) -> Theme:
         """Update an existing theme"""
         try:
-            logger.info(f"Updating theme: {theme_id}")
-            if theme_id not in self.themes:
-                logger.error(f"Theme not found: {theme_id}")
-                raise HTTPException(status_code=404, detail="Theme not found")
-            
-            # Cannot update default theme
-            if theme_id == "default":
-                logger.error("Attempted to update default theme")
-                raise HTTPException(status_code=400, detail="Cannot update default theme")
-            
-            theme = self.themes[theme_id]
-            
-            # Update basic properties
-            theme.name = theme_update.name
-            theme.description = theme_update.description
+            logger.info("Updating theme: %s", theme_id)
+            snapshot = self._check_updatable(theme_id)
+            changes: Dict[str, Any] = {"name": theme_update.name, "description": theme_update.description}
             
             # Update Figma URL and components if provided
             if theme_update.figma_url:
                 logger.info("Updating theme components from Figma")
-                theme.figma_url = theme_update.figma_url
-                components = await self.figma_client.extract_components(theme_update.figma_url)
-                
-                # Validate theme structure
-                if not self.theme_loader.validate_theme_structure({"id": theme_id, "name": theme.name, "components": components}):
-                    logger.error("Invalid theme structure")
-                    raise HTTPException(status_code=400, detail="Invalid theme structure")
-                
-                theme.components = await self.asset_processor.process_assets(components)
+                changes["figma_url"] = theme_update.figma_url
+                changes["components"] = await self._build_components(
+                    theme_id, theme_update.name, theme_update.figma_url, job
+                )
             
-            theme.updated_at = datetime.utcnow()
-            logger.info(f"Theme updated successfully: {theme_id}")
+            # The build awaited; merge into the theme as stored now, so an apply made meanwhile is kept
+            self.sync_shared_state()
+            previous = self.store.get(theme_id)
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Theme not found")
+            # Content written meanwhile (a patch, rollback or other update) would be overwritten
+            if previous.updated_at != snapshot.updated_at:
+                raise HTTPException(status_code=409, detail="Theme was modified while it was being rebuilt")
+            theme = previous.copy(update={**changes, "updated_at": datetime.utcnow()})
+            self._enter_stage(job, "store")
+            with THEME_BUILD_STAGE_SECONDS.labels("store").time():
+                self.store.put(theme)
+                # Assets used by neither these components nor a retained version are removed
+                await self._record_version(theme, "update", previous)
+            self._theme_changed(theme_id)
+            if theme_id == self.current_theme_id:
+                self._current_theme_changed(theme)
+            THEME_BUILDS.labels("update", "success").inc()
+            logger.info("Theme updated successfully: %s", theme_id)
             return theme
         except Exception as e:
-            logger.error(f"Failed to update theme: {str(e)}")
-            logger.error(traceback.format_exc())
+            THEME_BUILDS.labels("update", "failure").inc()
+            logger.exception("Failed to update theme: %s", e)
+            if theme_update.figma_url:
+                await self._release_build_assets(theme_id)
             raise
 
+    async def get_theme_response(self, theme_id: str) -> CachedResponse:
+        """Get a theme as a pre-serialized JSON body"""
+        self.sync_shared_state()
+        theme = self.store.get(theme_id)
+        if theme is None:
+            raise HTTPException(status_code=404, detail="Theme not found")
+        return self.response_cache.theme(theme)
+
+    async def patch_theme(self, theme_id: str, operations: List[PatchOperation], if_match: Optional[str]) -> ThemePatchResult:
+        """Apply JSON Patch operations to a theme's components if it is still at the client's version"""
+        # Check If-Match against the latest write from any worker, not the last one this worker saw
+        self.sync_shared_state()
+        theme = self._check_updatable(theme_id)
+        if not if_match:
+            raise HTTPException(status_code=428, detail="If-Match header is required")
+        if not if_match_satisfied(if_match, self.response_cache.theme(theme).etag):
+            raise HTTPException(status_code=412, detail="Theme was modified")
+
+        patch = [operation.dict(by_alias=True, exclude_unset=True) for operation in operations]
+        try:
+            components = apply_patch(theme.components, patch)
+        except JsonPatchTestFailed as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except JsonPatchError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self._validate_components(theme_id, theme.name, components)
+
+        # Nothing is awaited between the version check and the write, so concurrent patches cannot interleave
+        changes = diff_paths(theme.components, components, patch)
+        previous = theme
+        theme = theme.copy(update={"components": components, "updated_at": datetime.utcnow()})
+        self.store.put(theme)
+        await self._record_version(theme, "patch", previous)
+        self._theme_changed(theme_id)
+        if theme_id == self.current_theme_id:
+            self._current_theme_changed(theme)
+        logger.info("Theme patched: %s (%d operations)", theme_id, len(patch))
+        return ThemePatchResult(
+            id=theme_id,
+            etag=self.response_cache.theme(theme).etag,
+            updated_at=theme.updated_at,
+            changes=changes
+        )
+
+    async def get_theme_versions(self, theme_id: str) -> List[dict]:
+        """List the retained versions of a theme, oldest first"""
+        self.sync_shared_state()
+        theme = self.store.get(theme_id)
+        if theme is None:
+            raise HTTPException(status_code=404, detail="Theme not found")
+        return self.versions.list(theme)
+
+    async def get_theme_version(self, theme_id: str, version: int) -> ThemeVersion:
+        """Get one retained version of a theme"""
+        self.sync_shared_state()
+        theme = self.store.get(theme_id)
+        if theme is None:
+            raise HTTPException(status_code=404, detail="Theme not found")
+        theme_version = self.versions.get(theme, version)
+        if theme_version is None:
+            raise HTTPException(status_code=404, detail="Theme version not found")
+        return theme_version
+
+    async def diff_theme_versions(self, theme_id: str, source: int, target: Optional[int] = None) -> dict:
+        """Describe the changes from one version of a theme to another (by default the latest) as a JSON Patch"""
+        before = await self.get_theme_version(theme_id, source)
+        if target is None:
+            after = self.versions.latest(self.store.get(theme_id))
+        else:
+            after = await self.get_theme_version(theme_id, target)
+        return {
+            "from": before.version,
+            "to": after.version,
+            "changes": diff_documents(before.document(), after.document())
+        }
+
+    async def rollback_theme(self, theme_id: str, version: int) -> Theme:
+        """Restore a retained version of a theme, recorded as a new version"""
+        self.sync_shared_state()
+        previous = self._check_updatable(theme_id)
+        target = await self.get_theme_version(theme_id, version)
+        logger.info("Rolling back theme %s to version %d", theme_id, version)
+        # The restored version's components are reused as they are, never copied
+        theme = previous.copy(update={
+            "name": target.name,
+            "description": target.description,
+            "figma_url": target.figma_url,
+            "components": target.components,
+            "updated_at": datetime.utcnow()
+        })
+        self.store.put(theme)
+        await self._record_version(theme, "rollback", previous, based_on=version)
+        self._theme_changed(theme_id)
+        if theme_id == self.current_theme_id:
+            self._current_theme_changed(theme)
+        return theme
+
+    async def _record_version(
+        self, theme: Theme, operation: str, previous: Optional[Theme] = None, based_on: Optional[int] = None
+    ) -> ThemeVersion:
+        """Record a stored theme's new version and keep the assets of every retained version"""
+        version = self.versions.record(theme, operation, previous, based_on)
+        # Read inside the asset index transaction, so versions other workers recorded meanwhile keep their assets
+        await self.asset_processor.commit_theme_assets(
+            theme.id, theme.components, lambda: self.versions.asset_digests(theme.id)
+        )
+        return version
+
+    def _check_updatable(self, theme_id: str) -> Theme:
+        """Get a theme that may be updated, raising if it is missing or the default"""
+        theme = self.store.get(theme_id)
+        if theme is None:
+            logger.error("Theme not found: %s", theme_id)
+            raise HTTPException(status_code=404, detail="Theme not found")
+        
+        # Cannot update default theme
+        if theme_id == "default":
+            logger.error("Attempted to update default theme")
+            raise HTTPException(status_code=400, detail="Cannot update default theme")
+        return theme
+
+    async def _build_components(self, theme_id: str, name: str, figma_url: str, job: Optional[Job]) -> Dict[str, dict]:
+        """Run the Figma extraction and asset pipeline for a theme"""
+        logger.info("Extracting components from Figma")
+        self._enter_stage(job, "fetch")
+        file_data = None
+        with THEME_BUILD_STAGE_SECONDS.labels("fetch").time():
+            if self.figma_client.selective:
+                # Only component subtrees are downloaded, already parsed
+                components = await self.figma_client.fetch_components_selective(figma_url)
+            elif self.figma_client.streaming:
+                # Components are parsed incrementally while the document downloads
+                components = await self.figma_client.stream_components(figma_url)
+            else:
+                file_data = await self.figma_client.fetch_file(figma_url)
+        self._enter_stage(job, "parse")
+        if file_data is not None:
+            with THEME_BUILD_STAGE_SECONDS.labels("parse").time():
+                components = await self.figma_client.parse_components(file_data)
+        
+        # Validate theme structure
+        logger.info("Validating theme structure")
+        self._validate_components(theme_id, name, components)
+        
+        # Process and store assets
+        logger.info("Processing theme assets")
+        self._enter_stage(job, "assets")
+        progress = job.asset_progress if job is not None else None
+        with THEME_BUILD_STAGE_SECONDS.labels("assets").time():
+            return await self.asset_processor.process_assets(components, progress, theme_id=theme_id)
+
+    def _validate_components(self, theme_id: str, name: str, components: Any) -> None:
+        """Check components against the theme schema, raising with every problem found"""
+        result = theme_validator.validate({"id": theme_id, "name": name, "components": components})
+        if not result.valid:
+            logger.error("Invalid theme structure: %s", describe_errors(result))
+            raise HTTPException(status_code=400, detail=f"Invalid theme structure: {describe_errors(result)}")
+
+    async def _release_build_assets(self, theme_id: str) -> None:
+        """Drop asset references taken by a failed build, keeping the stored theme's"""
+        try:
+            theme = self.store.get(theme_id)
+            if theme is None:
+                await self.asset_processor.delete_theme_assets(theme_id)
+            else:
+                await self.asset_processor.commit_theme_assets(
+                    theme_id, theme.components, lambda: self.versions.asset_digests(theme_id)
+                )
+        except Exception as e:
+            logger.error("Failed to release assets of theme %s: %s", theme_id, e)
+
+    def _enter_stage(self, job: Optional[Job], stage: str) -> None:
+        if job is not None:
+            job.enter_stage(stage)
+
     async def delete_theme(self, theme_id: str) -> dict:
         """Delete a theme"""
         try:
-            logger.info(f"Deleting theme: {theme_id}")
-            if theme_id not in self.themes:
-                logger.error(f"Theme not found: {theme_id}")
+            logger.info("Deleting theme: %s", theme_id)
+            self.sync_shared_state()
+            if theme_id not in self.store:
+                logger.error("Theme not found: %s", theme_id)
                 raise HTTPException(status_code=404, detail="Theme not found")
             
             # Cannot delete default theme
@@ -147,66 +498,67 @@ class ThemeService:
                 logger.error("Attempted to delete default theme")
                 raise HTTPException(status_code=400, detail="Cannot delete default theme")
             
-            # Cannot delete active theme
-            if theme_id == self.current_theme_id:
+            # Cannot delete active theme; checked in the delete itself, as another worker may apply it meanwhile
+            if not self.store.delete_inactive(theme_id):
                 logger.error("Attempted to delete active theme")
                 raise HTTPException(status_code=400, detail="Cannot delete active theme")
             
             # Delete theme assets
             await self.asset_processor.delete_theme_assets(theme_id)
-            
-            # Remove theme
-            del self.themes[theme_id]
-            logger.info(f"Theme deleted successfully: {theme_id}")
+            self._theme_changed(theme_id)
+            self.stylesheets.discard(theme_id)
+            self.versions.discard(theme_id)
+            logger.info("Theme deleted successfully: %s", theme_id)
             return {"message": "Theme deleted successfully"}
         except Exception as e:
-            logger.error(f"Failed to delete theme: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to delete theme: %s", e)
             raise
 
     async def apply_theme(self, theme_id: str) -> dict:
         """Apply a theme as the current theme"""
         try:
-            logger.info(f"Applying theme: {theme_id}")
-            if theme_id not in self.themes:
-                logger.error(f"Theme not found: {theme_id}")
+            logger.info("Applying theme: %s", theme_id)
+            if not self._activate(theme_id):
+                logger.error("Theme not found: %s", theme_id)
                 raise HTTPException(status_code=404, detail="Theme not found")
-            
-            # Deactivate current theme
-            if self.current_theme_id:
-                self.themes[self.current_theme_id].is_active = False
-            
-            # Activate new theme
-            self.current_theme_id = theme_id
-            self.themes[theme_id].is_active = True
-            
-            logger.info(f"Theme applied successfully: {theme_id}")
+            logger.info("Theme applied successfully: %s", theme_id)
             return {"message": "Theme applied successfully"}
         except Exception as e:
-            logger.error(f"Failed to apply theme: {str(e)}")
-            logger.error(traceback.format_exc())
+            logger.exception("Failed to apply theme: %s", e)
             raise
 
     async def reset_theme(self) -> dict:
         """Reset to the default theme"""
         try:
             logger.info("Resetting to default theme")
-            default_theme = self.themes.get("default")
-            if not default_theme:
+            if not self._activate("default"):
                 logger.error("Default theme not found")
                 raise HTTPException(status_code=404, detail="Default theme not found")
-            
-            # Deactivate current theme
-            if self.current_theme_id and self.current_theme_id != "default":
-                self.themes[self.current_theme_id].is_active = False
-            
-            # Activate default theme
-            self.current_theme_id = "default"
-            default_theme.is_active = True
-            
             logger.info("Theme reset to default successfully")
             return {"message": "Theme reset to default"}
         except Exception as e:
-            logger.error(f"Failed to reset theme: {str(e)}")
-            logger.error(traceback.format_exc())
-            raise 
\ No newline at end of file
+            logger.exception("Failed to reset theme: %s", e)
+            raise
+
+    def _activate(self, theme_id: str) -> bool:
+        """Switch the current theme in one store write, so concurrent applies on any worker leave one theme active"""
+        self.sync_shared_state()
+        theme, deactivated = self.store.activate(theme_id)
+        if theme is None:
+            return False
+        if deactivated is not None:
+            self._theme_changed(deactivated.id)
+        self._theme_changed(theme_id)
+        self._current_theme_changed(theme)
+        return True
+
+    def _theme_changed(self, theme_id: str) -> None:
+        """Invalidate derived state after a theme was written"""
+        self.response_cache.invalidate(theme_id)
+
+    def _current_theme_changed(self, theme: Theme) -> None:
+        """Notify connected UIs that the active theme changed"""
+        # Compiled before the event goes out, so UIs reloading the stylesheet never wait on it
+        self.stylesheets.stylesheet(theme)
+        self._published = (theme.id, self.response_cache.theme(theme).etag)
+        self.events.publish(*self._published)
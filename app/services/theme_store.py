@@ -0,0 +1,641 @@
+import os
+import json
+import hashlib
+import uuid
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from ..config import settings
+from ..models.theme import Theme
+from .theme_versions import ThemeVersion
+
+logger = logging.getLogger(__name__)
+
+# Metadata key naming the applied theme
+CURRENT_THEME_KEY = "current_theme_id"
+
+class StoreChange(NamedTuple):
+    # "theme", "meta", or "reset" when changes were missed and everything must be reloaded
+    kind: str
+    key: Optional[str]
+
+class ThemeStore(ABC):
+    """Storage backend interface for themes and service metadata"""
+
+    # Whether other worker processes read and write the same themes
+    shared = False
+
+    @abstractmethod
+    def get(self, theme_id: str) -> Optional[Theme]:
+        pass
+
+    @abstractmethod
+    def get_by_name(self, name: str) -> Optional[Theme]:
+        pass
+
+    @abstractmethod
+    def list(self) -> List[Theme]:
+        pass
+
+    @abstractmethod
+    def put(self, theme: Theme) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, theme_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def activate(self, theme_id: str) -> Tuple[Optional[Theme], Optional[Theme]]:
+        """Make a theme the current one, deactivating the previous current theme in the same write.
+
+        Returns the activated and the deactivated theme; the first is None if
+        the theme does not exist, the second if the current theme did not change.
+        """
+
+    @abstractmethod
+    def delete_inactive(self, theme_id: str) -> bool:
+        """Delete a theme unless it is the current one, checked in the same write; returns whether it was deleted"""
+
+    @abstractmethod
+    def get_meta(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        pass
+
+    @abstractmethod
+    def add_version(
+        self, theme_id: str, version: ThemeVersion, max_versions: int, initial: Optional[ThemeVersion] = None
+    ) -> ThemeVersion:
+        """Store a theme version numbered after the latest, preceded by `initial` if the theme has none, keeping `max_versions`"""
+
+    @abstractmethod
+    def get_version(self, theme_id: str, version: int) -> Optional[ThemeVersion]:
+        pass
+
+    @abstractmethod
+    def version_summaries(self, theme_id: str) -> List[dict]:
+        pass
+
+    @abstractmethod
+    def version_range(self, theme_id: str) -> Optional[Tuple[int, int]]:
+        """Get the oldest and latest retained version numbers of a theme"""
+
+    @abstractmethod
+    def version_asset_digests(self, theme_id: str) -> Set[str]:
+        """Get the digests of the assets used by a theme's retained versions"""
+
+    def sync(self) -> List[StoreChange]:
+        """Drop cached data written by other processes since the last call, returning what changed"""
+        return []
+
+    def close(self) -> None:
+        pass
+
+    def __contains__(self, theme_id: str) -> bool:
+        return self.get(theme_id) is not None
+
+class MemoryThemeStore(ThemeStore):
+    """Non-durable store keeping themes in a process-local dict"""
+
+    def __init__(self):
+        self._themes: Dict[str, Theme] = {}
+        self._meta: Dict[str, str] = {}
+        self._versions: Dict[str, Dict[int, ThemeVersion]] = {}
+
+    def get(self, theme_id: str) -> Optional[Theme]:
+        return self._themes.get(theme_id)
+
+    def get_by_name(self, name: str) -> Optional[Theme]:
+        return next((theme for theme in self._themes.values() if theme.name == name), None)
+
+    def list(self) -> List[Theme]:
+        return list(self._themes.values())
+
+    def put(self, theme: Theme) -> None:
+        self._themes[theme.id] = theme
+
+    def delete(self, theme_id: str) -> None:
+        self._themes.pop(theme_id, None)
+        self._versions.pop(theme_id, None)
+
+    def activate(self, theme_id: str) -> Tuple[Optional[Theme], Optional[Theme]]:
+        theme = self._themes.get(theme_id)
+        if theme is None:
+            return None, None
+        current_theme_id = self._meta.get(CURRENT_THEME_KEY)
+        previous = self._themes.get(current_theme_id) if current_theme_id != theme_id else None
+        if previous is not None:
+            previous = self._themes[previous.id] = previous.copy(update={"is_active": False})
+        theme = self._themes[theme_id] = theme.copy(update={"is_active": True})
+        self._meta[CURRENT_THEME_KEY] = theme_id
+        return theme, previous
+
+    def delete_inactive(self, theme_id: str) -> bool:
+        if theme_id not in self._themes or self._meta.get(CURRENT_THEME_KEY) == theme_id:
+            return False
+        self.delete(theme_id)
+        return True
+
+    def get_meta(self, key: str) -> Optional[str]:
+        return self._meta.get(key)
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        if value is None:
+            self._meta.pop(key, None)
+        else:
+            self._meta[key] = value
+
+    def add_version(
+        self, theme_id: str, version: ThemeVersion, max_versions: int, initial: Optional[ThemeVersion] = None
+    ) -> ThemeVersion:
+        versions = self._versions.setdefault(theme_id, {})
+        if not versions and initial is not None:
+            versions[1] = initial._replace(version=1)
+        version = version._replace(version=max(versions, default=0) + 1)
+        versions[version.version] = version
+        while len(versions) > max_versions:
+            del versions[min(versions)]
+        return version
+
+    def get_version(self, theme_id: str, version: int) -> Optional[ThemeVersion]:
+        return self._versions.get(theme_id, {}).get(version)
+
+    def version_summaries(self, theme_id: str) -> List[dict]:
+        versions = self._versions.get(theme_id, {})
+        return [versions[number].summary() for number in sorted(versions)]
+
+    def version_range(self, theme_id: str) -> Optional[Tuple[int, int]]:
+        versions = self._versions.get(theme_id)
+        return (min(versions), max(versions)) if versions else None
+
+    def version_asset_digests(self, theme_id: str) -> Set[str]:
+        return set().union(*(version.asset_digests for version in self._versions.get(theme_id, {}).values()))
+
+class SQLiteThemeStore(ThemeStore):
+    """Durable SQLite (WAL mode) store with a write-through read cache.
+
+    Reads are served from memory once a theme has been loaded; writes go to
+    the database first and then replace the cached entry, so the cache never
+    holds data that was not committed.
+
+    Theme versions are stored next to the themes, so every worker sees the
+    same histories. Their components are stored as content-addressed nodes,
+    one per object, so a version only adds the nodes its edit changed, and
+    versions loaded from the database share unchanged subtrees again.
+    Several worker processes can share one database. Every write appends to
+    a change log in the same transaction, and `sync` drops the cached
+    entries other processes have written since. It costs a single
+    `PRAGMA data_version` check when nothing changed.
+    """
+
+    shared = True
+    # Change log entries kept for processes that have fallen behind
+    CHANGE_LOG_SIZE = 1000
+    # Version nodes kept in memory, shared by the versions this process writes and loads
+    NODE_CACHE_SIZE = 100_000
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS themes (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_themes_name ON themes (name);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS theme_versions (
+            theme_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            figma_url TEXT NOT NULL,
+            -- Digest of the root node of the components
+            components TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            based_on INTEGER,
+            asset_digests TEXT NOT NULL,
+            PRIMARY KEY (theme_id, version)
+        );
+        CREATE TABLE IF NOT EXISTS version_nodes (
+            theme_id TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            -- [key, value] entries, or [key, null, digest] for nested objects
+            data TEXT NOT NULL,
+            PRIMARY KEY (theme_id, digest)
+        );
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._cache: Dict[str, Theme] = {}
+        self._meta: Dict[str, Optional[str]] = {}
+        self._all: Optional[List[Theme]] = None
+        self._nodes: Dict[str, dict] = {}
+        # id() of each known node -> (node, digest, encoded entries); the node is kept to pin its id
+        self._node_digests: Dict[int, Tuple[dict, str, str]] = {}
+        # Identifies this connection's own entries in the change log
+        self.origin = uuid.uuid4().hex
+        self._seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        self._data_version = self._data_version_now()
+        logger.info("Opened theme store at %s", path)
+
+    def _data_version_now(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @contextmanager
+    def _write(self, kind: str, key: str) -> Iterator[sqlite3.Connection]:
+        """Run a write and its change log entry in one transaction"""
+        with self._transaction() as conn:
+            yield conn
+            self._log_change(conn, kind, key)
+
+    def _log_change(self, conn: sqlite3.Connection, kind: str, key: str) -> None:
+        seq = conn.execute(
+            "INSERT INTO changes (origin, kind, key) VALUES (?, ?, ?)", (self.origin, kind, key)
+        ).lastrowid
+        conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - self.CHANGE_LOG_SIZE,))
+
+    def _put_row(self, conn: sqlite3.Connection, theme: Theme) -> None:
+        conn.execute(
+            "INSERT INTO themes (id, name, data, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, data = excluded.data, "
+            "updated_at = excluded.updated_at",
+            (theme.id, theme.name, theme.json(), theme.updated_at.isoformat())
+        )
+        self._log_change(conn, "theme", theme.id)
+
+    def get(self, theme_id: str) -> Optional[Theme]:
+        theme = self._cache.get(theme_id)
+        if theme is not None:
+            return theme
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM themes WHERE id = ?", (theme_id,)).fetchone()
+        if row is None:
+            return None
+        theme = Theme.parse_raw(row[0])
+        self._cache[theme_id] = theme
+        return theme
+
+    def get_by_name(self, name: str) -> Optional[Theme]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM themes WHERE name = ? ORDER BY rowid LIMIT 1", (name,)
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def list(self) -> List[Theme]:
+        themes = self._all
+        if themes is None:
+            with self._lock:
+                rows = self._conn.execute("SELECT id, data FROM themes ORDER BY rowid").fetchall()
+            themes = []
+            for theme_id, data in rows:
+                theme = self._cache.get(theme_id)
+                if theme is None:
+                    theme = Theme.parse_raw(data)
+                    self._cache[theme_id] = theme
+                themes.append(theme)
+            self._all = themes
+        return list(themes)
+
+    def put(self, theme: Theme) -> None:
+        with self._transaction() as conn:
+            self._put_row(conn, theme)
+        self._cache[theme.id] = theme
+        self._all = None
+
+    def delete(self, theme_id: str) -> None:
+        with self._write("theme", theme_id) as conn:
+            conn.execute("DELETE FROM themes WHERE id = ?", (theme_id,))
+            conn.execute("DELETE FROM theme_versions WHERE theme_id = ?", (theme_id,))
+            conn.execute("DELETE FROM version_nodes WHERE theme_id = ?", (theme_id,))
+        self._cache.pop(theme_id, None)
+        self._all = None
+
+    def _read_theme(self, conn: sqlite3.Connection, theme_id: Optional[str]) -> Optional[Theme]:
+        """Read a theme from the database, bypassing the cache"""
+        row = conn.execute("SELECT data FROM themes WHERE id = ?", (theme_id,)).fetchone()
+        return Theme.parse_raw(row[0]) if row else None
+
+    def _read_current(self, conn: sqlite3.Connection) -> Optional[str]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (CURRENT_THEME_KEY,)).fetchone()
+        return row[0] if row else None
+
+    def activate(self, theme_id: str) -> Tuple[Optional[Theme], Optional[Theme]]:
+        # Read and written under one write lock, so concurrent applies on other workers serialize
+        with self._transaction() as conn:
+            theme = self._read_theme(conn, theme_id)
+            if theme is None:
+                return None, None
+            current_theme_id = self._read_current(conn)
+            previous = self._read_theme(conn, current_theme_id) if current_theme_id != theme_id else None
+            if previous is not None:
+                previous = previous.copy(update={"is_active": False})
+                self._put_row(conn, previous)
+            theme = theme.copy(update={"is_active": True})
+            self._put_row(conn, theme)
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (CURRENT_THEME_KEY, theme_id)
+            )
+            self._log_change(conn, "meta", CURRENT_THEME_KEY)
+        for written in (previous, theme):
+            if written is not None:
+                self._cache[written.id] = written
+        self._meta[CURRENT_THEME_KEY] = theme_id
+        self._all = None
+        return theme, previous
+
+    def delete_inactive(self, theme_id: str) -> bool:
+        with self._transaction() as conn:
+            if self._read_current(conn) == theme_id:
+                return False
+            deleted = conn.execute("DELETE FROM themes WHERE id = ?", (theme_id,)).rowcount
+            if not deleted:
+                return False
+            conn.execute("DELETE FROM theme_versions WHERE theme_id = ?", (theme_id,))
+            conn.execute("DELETE FROM version_nodes WHERE theme_id = ?", (theme_id,))
+            self._log_change(conn, "theme", theme_id)
+        self._cache.pop(theme_id, None)
+        self._all = None
+        return True
+
+    def get_meta(self, key: str) -> Optional[str]:
+        if key in self._meta:
+            return self._meta[key]
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        value = row[0] if row else None
+        self._meta[key] = value
+        return value
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        with self._write("meta", key) as conn:
+            if value is None:
+                conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (key, value)
+                )
+        self._meta[key] = value
+
+    VERSION_COLUMNS = "version, operation, name, description, figma_url, components, created_at, based_on, asset_digests"
+    # Digests looked up per query when loading or sweeping nodes
+    NODE_QUERY_SIZE = 500
+
+    def _insert_version(self, conn: sqlite3.Connection, theme_id: str, version: ThemeVersion) -> None:
+        conn.execute(
+            f"INSERT INTO theme_versions (theme_id, {self.VERSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                theme_id, version.version, version.operation, version.name, version.description, version.figma_url,
+                self._store_node(conn, theme_id, version.components), version.created_at.isoformat(),
+                version.based_on, json.dumps(sorted(version.asset_digests))
+            )
+        )
+
+    def _remember_node(self, node: dict, digest: str, data: str) -> None:
+        self._nodes.setdefault(digest, node)
+        self._node_digests[id(node)] = (node, digest, data)
+
+    def _trim_node_cache(self) -> None:
+        # Only between versions, so a node being written or loaded is never dropped halfway
+        if len(self._nodes) > self.NODE_CACHE_SIZE:
+            self._nodes.clear()
+            self._node_digests.clear()
+
+    def _encode_node(self, node: dict) -> Tuple[str, str]:
+        """Get the digest and stored entries of a components object"""
+        known = self._node_digests.get(id(node))
+        if known is not None and known[0] is node:
+            return known[1], known[2]
+        entries = [
+            [key, None, self._encode_node(value)[0]] if isinstance(value, dict) else [key, value]
+            for key, value in node.items()
+        ]
+        data = json.dumps(entries, separators=(",", ":"))
+        # 128-bit digests keep the root nodes, rewritten by every edit, small
+        digest = hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+        self._remember_node(node, digest, data)
+        return digest, data
+
+    def _store_node(self, conn: sqlite3.Connection, theme_id: str, node: dict) -> str:
+        digest, data = self._encode_node(node)
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO version_nodes (theme_id, digest, data) VALUES (?, ?, ?)", (theme_id, digest, data)
+        ).rowcount
+        # A stored node always has its subtree stored, so only new nodes need their children written
+        if inserted:
+            for value in node.values():
+                if isinstance(value, dict):
+                    self._store_node(conn, theme_id, value)
+        return digest
+
+    def _read_nodes(self, conn: sqlite3.Connection, theme_id: str, digests: List[str]) -> Iterator[Tuple[str, str]]:
+        for start in range(0, len(digests), self.NODE_QUERY_SIZE):
+            chunk = digests[start:start + self.NODE_QUERY_SIZE]
+            yield from conn.execute(
+                f"SELECT digest, data FROM version_nodes WHERE theme_id = ? AND digest IN ({', '.join('?' * len(chunk))})",
+                (theme_id, *chunk)
+            )
+
+    def _load_node(self, conn: sqlite3.Connection, theme_id: str, digest: str) -> dict:
+        """Rebuild a components object, reusing the nodes already in memory"""
+        entries: Dict[str, list] = {}
+        encoded: Dict[str, str] = {}
+        pending = [digest]
+        while pending:
+            missing = [d for d in dict.fromkeys(pending) if d not in self._nodes and d not in entries]
+            pending = []
+            for node_digest, data in self._read_nodes(conn, theme_id, missing):
+                entries[node_digest] = json.loads(data)
+                encoded[node_digest] = data
+                pending.extend(entry[2] for entry in entries[node_digest] if len(entry) == 3)
+        return self._build_node(digest, entries, encoded)
+
+    def _build_node(self, digest: str, entries: Dict[str, list], encoded: Dict[str, str]) -> dict:
+        node = self._nodes.get(digest)
+        if node is None:
+            node = {
+                entry[0]: self._build_node(entry[2], entries, encoded) if len(entry) == 3 else entry[1]
+                for entry in entries[digest]
+            }
+            self._remember_node(node, digest, encoded[digest])
+        return node
+
+    def _sweep_nodes(self, conn: sqlite3.Connection, theme_id: str) -> None:
+        """Delete the nodes of a theme that no retained version reaches"""
+        reachable: Set[str] = set()
+        pending = [row[0] for row in conn.execute("SELECT components FROM theme_versions WHERE theme_id = ?", (theme_id,))]
+        while pending:
+            unvisited = list(set(pending) - reachable)
+            reachable.update(unvisited)
+            pending = []
+            for _, data in self._read_nodes(conn, theme_id, unvisited):
+                pending.extend(entry[2] for entry in json.loads(data) if len(entry) == 3)
+        stored = [row[0] for row in conn.execute("SELECT digest FROM version_nodes WHERE theme_id = ?", (theme_id,))]
+        conn.executemany(
+            "DELETE FROM version_nodes WHERE theme_id = ? AND digest = ?",
+            [(theme_id, digest) for digest in stored if digest not in reachable]
+        )
+
+    def add_version(
+        self, theme_id: str, version: ThemeVersion, max_versions: int, initial: Optional[ThemeVersion] = None
+    ) -> ThemeVersion:
+        # Numbered inside the write transaction, so concurrent workers never reuse a number
+        with self._transaction() as conn:
+            self._trim_node_cache()
+            latest = conn.execute(
+                "SELECT MAX(version) FROM theme_versions WHERE theme_id = ?", (theme_id,)
+            ).fetchone()[0]
+            if latest is None and initial is not None:
+                self._insert_version(conn, theme_id, initial._replace(version=1))
+                latest = 1
+            version = version._replace(version=(latest or 0) + 1)
+            self._insert_version(conn, theme_id, version)
+            trimmed = conn.execute(
+                "DELETE FROM theme_versions WHERE theme_id = ? AND version <= ?",
+                (theme_id, version.version - max_versions)
+            ).rowcount
+            # Swept once per `max_versions` versions, so the walk over the retained nodes stays amortized
+            if trimmed and version.version % max_versions == 0:
+                self._sweep_nodes(conn, theme_id)
+        return version
+
+    def get_version(self, theme_id: str, version: int) -> Optional[ThemeVersion]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.VERSION_COLUMNS} FROM theme_versions WHERE theme_id = ? AND version = ?",
+                (theme_id, version)
+            ).fetchone()
+            if row is None:
+                return None
+            number, operation, name, description, figma_url, root, created_at, based_on, asset_digests = row
+            self._trim_node_cache()
+            components = self._load_node(self._conn, theme_id, root)
+        return ThemeVersion(
+            version=number,
+            operation=operation,
+            name=name,
+            description=description,
+            figma_url=figma_url,
+            components=components,
+            created_at=datetime.fromisoformat(created_at),
+            based_on=based_on,
+            asset_digests=frozenset(json.loads(asset_digests))
+        )
+
+    def version_summaries(self, theme_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, operation, name, created_at, based_on FROM theme_versions "
+                "WHERE theme_id = ? ORDER BY version",
+                (theme_id,)
+            ).fetchall()
+        return [
+            {
+                "version": number,
+                "operation": operation,
+                "name": name,
+                "created_at": datetime.fromisoformat(created_at),
+                "based_on": based_on
+            }
+            for number, operation, name, created_at, based_on in rows
+        ]
+
+    def version_range(self, theme_id: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(version), MAX(version) FROM theme_versions WHERE theme_id = ?", (theme_id,)
+            ).fetchone()
+        return None if row[0] is None else (row[0], row[1])
+
+    def version_asset_digests(self, theme_id: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT asset_digests FROM theme_versions WHERE theme_id = ?", (theme_id,)
+            ).fetchall()
+        return set().union(*(json.loads(row[0]) for row in rows))
+
+    def sync(self) -> List[StoreChange]:
+        with self._lock:
+            # Moves only when another connection commits, so this process's own writes are skipped cheaply
+            data_version = self._data_version_now()
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+            oldest = self._conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT seq, origin, kind, key FROM changes WHERE seq > ? ORDER BY seq", (self._seq,)
+            ).fetchall()
+            missed = oldest is not None and oldest > self._seq + 1
+            if rows:
+                self._seq = rows[-1][0]
+            if missed:
+                self._cache.clear()
+                self._meta.clear()
+                self._all = None
+                return [StoreChange("reset", None)]
+            changes = []
+            for _, origin, kind, key in rows:
+                if origin == self.origin:
+                    continue
+                if kind == "theme":
+                    self._cache.pop(key, None)
+                    self._all = None
+                else:
+                    self._meta.pop(key, None)
+                change = StoreChange(kind, key)
+                if change not in changes:
+                    changes.append(change)
+            return changes
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        logger.info("Closed theme store at %s", self.path)
+
+def create_theme_store() -> ThemeStore:
+    """Create the theme store configured in settings"""
+    if settings.THEME_STORE == "memory":
+        return MemoryThemeStore()
+    if settings.THEME_STORE == "sqlite":
+        return SQLiteThemeStore(settings.THEME_DB_PATH)
+    raise ValueError(f"Unknown theme store backend: {settings.THEME_STORE}")
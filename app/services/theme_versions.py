@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Set
+from ..models.theme import Theme
+
+if TYPE_CHECKING:
+    from .theme_store import ThemeStore
+
+class ThemeVersion(NamedTuple):
+    version: int
+    # "initial", "create", "update", "patch" or "rollback"
+    operation: str
+    name: str
+    description: Optional[str]
+    figma_url: str
+    # Shared with neighbouring versions wherever unchanged; never modified in place
+    components: Dict[str, Any]
+    created_at: datetime
+    # The version a rollback restored
+    based_on: Optional[int]
+    asset_digests: FrozenSet[str]
+
+    def summary(self) -> dict:
+        return {
+            "version": self.version,
+            "operation": self.operation,
+            "name": self.name,
+            "created_at": self.created_at,
+            "based_on": self.based_on
+        }
+
+    def document(self) -> dict:
+        """The versioned content of the theme"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "figma_url": self.figma_url,
+            "components": self.components
+        }
+
+class ThemeVersionStore:
+    """Version histories of all themes, kept in the theme store next to the themes.
+
+    Version numbers are assigned by the store, so every worker sharing it
+    lists, diffs and rolls back the same versions, and history survives
+    restarts. Versions this worker recorded or loaded are also cached in
+    memory. Patches and rollbacks build their components from the previous
+    ones without copying unchanged branches, so cached versions of a theme
+    share everything an edit did not touch. A theme's history starts from
+    its stored state, recorded as the "initial" version with its first
+    edit, and holds at most `max_versions` versions.
+    """
+
+    def __init__(self, store: "ThemeStore", max_versions: int, asset_digests: Callable[[Dict[str, Any]], Set[str]]):
+        self.store = store
+        self.max_versions = max_versions
+        self._asset_digests = asset_digests
+        self._cache: Dict[str, Dict[int, ThemeVersion]] = {}
+
+    def list(self, theme: Theme) -> List[dict]:
+        """Summarize a theme's retained versions, oldest first"""
+        return self.store.version_summaries(theme.id) or [self._version(1, "initial", theme).summary()]
+
+    def get(self, theme: Theme, version: int) -> Optional[ThemeVersion]:
+        retained = self.store.version_range(theme.id)
+        if retained is None:
+            # No edit yet: the stored theme is the initial version
+            return self._version(1, "initial", theme) if version == 1 else None
+        oldest, latest = retained
+        # Versions trimmed by any worker are gone, even if still cached here
+        if not oldest <= version <= latest:
+            return None
+        cached = self._cache.get(theme.id, {}).get(version)
+        if cached is None:
+            cached = self.store.get_version(theme.id, version)
+            if cached is not None:
+                self._remember(theme.id, cached)
+        return cached
+
+    def latest(self, theme: Theme) -> ThemeVersion:
+        retained = self.store.version_range(theme.id)
+        return self.get(theme, retained[1] if retained else 1)
+
+    def record(self, theme: Theme, operation: str, previous: Optional[Theme] = None, based_on: Optional[int] = None) -> ThemeVersion:
+        """Add the theme's new state as a version, after `previous` if its history is not yet started"""
+        initial = self._version(1, "initial", previous) if previous is not None else None
+        version = self.store.add_version(theme.id, self._version(0, operation, theme, based_on), self.max_versions, initial)
+        self._remember(theme.id, version)
+        return version
+
+    def asset_digests(self, theme_id: str) -> Set[str]:
+        """Digests of the assets the retained versions of a theme use, whichever worker recorded them"""
+        return self.store.version_asset_digests(theme_id)
+
+    def discard(self, theme_id: str) -> None:
+        """Forget the cached versions of a deleted theme"""
+        self._cache.pop(theme_id, None)
+
+    def _remember(self, theme_id: str, version: ThemeVersion) -> None:
+        versions = self._cache.setdefault(theme_id, {})
+        versions[version.version] = version
+        while len(versions) > self.max_versions:
+            del versions[min(versions)]
+
+    def _version(self, number: int, operation: str, theme: Theme, based_on: Optional[int] = None) -> ThemeVersion:
+        return ThemeVersion(
+            version=number,
+            operation=operation,
+            name=theme.name,
+            description=theme.description,
+            figma_url=theme.figma_url,
+            components=theme.components,
+            created_at=theme.updated_at,
+            based_on=based_on,
+            asset_digests=frozenset(self._asset_digests(theme.components))
+        )
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+class AssetIndex:
+    """Durable reference index between themes and content-addressed assets.
+
+    Each row records that a theme uses the asset blob with a given digest;
+    a blob's reference count is the number of themes using it. Methods that
+    drop references return the digests left with no references, and
+    `collect` removes those blobs. Taking a reference and removing a blob
+    both hold the database write lock, so a blob is never removed between
+    a build finding it stored and that build referencing it.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS asset_refs (
+            theme_id TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            PRIMARY KEY (theme_id, digest)
+        );
+        CREATE INDEX IF NOT EXISTS idx_asset_refs_digest ON asset_refs (digest);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        logger.info("Opened asset index at %s", path)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def theme_assets(self, theme_id: str) -> List[str]:
+        """List the digests of the assets a theme references"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest FROM asset_refs WHERE theme_id = ? ORDER BY digest", (theme_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def ref_count(self, digest: str) -> int:
+        """Count the themes referencing an asset"""
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM asset_refs WHERE digest = ?", (digest,)).fetchone()
+        return row[0]
+
+    def reference(self, theme_id: str, digest: str, check: Callable[[], T]) -> T:
+        """Record that a theme references an asset and run `check`, e.g. loading the stored asset, in the same transaction"""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO asset_refs (theme_id, digest) VALUES (?, ?)", (theme_id, digest))
+            return check()
+
+    def set_refs(self, theme_id: str, digests: Iterable[str], retained: Optional[Callable[[], Iterable[str]]] = None) -> List[str]:
+        """Replace a theme's references, returning digests that became unreferenced.
+
+        `retained` is called inside the write transaction, so digests another
+        process records before its own `set_refs` are never dropped here.
+        """
+        wanted = set(digests)
+        with self._transaction() as conn:
+            if retained is not None:
+                wanted.update(retained())
+            dropped = set(self.theme_assets(theme_id)) - wanted
+            conn.executemany(
+                "DELETE FROM asset_refs WHERE theme_id = ? AND digest = ?",
+                [(theme_id, digest) for digest in dropped]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO asset_refs (theme_id, digest) VALUES (?, ?)",
+                [(theme_id, digest) for digest in wanted]
+            )
+            return [digest for digest in sorted(dropped) if self.ref_count(digest) == 0]
+
+    def release(self, theme_id: str) -> List[str]:
+        """Drop every reference held by a theme, returning digests that became unreferenced"""
+        return self.set_refs(theme_id, ())
+
+    def collect(self, digests: Iterable[str], remove: Callable[[str], None]) -> List[str]:
+        """Remove the blobs that are still unreferenced, checked under the write lock; returns the removed digests"""
+        removed = []
+        with self._transaction():
+            for digest in digests:
+                # Another build may have referenced it since it was dropped
+                if self.ref_count(digest) == 0:
+                    remove(digest)
+                    removed.append(digest)
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        logger.info("Closed asset index at %s", self.path)
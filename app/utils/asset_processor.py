@@ -1,117 +1,650 @@
 import os
 import uuid
-import aiofiles
-import aiohttp
-from typing import Dict, List, Optional
-from PIL import Image
+import tempfile
+import asyncio
+import json
+import gzip
+import time
+import hashlib
+import logging
+import concurrent.futures
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Union
+from urllib.parse import urlsplit
 from io import BytesIO
 from fastapi import HTTPException
+from ..config import settings
+from .http_client import HTTPClient
+from .asset_index import AssetIndex
+from .metrics import ASSET_IMAGES, ASSET_STAGE_SECONDS
+from .lazy_import import lazy_import, optional_lazy_import
+
+# Image and file libraries are loaded by the first build that processes assets
+Image = lazy_import("PIL.Image")
+aiofiles = lazy_import("aiofiles")
+# Brotli siblings are optional
+brotli = optional_lazy_import("brotli")
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], None]
+
+FAIL_FAST = "fail_fast"
+BEST_EFFORT = "best_effort"
+
+PROCESS_EXECUTOR = "process"
+THREAD_EXECUTOR = "thread"
+INLINE_EXECUTOR = "inline"
+
+MAX_IMAGE_SIZE = 2000
+# Images with at most this many colors (icons, flat art) are encoded losslessly
+LOSSLESS_MAX_COLORS = 256
+# Give up looking for an image header after this many bytes
+HEADER_PROBE_LIMIT = 1024 * 1024
+ACCEPTED_FORMATS = {"PNG", "JPEG", "GIF", "WEBP", "BMP", "TIFF"}
+
+ASSET_URL_PREFIX = "/assets/"
+
+PNG = "png"
+FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    PNG: ("PNG", "image/png")
+}
+# Order in which browsers should try formats
+FORMAT_PREFERENCE = ["avif", "webp", PNG]
+
+class DownloadedImage(NamedTuple):
+    digest: str
+    size: int
+    # Small bodies stay in memory, larger ones are spilled to a temporary file
+    data: Optional[bytes]
+    path: Optional[str]
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        return self.data if self.data is not None else self.path
+
+def probe_image_header(prefix: bytes, max_pixels: int, complete: bool = False) -> bool:
+    """Check an image's format and dimensions from the start of its bytes, without decoding it.
+
+    Returns False while more bytes are needed to read the header and raises
+    ValueError once the image is known to be unacceptable.
+    """
+    try:
+        with Image.open(BytesIO(prefix)) as image:
+            image_format, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise ValueError("Image dimensions exceed the decoder's safety limit")
+    except (Image.UnidentifiedImageError, OSError, SyntaxError, EOFError):
+        if complete or len(prefix) >= HEADER_PROBE_LIMIT:
+            raise ValueError("Unrecognized image format")
+        return False
+    if image_format not in ACCEPTED_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    if width * height > max_pixels:
+        raise ValueError(f"Image is {width}x{height}, over the {max_pixels} pixel limit")
+    return True
+
+def prepare_image(image: "Image.Image") -> "Image.Image":
+    """Normalize the color mode, keeping alpha, and cap the size"""
+    if image.format == "JPEG":
+        # Let the JPEG decoder downscale while decoding instead of after
+        image.draft("RGB", (MAX_IMAGE_SIZE, MAX_IMAGE_SIZE))
+    if image.mode == "P":
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    
+    # Resize if too large
+    if image.width > MAX_IMAGE_SIZE or image.height > MAX_IMAGE_SIZE:
+        image.thumbnail((MAX_IMAGE_SIZE, MAX_IMAGE_SIZE), Image.Resampling.LANCZOS)
+    
+    return image
+
+def needs_lossless(image: "Image.Image") -> bool:
+    """Check whether an image is flat artwork that lossy codecs would damage"""
+    return image.getcolors(LOSSLESS_MAX_COLORS) is not None
+
+def variant_widths(width: int, widths: List[int]) -> List[int]:
+    """Get the ladder widths narrower than an image, plus its own width"""
+    return sorted({w for w in widths if w < width} | {width})
+
+def encode_options(image_format: str, quality: int, lossless: bool) -> dict:
+    if image_format == PNG:
+        return {"optimize": True}
+    if image_format == "webp":
+        return {"quality": quality, "lossless": lossless, "method": 4}
+    return {"quality": 100 if lossless else quality}
+
+def encode_variants(
+    source: Union[bytes, str],
+    directory: str,
+    digest: str,
+    formats: List[str],
+    widths: List[int],
+    quality: Dict[str, int],
+    max_pixels: Optional[int] = None
+) -> List[dict]:
+    """Decode an image once and write every format at every ladder width; runs in an executor worker.
+
+    `source` is the image bytes or the path of a spilled download. Each
+    width is resized once and encoded in every format. PNG variants are
+    also written for images that need lossless encoding, or when no other
+    format is configured.
+    """
+    image = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+    # Opening only reads the header, so oversized images are refused before decoding
+    if max_pixels is not None and image.width * image.height > max_pixels:
+        raise ValueError(f"Image is {image.width}x{image.height}, over the {max_pixels} pixel limit")
+    image = prepare_image(image)
+    lossless = needs_lossless(image)
+    image_formats = formats + [PNG] if lossless or not formats else formats
+    
+    variants = []
+    for width in variant_widths(image.width, widths):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        for image_format in image_formats:
+            filename = f"{digest}-{width}.{image_format}"
+            filepath = os.path.join(directory, filename)
+            
+            # Write beside the target and rename so readers never see a partial file
+            tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+            resized.save(tmp_path, FORMATS[image_format][0], **encode_options(image_format, quality.get(image_format, 0), lossless))
+            os.replace(tmp_path, filepath)
+            variants.append({
+                "format": image_format,
+                "width": width,
+                "height": height,
+                "file": filename,
+                "bytes": os.path.getsize(filepath),
+                "lossless": lossless or image_format == PNG
+            })
+    return variants
 
 class AssetProcessor:
-    def __init__(self):
-        self.assets_dir = os.path.join("public", "assets")
+    """Downloads, optimizes and stores theme images.
+
+    Images are stored content-addressed: files are named by the SHA-256 of
+    the downloaded bytes and sharded by its first two hex digits, so an
+    image shared by several themes or re-imported is processed and stored
+    once. Each image is encoded in every configured format at a ladder of
+    widths, and a `<digest>.json` manifest lists the variants with ready
+    `srcset` strings. `index` records which themes reference which images,
+    and an image's files are removed once no theme references it.
+    """
+
+    def __init__(self, http_client: Optional[HTTPClient] = None, index: Optional[AssetIndex] = None):
+        self.assets_dir = settings.ASSETS_DIR
+        self.index = index if index is not None else AssetIndex(settings.ASSET_INDEX_PATH)
+        self._owns_http_client = http_client is None
+        self.http_client = http_client if http_client is not None else HTTPClient()
+        self.concurrency = settings.ASSET_CONCURRENCY
+        self.per_host_concurrency = settings.ASSET_PER_HOST_CONCURRENCY
+        self.failure_policy = settings.ASSET_FAILURE_POLICY
+        self.executor_kind = settings.ASSET_EXECUTOR
+        self.workers = settings.ASSET_WORKERS or os.cpu_count() or 1
+        self.process_queue_size = settings.ASSET_PROCESS_QUEUE_SIZE
+        self.formats = [image_format for image_format in settings.ASSET_FORMATS if image_format != PNG]
+        self.widths = settings.ASSET_WIDTHS
+        self.quality = {"webp": settings.ASSET_WEBP_QUALITY, "avif": settings.ASSET_AVIF_QUALITY}
+        self.max_bytes = settings.ASSET_MAX_BYTES
+        self.max_pixels = settings.ASSET_MAX_PIXELS
+        self.spill_bytes = settings.ASSET_SPILL_BYTES
+        self.chunk_size = settings.ASSET_CHUNK_SIZE
+        self.spill_dir = settings.ASSET_SPILL_DIR or None
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._processing_slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Images waiting for a download slot, and images being downloaded or processed
+        self.images_queued = 0
+        self.images_active = 0
         self.ensure_assets_directory()
 
+    async def close(self) -> None:
+        """Close the HTTP pool if this processor created it, and stop image workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._owns_http_client:
+            await self.http_client.close()
+        self.index.close()
+
+    def _get_executor(self) -> Optional[Executor]:
+        """Get the image processing pool, creating it on first use"""
+        if self.executor_kind == INLINE_EXECUTOR:
+            return None
+        if self._executor is None:
+            if self.executor_kind == PROCESS_EXECUTOR:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            elif self.executor_kind == THREAD_EXECUTOR:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="asset")
+            else:
+                raise ValueError(f"Unknown asset executor: {self.executor_kind}")
+        return self._executor
+
     def ensure_assets_directory(self):
         """Ensure the assets directory exists"""
         os.makedirs(self.assets_dir, exist_ok=True)
 
-    async def process_assets(self, components: Dict[str, dict]) -> Dict[str, dict]:
-        """Process and store assets from component data"""
-        processed_components = {}
+    async def process_assets(
+        self,
+        components: Dict[str, dict],
+        progress: Optional[ProgressCallback] = None,
+        policy: Optional[str] = None,
+        theme_id: Optional[str] = None
+    ) -> Dict[str, dict]:
+        """Process and store assets from component data.
+
+        Every distinct image URL is downloaded once, concurrently, within the
+        global and per-host limits. Components are rebuilt in their original
+        order regardless of completion order; image fields point at each
+        image's fallback variant and `imageManifests` maps them to variant
+        manifests. With the fail-fast policy the first failure cancels the
+        remaining downloads; with best-effort a failed image keeps its source
+        URL.
+        
+        With a `theme_id` each image is referenced by that theme as soon as
+        its download is hashed, before a stored copy is reused or a new one
+        written, so it survives garbage collection until the build is
+        committed with `commit_theme_assets` or released with
+        `delete_theme_assets`.
+        """
+        image_urls = self._collect_image_urls(components)
+        manifests = await self._process_images(image_urls, progress, policy or self.failure_policy, theme_id)
         
+        processed_components = {}
         for component_name, component_data in components.items():
-            processed_data = await self._process_component_assets(component_name, component_data)
-            processed_components[component_name] = processed_data
+            processed_components[component_name] = self._process_component_assets(component_data, manifests)
         
+        report = self.build_report(manifest for manifest in manifests.values() if manifest is not None)
+        logger.info(
+            "Stored %d assets: %d source bytes, %d bytes across all variants",
+            report["assets"], report["source_bytes"], report["stored_bytes"],
+            extra={"assets": report["assets"], "source_bytes": report["source_bytes"], "stored_bytes": report["stored_bytes"]}
+        )
         return processed_components
 
-    async def _process_component_assets(self, component_name: str, component_data: dict) -> dict:
-        """Process assets for a single component"""
+    async def commit_theme_assets(
+        self, theme_id: str, components: Dict[str, dict], retained: Optional[Callable[[], Iterable[str]]] = None
+    ) -> None:
+        """Make a theme reference exactly the assets its components (and the `retained` digests) use, removing orphans"""
+        self._remove_blobs(self.index.set_refs(theme_id, self.asset_digests(components), retained))
+
+    def asset_digests(self, components: Dict[str, dict]) -> Set[str]:
+        """Get the digests of the stored assets referenced by components"""
+        digests = set()
+        for component_data in components.values():
+            paths = list(component_data.get("images", {}).values())
+            paths.extend(component_data.get("imageManifests", {}).values())
+            if "backgroundImage" in component_data:
+                paths.append(component_data["backgroundImage"])
+            for path in paths:
+                if isinstance(path, str) and path.startswith(ASSET_URL_PREFIX):
+                    # File names start with the 64-digit SHA-256 of the source image
+                    digests.add(os.path.basename(path)[:64])
+        return digests
+
+    def asset_file(self, filename: str) -> str:
+        """Get the file path of a stored asset file"""
+        return os.path.join(self.assets_dir, filename[:2], filename)
+
+    def asset_url(self, filename: str) -> str:
+        """Get the public path of a stored asset file"""
+        return f"{ASSET_URL_PREFIX}{filename[:2]}/{filename}"
+
+    async def asset_report(self, digests: Iterable[str]) -> dict:
+        """Summarize the stored bytes of a set of assets, per format, against their sources"""
+        manifests = []
+        for digest in digests:
+            manifest = await self._read_manifest(digest)
+            if manifest is not None:
+                manifests.append(manifest)
+        return self.build_report(manifests)
+
+    def build_report(self, manifests: Iterable[dict]) -> dict:
+        """Compare full-width variant sizes of each format with the source images"""
+        report = {"assets": 0, "source_bytes": 0, "stored_bytes": 0, "formats": {}}
+        for manifest in manifests:
+            report["assets"] += 1
+            report["source_bytes"] += manifest["sourceBytes"]
+            largest: Dict[str, dict] = {}
+            for variant in manifest["variants"]:
+                report["stored_bytes"] += variant["bytes"]
+                if variant["width"] >= largest.get(variant["format"], {}).get("width", 0):
+                    largest[variant["format"]] = variant
+            for image_format, variant in largest.items():
+                totals = report["formats"].setdefault(image_format, {"assets": 0, "source_bytes": 0, "bytes": 0})
+                totals["assets"] += 1
+                totals["source_bytes"] += manifest["sourceBytes"]
+                totals["bytes"] += variant["bytes"]
+        for totals in report["formats"].values():
+            totals["savings"] = round(1 - totals["bytes"] / totals["source_bytes"], 4) if totals["source_bytes"] else 0.0
+        return report
+
+    def _collect_image_urls(self, components: Dict[str, dict]) -> List[str]:
+        """List the distinct image URLs referenced by components, in order"""
+        image_urls: Dict[str, None] = {}
+        for component_data in components.values():
+            if "backgroundImage" in component_data:
+                image_urls[component_data["backgroundImage"]] = None
+            for image_url in component_data.get("images", {}).values():
+                image_urls[image_url] = None
+        return list(image_urls)
+
+    def _process_component_assets(self, component_data: dict, manifests: Dict[str, Optional[dict]]) -> dict:
+        """Replace a component's image URLs with processed asset paths"""
         processed_data = component_data.copy()
+        image_manifests = {}
+        
+        def resolve(field: str, image_url: str) -> str:
+            manifest = manifests[image_url]
+            if manifest is None:
+                return image_url
+            image_manifests[field] = self.asset_url(f"{manifest['digest']}.json")
+            return manifest["src"]
         
         # Process background images
         if "backgroundImage" in component_data:
-            image_url = component_data["backgroundImage"]
-            processed_data["backgroundImage"] = await self._download_and_process_image(image_url)
+            processed_data["backgroundImage"] = resolve("backgroundImage", component_data["backgroundImage"])
         
         # Process other image assets
         if "images" in component_data:
-            processed_images = {}
-            for image_name, image_url in component_data["images"].items():
-                processed_images[image_name] = await self._download_and_process_image(image_url)
-            processed_data["images"] = processed_images
+            processed_data["images"] = {
+                image_name: resolve(image_name, image_url)
+                for image_name, image_url in component_data["images"].items()
+            }
         
+        if image_manifests:
+            processed_data["imageManifests"] = image_manifests
         return processed_data
 
-    async def _download_and_process_image(self, image_url: str) -> str:
-        """Download, process, and store an image asset"""
+    async def _process_images(
+        self, image_urls: List[str], progress: Optional[ProgressCallback], policy: str, theme_id: Optional[str] = None
+    ) -> Dict[str, Optional[dict]]:
+        """Download and process images concurrently, mapping each URL to its variant manifest"""
+        if policy not in (FAIL_FAST, BEST_EFFORT):
+            raise ValueError(f"Unknown asset failure policy: {policy}")
+        total = len(image_urls)
+        done = 0
+        
+        async def process(image_url: str) -> dict:
+            nonlocal done
+            waiting = True
+            queued = time.perf_counter()
+            self.images_queued += 1
+            try:
+                async with self._download_slot(image_url):
+                    waiting = False
+                    self.images_queued -= 1
+                    self.images_active += 1
+                    ASSET_STAGE_SECONDS.labels("queue").observe(time.perf_counter() - queued)
+                    try:
+                        return await self._download_and_process_image(image_url, theme_id)
+                    finally:
+                        self.images_active -= 1
+            finally:
+                if waiting:
+                    # Cancelled before a download slot was free
+                    self.images_queued -= 1
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+        
+        tasks = [asyncio.create_task(process(image_url)) for image_url in image_urls]
+        if policy == FAIL_FAST:
+            try:
+                return dict(zip(image_urls, await asyncio.gather(*tasks)))
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        
+        manifests = {}
+        for image_url, outcome in zip(image_urls, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(outcome, BaseException):
+                logger.warning("Keeping source URL for failed asset %s: %s", image_url, outcome)
+                manifests[image_url] = None
+            else:
+                manifests[image_url] = outcome
+        return manifests
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Semaphores are bound to the loop they are first used on
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._host_semaphores = {}
+            self._processing_slots = asyncio.Semaphore(self.workers + self.process_queue_size)
+            self._loop = loop
+
+    @asynccontextmanager
+    async def _download_slot(self, image_url: str):
+        """Hold a global and a per-host download slot"""
+        self._bind_loop()
+        host = urlsplit(image_url).netloc
+        host_semaphore = self._host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        async with self._semaphore, host_semaphore:
+            yield
+
+    async def _download_and_process_image(self, image_url: str, theme_id: Optional[str] = None) -> dict:
+        """Download, process, and store an image asset, referenced by `theme_id` from the moment it is found or written"""
+        downloaded = None
         try:
-            # Generate unique filename
-            filename = f"{uuid.uuid4()}.png"
-            filepath = os.path.join(self.assets_dir, filename)
-            
-            # Download image
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url) as response:
-                    if response.status != 200:
-                        raise HTTPException(
-                            status_code=response.status,
-                            detail="Failed to download image asset"
-                        )
-                    
-                    image_data = await response.read()
-            
-            # Process image
-            image = Image.open(BytesIO(image_data))
+            with ASSET_STAGE_SECONDS.labels("download").time():
+                downloaded = await self._download_image(image_url)
             
-            # Optimize image
-            image = self._optimize_image(image)
+            # Identical source images share one set of variants
+            if theme_id is not None:
+                # Referenced in the transaction that finds the stored copy, so no concurrent collection removes it
+                manifest = self.index.reference(theme_id, downloaded.digest, lambda: self._load_manifest(downloaded.digest))
+            else:
+                manifest = await self._read_manifest(downloaded.digest)
+            if manifest is not None:
+                logger.debug("Reusing stored asset %s", downloaded.digest, extra={"digest": downloaded.digest})
+                ASSET_IMAGES.labels("reused").inc()
+                return manifest
             
-            # Save processed image
-            image.save(filepath, "PNG", optimize=True)
-            
-            # Return relative path
-            return f"/assets/{filename}"
+            # Decode, resize and encode off the event loop
+            with ASSET_STAGE_SECONDS.labels("process").time():
+                variants = await self._process_image(downloaded.source, downloaded.digest)
+            with ASSET_STAGE_SECONDS.labels("store").time():
+                manifest = self._build_manifest(downloaded.digest, downloaded.size, variants)
+                await self._write_manifest(manifest)
+            ASSET_IMAGES.labels("processed").inc()
+            return manifest
             
         except Exception as e:
+            ASSET_IMAGES.labels("failed").inc()
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to process image asset: {str(e)}"
             )
+        finally:
+            if downloaded is not None and downloaded.path is not None:
+                os.remove(downloaded.path)
 
-    def _optimize_image(self, image: Image.Image) -> Image.Image:
-        """Optimize image for web use"""
-        # Convert to RGB if necessary
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-        
-        # Resize if too large
-        max_size = 2000
-        if image.width > max_size or image.height > max_size:
-            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    async def _download_image(self, image_url: str) -> DownloadedImage:
+        """Stream an image body, enforcing the byte and pixel limits as it arrives.
+
+        The body is hashed chunk by chunk. Its header is checked as soon as
+        enough bytes are in, so an image with oversized dimensions is refused
+        without downloading the rest. Bodies over `spill_bytes` continue into
+        a temporary file, so memory use per download stays bounded.
+        """
+        async with self.http_client.request("GET", image_url) as response:
+            if response.status != 200:
+                raise HTTPException(
+                    status_code=response.status,
+                    detail="Failed to download image asset"
+                )
+            if response.content_length is not None and response.content_length > self.max_bytes:
+                raise ValueError(f"Image is {response.content_length} bytes, over the {self.max_bytes} byte limit")
+            
+            digest = hashlib.sha256()
+            buffer = bytearray()
+            size = 0
+            header_checked = False
+            path = None
+            spill = None
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"Image exceeds the {self.max_bytes} byte limit")
+                    digest.update(chunk)
+                    if spill is not None:
+                        await spill.write(chunk)
+                        continue
+                    buffer += chunk
+                    if not header_checked:
+                        header_checked = probe_image_header(bytes(buffer), self.max_pixels)
+                    if len(buffer) > self.spill_bytes:
+                        fd, path = tempfile.mkstemp(suffix=".download", dir=self.spill_dir)
+                        os.close(fd)
+                        spill = await aiofiles.open(path, "wb")
+                        await spill.write(bytes(buffer))
+                        buffer = bytearray()
+                if not header_checked and spill is None:
+                    probe_image_header(bytes(buffer), self.max_pixels, complete=True)
+            except BaseException:
+                if spill is not None:
+                    await spill.close()
+                    os.remove(path)
+                raise
+            if spill is not None:
+                await spill.close()
+                return DownloadedImage(digest.hexdigest(), size, None, path)
+            return DownloadedImage(digest.hexdigest(), size, bytes(buffer), None)
+
+    async def _process_image(self, source: Union[bytes, str], digest: str) -> List[dict]:
+        """Encode all of an image's variants in one worker pool task, decoding it once.
+
+        An image holds one processing slot while it is encoded; the download
+        slot is still held while waiting for it, so a saturated pool also
+        slows downloads and bounds the image data held in memory.
+        """
+        directory = os.path.dirname(self.asset_file(digest))
+        os.makedirs(directory, exist_ok=True)
+        job = (source, directory, digest, self.formats, self.widths, self.quality, self.max_pixels)
+        executor = self._get_executor()
+        if executor is None:
+            return encode_variants(*job)
+        self._bind_loop()
+        loop = asyncio.get_running_loop()
+        async with self._processing_slots:
+            return await loop.run_in_executor(executor, encode_variants, *job)
+
+    def _build_manifest(self, digest: str, source_bytes: int, variants: List[dict]) -> dict:
+        """Describe an image's variants, grouped into srcset strings per MIME type"""
+        variants.sort(key=lambda variant: (FORMAT_PREFERENCE.index(variant["format"]), variant["width"]))
+        sources = []
+        for image_format in FORMAT_PREFERENCE:
+            candidates = [variant for variant in variants if variant["format"] == image_format]
+            if not candidates:
+                continue
+            sources.append({
+                "type": FORMATS[image_format][1],
+                "srcset": ", ".join(f"{self.asset_url(variant['file'])} {variant['width']}w" for variant in candidates)
+            })
+        for variant in variants:
+            variant["url"] = self.asset_url(variant.pop("file"))
         
-        return image
+        # Lossless images fall back to PNG, others to the widest variant of the preferred format
+        lossless = any(variant["format"] == PNG for variant in variants)
+        fallback_format = PNG if lossless else next(
+            (image_format for image_format in self.formats if any(variant["format"] == image_format for variant in variants)),
+            variants[-1]["format"]
+        )
+        fallback = max(
+            (variant for variant in variants if variant["format"] == fallback_format),
+            key=lambda variant: variant["width"]
+        )
+        return {
+            "digest": digest,
+            "sourceBytes": source_bytes,
+            "width": fallback["width"],
+            "height": fallback["height"],
+            "lossless": lossless,
+            "src": fallback["url"],
+            "sources": sources,
+            "variants": variants
+        }
+
+    async def _read_manifest(self, digest: str) -> Optional[dict]:
+        """Load an image's manifest, or None if the image is not stored"""
+        try:
+            async with aiofiles.open(self.asset_file(f"{digest}.json"), "r") as f:
+                return self._parse_manifest(digest, await f.read())
+        except FileNotFoundError:
+            return None
+
+    def _load_manifest(self, digest: str) -> Optional[dict]:
+        try:
+            with open(self.asset_file(f"{digest}.json"), "r") as f:
+                return self._parse_manifest(digest, f.read())
+        except FileNotFoundError:
+            return None
+
+    def _parse_manifest(self, digest: str, data: str) -> Optional[dict]:
+        try:
+            return json.loads(data)
+        except ValueError:
+            logger.warning("Discarding unreadable asset manifest %s", digest, extra={"digest": digest})
+            return None
+
+    async def _write_manifest(self, manifest: dict) -> None:
+        """Write a manifest after its variants, so its presence means the image is complete.
+
+        Precompressed `.gz` (and `.br` when brotli is installed) siblings
+        are written first for the static asset server to negotiate.
+        """
+        filepath = self.asset_file(f"{manifest['digest']}.json")
+        payload = json.dumps(manifest).encode("utf-8")
+        await self._write_file(f"{filepath}.gz", gzip.compress(payload, compresslevel=9))
+        if brotli is not None:
+            await self._write_file(f"{filepath}.br", brotli.compress(payload, quality=11))
+        await self._write_file(filepath, payload)
+
+    async def _write_file(self, filepath: str, data: bytes) -> None:
+        tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(data)
+        os.replace(tmp_path, filepath)
 
     async def delete_theme_assets(self, theme_id: str) -> None:
-        """Delete all assets associated with a theme"""
+        """Release a theme's assets, deleting those no other theme uses"""
         try:
-            # Get list of asset files for the theme
-            theme_assets = self._get_theme_assets(theme_id)
-            
-            # Delete each asset file
-            for asset_path in theme_assets:
-                if os.path.exists(asset_path):
-                    os.remove(asset_path)
-                    
+            self._remove_blobs(self.index.release(theme_id))
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to delete theme assets: {str(e)}"
             )
 
-    def _get_theme_assets(self, theme_id: str) -> List[str]:
-        """Get list of asset files for a theme"""
-        # This is a placeholder implementation
-        # In a real application, you would maintain a database of asset-theme relationships
-        return [] 
\ No newline at end of file
+    def _remove_blobs(self, digests: Iterable[str]) -> None:
+        """Delete the manifest and variants of assets still unreferenced once the index is locked"""
+        self.index.collect(digests, self._remove_blob)
+
+    def _remove_blob(self, digest: str) -> None:
+        directory = os.path.dirname(self.asset_file(digest))
+        try:
+            filenames = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        # The manifest goes first so a half-removed image is never reused
+        filenames.sort(key=lambda filename: not filename.endswith(".json"))
+        for filename in filenames:
+            if filename.startswith(digest):
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except FileNotFoundError:
+                    pass
+        logger.info("Removed unreferenced asset %s", digest, extra={"digest": digest})
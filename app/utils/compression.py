@@ -0,0 +1,143 @@
+import gzip
+from typing import Dict, Optional
+import anyio
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..config import settings
+from ..services.response_cache import CachedResponse
+from .http_cache import accepted_encodings, cached_body_response, encoded_etag, etag_matches
+from .lazy_import import optional_lazy_import
+
+brotli = optional_lazy_import("brotli")
+
+# Content codings in order of preference; Brotli only when it is installed
+ENCODINGS = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Bodies larger than this are compressed on a worker thread rather than on the event loop
+OFFLOAD_BYTES = 64 * 1024
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    """Pick the preferred content coding the client accepts, or None for the identity body"""
+    accepted = accepted_encodings(header)
+    return next((encoding for encoding in ENCODINGS if encoding in accepted), None)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # A fixed mtime keeps the output, like the body it came from, identical on every worker
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+async def compress_async(body: bytes, encoding: str) -> bytes:
+    """Compress a body, on a worker thread when it is large"""
+    if len(body) >= OFFLOAD_BYTES:
+        return await anyio.to_thread.run_sync(compress, body, encoding)
+    return compress(body, encoding)
+
+async def compressed_body_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str,
+    encoded: Dict[str, bytes],
+    cache_control: str = "no-cache",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serve a cached body in the client's preferred coding, compressing each coding once into `encoded`"""
+    encoding = None
+    if len(body) >= settings.COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None:
+        # Left to the middleware, which marks the identity body as varying by Accept-Encoding
+        return cached_body_response(request, body, etag, media_type, cache_control, headers)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    coded_etag = encoded_etag(etag, encoding)
+    if etag_matches(request, etag):
+        # Not modified: confirm the tag the client holds
+        if coded_etag in request.headers.get("if-none-match", ""):
+            etag = coded_etag
+        return cached_body_response(request, body, etag, media_type, cache_control, headers)
+    compressed = encoded.get(coded_etag)
+    if compressed is None:
+        compressed = encoded[coded_etag] = await compress_async(body, encoding)
+    headers["Content-Encoding"] = encoding
+    return cached_body_response(request, compressed, coded_etag, media_type, cache_control, headers)
+
+async def compressed_json_response(request: Request, cached: CachedResponse) -> Response:
+    """Serve a pre-serialized JSON body, answering 304 when the client is current"""
+    return await compressed_body_response(request, cached.body, cached.etag, "application/json", cached.encoded)
+
+class CompressionMiddleware:
+    """Brotli/gzip compression of JSON and text responses the client accepts.
+
+    Only complete bodies of at least `minimum_size` bytes are compressed, so
+    streamed responses (theme events, batch validation) pass through as
+    they are. Cached responses are compressed by their routes with
+    `compressed_body_response`, which keeps each coding next to the cached
+    body, so this only compresses responses built per request and leaves
+    bodies that already have a Content-Encoding alone. Compressed responses
+    carry the ETag suffixed with their coding, as the static assets do; the
+    conditional request helpers accept every coding of a tag, and a 304
+    echoes the coded tag the client revalidated.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match", "")
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start = message
+            else:
+                # The first body message decides: only a complete, compressible body is encoded
+                passthrough = True
+                await self._send_body(start, message, encoding, if_none_match, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_body(
+        self, start: Message, message: Message, encoding: Optional[str], if_none_match: str, send: Send
+    ) -> None:
+        body = message.get("body", b"")
+        headers = MutableHeaders(raw=list(start["headers"]))
+        content_type = headers.get("content-type", "")
+        etag = headers.get("etag")
+        if start["status"] == 304 and encoding is not None and etag is not None:
+            # Revalidating a compressed copy: confirm the tag the client holds
+            if encoded_etag(etag, encoding) in if_none_match:
+                headers["ETag"] = encoded_etag(etag, encoding)
+                start = {**start, "headers": headers.raw}
+        if (
+            message.get("more_body", False)
+            or start["status"] != 200
+            or len(body) < self.minimum_size
+            or "content-encoding" in headers
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            await send(start)
+            await send(message)
+            return
+        headers.add_vary_header("Accept-Encoding")
+        if encoding is not None:
+            body = await compress_async(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            if etag is not None:
+                headers["ETag"] = encoded_etag(etag, encoding)
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
@@ -1,34 +1,79 @@
 import os
+import gzip
+import time
+import asyncio
+import logging
 from typing import Dict, List, Optional
-import aiohttp
 from fastapi import HTTPException
+from ..config import settings
+from .http_client import HTTPClient
+from .figma_cache import FigmaDocumentCache
+from .figma_stream import ijson, collect_components, collect_components_async
+from .metrics import FIGMA_REQUESTS, FIGMA_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
 
 class FigmaClient:
-    def __init__(self):
+    # Nested node properties read by _extract_style_properties
+    STYLE_KEYS = frozenset(["fills", "strokes", "effects", "absoluteBoundingBox"])
+
+    def __init__(self, http_client: Optional[HTTPClient] = None, document_cache: Optional[FigmaDocumentCache] = None):
         self.api_key = os.getenv("FIGMA_API_KEY")
         self.base_url = "https://api.figma.com/v1"
+        self._owns_http_client = http_client is None
+        self.http_client = http_client if http_client is not None else HTTPClient()
+        self.document_cache = document_cache
+        self.offline = settings.FIGMA_OFFLINE
+        self.streaming = settings.FIGMA_STREAMING and ijson is not None
+        self.selective = settings.FIGMA_SELECTIVE_FETCH
+        self.shallow_depth = settings.FIGMA_SHALLOW_DEPTH
+        self.node_batch_size = settings.FIGMA_NODE_BATCH_SIZE
+        self.node_concurrency = settings.FIGMA_NODE_CONCURRENCY
         
+        # Checked when Figma is first called, so the API can boot without credentials
+        if not self.api_key:
+            logger.warning("FIGMA_API_KEY environment variable is not set; Figma imports will fail")
+
+    async def close(self) -> None:
+        """Close the HTTP pool if this client created it"""
+        if self._owns_http_client:
+            await self.http_client.close()
+        if self.document_cache is not None:
+            self.document_cache.close()
+
+    def _headers(self) -> dict:
         if not self.api_key:
             raise ValueError("FIGMA_API_KEY environment variable is not set")
+        return {
+            "X-Figma-Token": self.api_key,
+            "Content-Type": "application/json"
+        }
+
+    async def _raise_for_status(self, response) -> None:
+        if response.status != 200:
+            error_data = await response.json(content_type=None)
+            raise HTTPException(
+                status_code=response.status,
+                detail=error_data.get("message", "Figma API request failed")
+            )
 
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> dict:
         """Make a request to the Figma API"""
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "X-Figma-Token": self.api_key,
-                "Content-Type": "application/json"
-            }
-            
-            url = f"{self.base_url}/{endpoint}"
-            
-            async with session.request(method, url, headers=headers, **kwargs) as response:
-                if response.status != 200:
-                    error_data = await response.json()
-                    raise HTTPException(
-                        status_code=response.status,
-                        detail=error_data.get("message", "Figma API request failed")
-                    )
+        url = f"{self.base_url}/{endpoint}"
+        
+        status = "error"
+        started = time.perf_counter()
+        try:
+            async with self.http_client.request(method, url, headers=self._headers(), **kwargs) as response:
+                status = str(response.status)
+                await self._raise_for_status(response)
                 return await response.json()
+        finally:
+            self._record_request("nodes" if endpoint.endswith("/nodes") else "files", status, started)
+
+    def _record_request(self, endpoint: str, status: str, started: float) -> None:
+        FIGMA_REQUESTS.labels(endpoint, status).inc()
+        FIGMA_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
 
     def _extract_file_key(self, figma_url: str) -> str:
         """Extract file key from Figma URL"""
@@ -45,40 +90,186 @@ class FigmaClient:
 
     async def extract_components(self, figma_url: str) -> Dict[str, str]:
         """Extract components and their properties from a Figma file"""
+        file_data = await self.fetch_file(figma_url)
+        return await self.parse_components(file_data)
+
+    async def fetch_file(self, figma_url: str) -> dict:
+        """Download the file document for a Figma URL"""
         try:
             file_key = self._extract_file_key(figma_url)
+            if self.document_cache is None:
+                return await self._make_request("GET", f"files/{file_key}")
+            return await self._fetch_file_cached(file_key)
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to extract components: {str(e)}"
+            )
+
+    async def _fetch_file_cached(self, file_key: str) -> dict:
+        """Fetch a file document, reusing the cached copy while its version is unchanged"""
+        cache = self.document_cache
+        if self.offline:
+            document = await asyncio.to_thread(cache.get_latest, file_key)
+            if document is None:
+                raise ValueError(f"Figma file {file_key} is not cached and offline mode is enabled")
+            return document
+        
+        # A depth-limited fetch returns the version metadata without the node tree
+        meta = await self._make_request("GET", f"files/{file_key}", params={"depth": 1})
+        document = await asyncio.to_thread(cache.get, file_key, meta.get("version"), meta.get("lastModified"))
+        if document is not None:
+            return document
+        
+        document = await self._make_request("GET", f"files/{file_key}")
+        await asyncio.to_thread(cache.put, file_key, document)
+        return document
+
+    async def stream_components(self, figma_url: str) -> Dict[str, dict]:
+        """Extract components incrementally from the file's JSON byte stream"""
+        try:
+            file_key = self._extract_file_key(figma_url)
+            cache = self.document_cache
+            version = last_modified = None
+            if cache is not None:
+                if self.offline:
+                    path = cache.path_for(file_key, None, None, latest=True)
+                    if path is None:
+                        raise ValueError(f"Figma file {file_key} is not cached and offline mode is enabled")
+                    return await asyncio.to_thread(self._collect_from_cache, path)
+                
+                meta = await self._make_request("GET", f"files/{file_key}", params={"depth": 1})
+                version, last_modified = meta.get("version"), meta.get("lastModified")
+                path = cache.path_for(file_key, version, last_modified)
+                if path is not None:
+                    return await asyncio.to_thread(self._collect_from_cache, path)
             
-            # Get file data
-            file_data = await self._make_request("GET", f"files/{file_key}")
+            return await self._stream_from_api(file_key, version, last_modified)
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to extract components: {str(e)}"
+            )
+
+    async def fetch_components_selective(self, figma_url: str) -> Dict[str, dict]:
+        """Extract components without downloading the whole file.
+
+        A depth-limited fetch returns the top of the node tree plus the file's
+        `components` index. Components inside the shallow tree are read from it
+        directly, keeping their full path names; the rest are fetched in
+        concurrent batches from the `nodes` endpoint and, since their ancestors
+        are not known, named under the document root.
+        """
+        try:
+            file_key = self._extract_file_key(figma_url)
+            shallow = await self._make_request("GET", f"files/{file_key}", params={"depth": self.shallow_depth})
+            document = shallow["document"]
+            found_ids = set()
+            components = self._collect_components(document, found_ids)
             
-            # Extract components
-            components = {}
-            await self._process_node(file_data["document"], components)
+            missing = [node_id for node_id in shallow.get("components", {}) if node_id not in found_ids]
+            batches = [
+                missing[index:index + self.node_batch_size]
+                for index in range(0, len(missing), self.node_batch_size)
+            ]
+            semaphore = asyncio.Semaphore(self.node_concurrency)
             
-            return components
+            async def fetch_batch(ids: List[str]) -> dict:
+                async with semaphore:
+                    return await self._make_request(
+                        "GET", f"files/{file_key}/nodes", params={"ids": ",".join(ids), "depth": 1}
+                    )
             
+            results = await asyncio.gather(*(fetch_batch(ids) for ids in batches))
+            root_name = document.get("name", "")
+            for ids, result in zip(batches, results):
+                nodes = result.get("nodes") or {}
+                for node_id in ids:
+                    entry = nodes.get(node_id)
+                    if not entry or entry.get("document", {}).get("type") != "COMPONENT":
+                        continue
+                    node = entry["document"]
+                    name = node.get("name", "")
+                    full_name = f"{root_name}/{name}" if root_name else name
+                    components[full_name] = self._extract_style_properties(node)
+            return components
         except Exception as e:
             raise HTTPException(
                 status_code=400,
                 detail=f"Failed to extract components: {str(e)}"
             )
 
-    async def _process_node(self, node: dict, components: Dict[str, str], parent_name: str = "") -> None:
-        """Recursively process nodes to extract component information"""
-        # Get node name
-        name = node.get("name", "")
-        full_name = f"{parent_name}/{name}" if parent_name else name
-        
-        # Process component properties
-        if node.get("type") == "COMPONENT":
+    def _collect_from_cache(self, path: str) -> Dict[str, dict]:
+        with gzip.open(path, "rb") as f:
+            return collect_components(f, self._extract_style_properties, self.STYLE_KEYS).components
+
+    async def _stream_from_api(self, file_key: str, version: Optional[str], last_modified: Optional[str]) -> Dict[str, dict]:
+        url = f"{self.base_url}/files/{file_key}"
+        cache = self.document_cache
+        status = "error"
+        started = time.perf_counter()
+        try:
+            async with self.http_client.request("GET", url, headers=self._headers()) as response:
+                status = str(response.status)
+                await self._raise_for_status(response)
+                if cache is None:
+                    collector = await collect_components_async(
+                        response.content, self._extract_style_properties, self.STYLE_KEYS
+                    )
+                    return collector.components
+                
+                # Compress the raw bytes into the document cache while parsing them
+                tmp_path = cache.temp_path()
+                try:
+                    with gzip.open(tmp_path, "wb", compresslevel=6) as sink:
+                        collector = await collect_components_async(
+                            response.content, self._extract_style_properties, self.STYLE_KEYS, sink
+                        )
+                    await asyncio.to_thread(
+                        cache.commit,
+                        file_key,
+                        collector.metadata.get("version", version),
+                        collector.metadata.get("lastModified", last_modified),
+                        tmp_path
+                    )
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                return collector.components
+        finally:
+            # Timed through the body, which is parsed as it streams
+            self._record_request("files", status, started)
+
+    async def parse_components(self, file_data: dict) -> Dict[str, str]:
+        """Extract components from a downloaded Figma file document"""
+        try:
+            return self._collect_components(file_data["document"])
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to extract components: {str(e)}"
+            )
+
+    def _collect_components(self, document: dict, found_ids: Optional[set] = None) -> Dict[str, dict]:
+        """Walk the node tree depth-first with an explicit stack, collecting components"""
+        components = {}
+        stack = [(document, "")]
+        while stack:
+            node, parent_name = stack.pop()
+            name = node.get("name", "")
+            full_name = f"{parent_name}/{name}" if parent_name else name
+            
             # Extract relevant properties (colors, dimensions, etc.)
-            style_props = self._extract_style_properties(node)
-            components[full_name] = style_props
-        
-        # Process children
-        if "children" in node:
-            for child in node["children"]:
-                await self._process_node(child, components, full_name)
+            if node.get("type") == "COMPONENT":
+                components[full_name] = self._extract_style_properties(node)
+                if found_ids is not None:
+                    found_ids.add(node.get("id"))
+            
+            # Push children in reverse so they are visited in document order
+            children = node.get("children")
+            if children:
+                stack.extend((child, full_name) for child in reversed(children))
+        return components
 
     def _extract_style_properties(self, node: dict) -> str:
         """Extract style properties from a node"""
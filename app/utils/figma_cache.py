@@ -0,0 +1,177 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class FigmaDocumentCache:
+    """Size-bounded on-disk cache of gzip-compressed Figma file documents.
+
+    Entries are keyed by file key and the document's `version` and
+    `lastModified`, so a cached document is only reused while the design is
+    unchanged. The least recently used documents are evicted once the total
+    compressed size exceeds `max_bytes`.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index: Dict[str, dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, dict]:
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        try:
+            with open(path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Drop entries whose document file has disappeared
+        return {
+            file_key: entry for file_key, entry in index.items()
+            if os.path.exists(os.path.join(self.directory, entry["filename"]))
+        }
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, path)
+
+    @property
+    def size(self) -> int:
+        return sum(entry["size"] for entry in self._index.values())
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._index),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def _lookup(self, file_key: str, version: Optional[str], last_modified: Optional[str]) -> Optional[dict]:
+        entry = self._index.get(file_key)
+        if entry is None or entry["version"] != version or entry["last_modified"] != last_modified:
+            return None
+        return entry
+
+    def get(self, file_key: str, version: Optional[str], last_modified: Optional[str]) -> Optional[dict]:
+        """Get a cached document if it matches the given version"""
+        with self._lock:
+            entry = self._lookup(file_key, version, last_modified)
+            if entry is None:
+                self.misses += 1
+                return None
+            document = self._read(entry)
+            if document is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return document
+
+    def get_latest(self, file_key: str) -> Optional[dict]:
+        """Get the most recently cached document regardless of version"""
+        with self._lock:
+            entry = self._index.get(file_key)
+            document = self._read(entry) if entry is not None else None
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return document
+
+    def path_for(self, file_key: str, version: Optional[str], last_modified: Optional[str], latest: bool = False) -> Optional[str]:
+        """Get the path of a cached gzip document for incremental reading"""
+        with self._lock:
+            if latest:
+                entry = self._index.get(file_key)
+            else:
+                entry = self._lookup(file_key, version, last_modified)
+            path = os.path.join(self.directory, entry["filename"]) if entry else None
+            if path is None or not os.path.exists(path):
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self.hits += 1
+            return path
+
+    def temp_path(self) -> str:
+        """Get a scratch path inside the cache directory for a document being written"""
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}.tmp")
+
+    def _read(self, entry: dict) -> Optional[dict]:
+        path = os.path.join(self.directory, entry["filename"])
+        try:
+            with gzip.open(path, "rb") as f:
+                document = json.loads(f.read())
+        except (OSError, ValueError):
+            logger.warning("Discarding unreadable cached Figma document %s", path)
+            return None
+        entry["last_access"] = time.time()
+        return document
+
+    def put(self, file_key: str, document: dict) -> None:
+        """Store a document under its version, evicting old entries if needed"""
+        payload = gzip.compress(json.dumps(document, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+        tmp_path = self.temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        self.commit(file_key, document.get("version"), document.get("lastModified"), tmp_path)
+
+    def commit(self, file_key: str, version: Optional[str], last_modified: Optional[str], tmp_path: str) -> None:
+        """Move a fully written gzip document into the cache"""
+        digest = hashlib.sha256(f"{version}:{last_modified}".encode("utf-8")).hexdigest()[:16]
+        filename = f"{file_key}-{digest}.json.gz"
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            os.replace(tmp_path, os.path.join(self.directory, filename))
+
+            previous = self._index.get(file_key)
+            if previous is not None and previous["filename"] != filename:
+                self._remove_file(previous["filename"])
+            self._index[file_key] = {
+                "filename": filename,
+                "version": version,
+                "last_modified": last_modified,
+                "size": size,
+                "last_access": time.time()
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self) -> None:
+        total = self.size
+        for file_key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            self._remove_file(entry["filename"])
+            del self._index[file_key]
+            total -= entry["size"]
+            self.evictions += 1
+
+    def _remove_file(self, filename: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Persist access times so LRU order survives restarts"""
+        with self._lock:
+            self._save_index()
@@ -0,0 +1,202 @@
+import asyncio
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from .lazy_import import optional_lazy_import
+
+# Streaming is optional; the parser is loaded by the first streamed document
+ijson = optional_lazy_import("ijson")
+
+StyleExtractor = Callable[[dict], dict]
+ComponentEntry = Tuple[List[str], dict]
+
+METADATA_KEYS = ("name", "version", "lastModified")
+_CONTAINER_STARTS = frozenset(("start_map", "start_array"))
+_CONTAINER_ENDS = frozenset(("end_map", "end_array"))
+
+# Bytes of a streamed document handed to the parser thread at a time
+PARSE_CHUNK_BYTES = 256 * 1024
+
+def join_component_name(segments: List[str]) -> str:
+    """Build a component's full name from its root-to-leaf node names"""
+    full_name = ""
+    for name in segments:
+        full_name = f"{full_name}/{name}" if full_name else name
+    return full_name
+
+class _TopFrame:
+    __slots__ = ("key",)
+
+    def __init__(self):
+        self.key = None
+
+class _NodeFrame:
+    __slots__ = ("key", "props", "components")
+
+    def __init__(self):
+        self.key = None
+        self.props: Dict[str, Any] = {}
+        # Descendant components as (leaf-to-root names, style props)
+        self.components: List[ComponentEntry] = []
+
+class _ChildrenFrame:
+    __slots__ = ()
+
+class _ValueFrame:
+    __slots__ = ("builder", "depth")
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.depth = 1
+
+class _SkipFrame:
+    __slots__ = ("depth",)
+
+    def __init__(self):
+        self.depth = 1
+
+class ComponentCollector:
+    """Incremental extractor of COMPONENT nodes from Figma file JSON events.
+
+    Consumes `ijson.basic_parse` events and keeps an explicit stack of open
+    nodes, so memory is bounded by the depth of the tree (plus the extracted
+    components) rather than by the size of the document, and there is no
+    recursion limit. Only each node's own properties are materialized;
+    `children` arrays are walked, and top-level sections other than
+    `document` are skipped without being built.
+    """
+
+    def __init__(self, extract: StyleExtractor, keys: Optional[FrozenSet[str]] = None):
+        self.extract = extract
+        # Node properties to materialize; other nested values are skipped
+        self.keys = keys
+        self.components: Dict[str, dict] = {}
+        self.metadata: Dict[str, Any] = {}
+        self.nodes = 0
+        self._stack: List[Any] = []
+
+    def event(self, event: str, value: Any) -> None:
+        stack = self._stack
+        if not stack:
+            if event == "start_map":
+                stack.append(_TopFrame())
+            return
+
+        frame = stack[-1]
+        kind = frame.__class__
+        if kind is _SkipFrame or kind is _ValueFrame:
+            if kind is _ValueFrame:
+                frame.builder.event(event, value)
+            if event in _CONTAINER_STARTS:
+                frame.depth += 1
+            elif event in _CONTAINER_ENDS:
+                frame.depth -= 1
+                if frame.depth == 0:
+                    stack.pop()
+                    if kind is _ValueFrame:
+                        parent = stack[-1]
+                        parent.props[parent.key] = frame.builder.value
+            return
+
+        if kind is _ChildrenFrame:
+            if event == "start_map":
+                stack.append(_NodeFrame())
+            elif event == "end_array":
+                stack.pop()
+            return
+
+        if event == "map_key":
+            frame.key = value
+        elif event == "end_map":
+            stack.pop()
+            if kind is _NodeFrame:
+                self._finish_node(frame)
+        elif kind is _TopFrame:
+            if frame.key == "document" and event == "start_map":
+                stack.append(_NodeFrame())
+            elif event in _CONTAINER_STARTS:
+                stack.append(_SkipFrame())
+            elif frame.key in METADATA_KEYS:
+                self.metadata[frame.key] = value
+        elif event in _CONTAINER_STARTS:
+            if frame.key == "children" and event == "start_array":
+                stack.append(_ChildrenFrame())
+            elif not self._wants(frame):
+                stack.append(_SkipFrame())
+            else:
+                value_frame = _ValueFrame(ijson.ObjectBuilder())
+                value_frame.builder.event(event, value)
+                stack.append(value_frame)
+        else:
+            frame.props[frame.key] = value
+
+    def _wants(self, node: _NodeFrame) -> bool:
+        """Decide whether a nested property of a node needs to be built"""
+        if self.keys is not None and node.key not in self.keys:
+            return False
+        # Once a node is known not to be a component its styles are never read
+        node_type = node.props.get("type")
+        return node_type is None or node_type == "COMPONENT"
+
+    def _finish_node(self, node: _NodeFrame) -> None:
+        self.nodes += 1
+        name = node.props.get("name", "")
+        entries: List[ComponentEntry] = []
+        if node.props.get("type") == "COMPONENT":
+            entries.append(([name], self.extract(node.props)))
+        for segments, props in node.components:
+            segments.append(name)
+            entries.append((segments, props))
+
+        parent = self._stack[-1] if self._stack else None
+        if isinstance(parent, _ChildrenFrame):
+            self._stack[-2].components.extend(entries)
+            return
+        for segments, props in entries:
+            segments.reverse()
+            self.components[join_component_name(segments)] = props
+
+def collect_components(source, extract: StyleExtractor, keys: Optional[FrozenSet[str]] = None) -> ComponentCollector:
+    """Extract components from a binary file-like object holding a Figma file"""
+    collector = ComponentCollector(extract, keys)
+    for event, value in ijson.basic_parse(source, use_float=True):
+        collector.event(event, value)
+    return collector
+
+async def collect_components_async(
+    source, extract: StyleExtractor, keys: Optional[FrozenSet[str]] = None, sink=None
+) -> ComponentCollector:
+    """Extract components from an async byte stream holding a Figma file, copying its bytes into `sink`.
+
+    The stream is read on the event loop, while parsing, extraction and
+    writes to the sink run on a worker thread, one chunk of about
+    `PARSE_CHUNK_BYTES` at a time, so a large document never stalls the loop.
+    """
+    collector = ComponentCollector(extract, keys)
+    events = ijson.sendable_list()
+    parser = ijson.basic_parse_coro(events, use_float=True)
+
+    def collect() -> None:
+        for event, value in events:
+            collector.event(event, value)
+        del events[:]
+
+    def parse(chunk: bytes) -> None:
+        if sink is not None:
+            sink.write(chunk)
+        parser.send(chunk)
+        collect()
+
+    def finish() -> None:
+        # The parser emits its last events when closed
+        parser.close()
+        collect()
+
+    buffer = bytearray()
+    while True:
+        chunk = await source.read(PARSE_CHUNK_BYTES)
+        buffer += chunk
+        if buffer and (len(buffer) >= PARSE_CHUNK_BYTES or not chunk):
+            await asyncio.to_thread(parse, bytes(buffer))
+            buffer.clear()
+        if not chunk:
+            await asyncio.to_thread(finish)
+            return collector
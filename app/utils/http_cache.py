@@ -0,0 +1,70 @@
+from typing import Dict, List, Optional
+from fastapi import Request, Response
+
+# Content codings whose representations carry the identity ETag with a "-<coding>" suffix
+ETAG_CODINGS = ("br", "gzip")
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Suffix an ETag with the content coding of its representation, e.g. "abc-br" for Brotli"""
+    return f'{etag[:-1]}-{encoding}"'
+
+def identity_etag(etag: str) -> str:
+    """Strip a content-coding suffix, so every coding of a representation compares equal"""
+    for encoding in ETAG_CODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an ETag against the request's If-None-Match header, whichever content coding the client holds"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    etag = identity_etag(etag)
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if identity_etag(candidate) == etag:
+            return True
+    return False
+
+def accepted_encodings(header: str) -> List[str]:
+    """List the content codings an Accept-Encoding header allows, skipping any refused with q=0"""
+    accepted = []
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            accepted.append(name.strip().lower())
+    return accepted
+
+def if_match_satisfied(header: str, etag: str) -> bool:
+    """Check an ETag against an If-Match header, which only matches strong ETags, in any content coding"""
+    if header.strip() == "*":
+        return True
+    etag = identity_etag(etag)
+    return any(identity_etag(candidate.strip()) == etag for candidate in header.split(","))
+
+def cached_body_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    media_type: str,
+    cache_control: str = "no-cache",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serve a pre-built body, answering 304 when the client is current"""
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
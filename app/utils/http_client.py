@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+from ..config import settings
+from .lazy_import import lazy_import
+
+# Loaded when the first outbound request is made
+aiohttp = lazy_import("aiohttp")
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+class HTTPClient:
+    """Shared keep-alive connection pool for outbound HTTP requests.
+
+    One `aiohttp.ClientSession` is created on first use and reused until
+    `close()`, so DNS, TCP and TLS setup are paid once per host rather than
+    once per request. Idempotent requests are retried with exponential
+    backoff on connection errors and on 429/5xx responses, honouring any
+    `Retry-After` header the server sends.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        timeout: Optional[float] = None,
+        keepalive_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        backoff_max: Optional[float] = None
+    ):
+        self.limit = settings.HTTP_POOL_LIMIT if limit is None else limit
+        self.limit_per_host = settings.HTTP_POOL_LIMIT_PER_HOST if limit_per_host is None else limit_per_host
+        self.timeout = settings.HTTP_TIMEOUT_SECONDS if timeout is None else timeout
+        self.keepalive_timeout = settings.HTTP_KEEPALIVE_SECONDS if keepalive_timeout is None else keepalive_timeout
+        self.max_retries = settings.HTTP_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.HTTP_BACKOFF_SECONDS if backoff is None else backoff
+        self.backoff_max = settings.HTTP_BACKOFF_MAX_SECONDS if backoff_max is None else backoff_max
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def session(self) -> "aiohttp.ClientSession":
+        """Get the pooled session, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and (self._session.closed or self._loop is not loop):
+            # A session is bound to the loop it was created on
+            self._session = None
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._loop = loop
+        return self._session
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs) -> AsyncIterator["aiohttp.ClientResponse"]:
+        """Send a request with retries, yielding the final response"""
+        response = await self._send(method.upper(), url, **kwargs)
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def _send(self, method: str, url: str, **kwargs) -> "aiohttp.ClientResponse":
+        session = await self.session()
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            try:
+                response = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning("Request to %s failed (%s), retrying in %.2fs", url, e, delay)
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                logger.warning("Request to %s returned %s, retrying in %.2fs", url, response.status, delay)
+                response.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _retry_after(self, response: "aiohttp.ClientResponse") -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+        return min(self.backoff_max, max(0.0, delay))
+
+    async def close(self) -> None:
+        """Close the pooled session and its connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
@@ -0,0 +1,227 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+_RAISE = object()
+_MISSING = object()
+
+class JsonPatchError(ValueError):
+    """A patch that is malformed or cannot be applied to the document"""
+
+class JsonPatchTestFailed(JsonPatchError):
+    """A `test` operation did not match the document"""
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split a JSON Pointer (RFC 6901) into unescaped reference tokens"""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+def format_pointer(tokens: List[str]) -> str:
+    return "".join("/" + token.replace("~", "~0").replace("/", "~1") for token in tokens)
+
+def _array_index(container: list, token: str, pointer: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index in {pointer!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range in {pointer!r}")
+    return index
+
+def resolve(document: Any, tokens: List[str], default: Any = _RAISE) -> Any:
+    """Get the value a pointer refers to, or `default` when it does not exist"""
+    value = document
+    for token in tokens:
+        if isinstance(value, dict) and token in value:
+            value = value[token]
+        elif isinstance(value, list) and token.isdigit() and int(token) < len(value) and str(int(token)) == token:
+            value = value[int(token)]
+        elif default is not _RAISE:
+            return default
+        else:
+            raise JsonPatchError(f"Path does not exist: {format_pointer(tokens)!r}")
+    return value
+
+def _update_parent(document: Any, tokens: List[str], change: Callable[[Any], Any], pointer: str) -> Any:
+    """Return a document whose container at `tokens` is replaced by `change(container)`.
+
+    Only the containers on the path are copied; every other branch is shared
+    with the input, which is never modified.
+    """
+    if not tokens:
+        return change(document)
+    token = tokens[0]
+    if isinstance(document, dict):
+        if token not in document:
+            raise JsonPatchError(f"Path does not exist: {pointer!r}")
+        updated = dict(document)
+        updated[token] = _update_parent(document[token], tokens[1:], change, pointer)
+        return updated
+    if isinstance(document, list):
+        index = _array_index(document, token, pointer)
+        updated = list(document)
+        updated[index] = _update_parent(document[index], tokens[1:], change, pointer)
+        return updated
+    raise JsonPatchError(f"Path does not exist: {pointer!r}")
+
+def _add(document: Any, tokens: List[str], value: Any, pointer: str) -> Any:
+    if not tokens:
+        return value
+
+    def add(parent: Any) -> Any:
+        if isinstance(parent, dict):
+            return {**parent, tokens[-1]: value}
+        if isinstance(parent, list):
+            index = _array_index(parent, tokens[-1], pointer, allow_end=True)
+            return parent[:index] + [value] + parent[index:]
+        raise JsonPatchError(f"Parent of {pointer!r} is not an object or array")
+    return _update_parent(document, tokens[:-1], add, pointer)
+
+def _remove(document: Any, tokens: List[str], pointer: str) -> Tuple[Any, Any]:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    removed = []
+
+    def remove(parent: Any) -> Any:
+        if isinstance(parent, dict) and tokens[-1] in parent:
+            removed.append(parent[tokens[-1]])
+            return {key: value for key, value in parent.items() if key != tokens[-1]}
+        if isinstance(parent, list):
+            index = _array_index(parent, tokens[-1], pointer)
+            removed.append(parent[index])
+            return parent[:index] + parent[index + 1:]
+        raise JsonPatchError(f"Path does not exist: {pointer!r}")
+    return _update_parent(document, tokens[:-1], remove, pointer), removed[0]
+
+def json_equal(a: Any, b: Any) -> bool:
+    """Compare JSON values, where unlike in Python `true` is not equal to `1`"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+def _operation_field(operation: Dict[str, Any], field: str) -> Any:
+    if field not in operation:
+        raise JsonPatchError(f"Operation {operation.get('op')!r} requires {field!r}")
+    return operation[field]
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """Apply RFC 6902 operations, returning a new document that shares unchanged branches with `document`.
+
+    Documents are treated as immutable: `document` is never modified, and
+    the result must not be modified in place either.
+    """
+    for operation in operations:
+        op = operation.get("op")
+        pointer = _operation_field(operation, "path")
+        tokens = parse_pointer(pointer)
+        if op == "add":
+            document = _add(document, tokens, _operation_field(operation, "value"), pointer)
+        elif op == "remove":
+            document, _ = _remove(document, tokens, pointer)
+        elif op == "replace":
+            resolve(document, tokens)
+            value = _operation_field(operation, "value")
+            if not tokens:
+                document = value
+            elif isinstance(resolve(document, tokens[:-1]), list):
+                document, _ = _remove(document, tokens, pointer)
+                document = _add(document, tokens, value, pointer)
+            else:
+                document = _add(document, tokens, value, pointer)
+        elif op in ("move", "copy"):
+            source = _operation_field(operation, "from")
+            source_tokens = parse_pointer(source)
+            if op == "move":
+                if tokens[:len(source_tokens)] == source_tokens and tokens != source_tokens:
+                    raise JsonPatchError(f"Cannot move {source!r} into one of its own children")
+                if not source_tokens:
+                    raise JsonPatchError("Cannot move the whole document")
+                document, value = _remove(document, source_tokens, source)
+            else:
+                value = resolve(document, source_tokens)
+            document = _add(document, tokens, value, pointer)
+        elif op == "test":
+            actual = resolve(document, tokens, _MISSING)
+            if actual is _MISSING or not json_equal(actual, _operation_field(operation, "value")):
+                raise JsonPatchTestFailed(f"Test failed at {pointer!r}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+    return document
+
+def _touched_paths(original: Any, patched: Any, operations: List[Dict[str, Any]]) -> List[List[str]]:
+    """Paths written by the operations, widened to whole arrays and without nested duplicates"""
+    touched: List[List[str]] = []
+    for operation in operations:
+        if operation["op"] == "test":
+            continue
+        pointers = [operation["path"]]
+        if operation["op"] == "move":
+            pointers.append(operation["from"])
+        for pointer in pointers:
+            tokens = parse_pointer(pointer)
+            # Inserting into or removing from an array shifts later items, so report the array
+            if tokens and (
+                isinstance(resolve(original, tokens[:-1], None), list)
+                or isinstance(resolve(patched, tokens[:-1], None), list)
+            ):
+                tokens = tokens[:-1]
+            touched.append(tokens)
+    touched.sort(key=len)
+    paths: List[List[str]] = []
+    for tokens in touched:
+        if not any(tokens[:len(path)] == path for path in paths):
+            paths.append(tokens)
+    return paths
+
+def diff_paths(original: Any, patched: Any, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Describe what `operations` changed as an RFC 6902 patch from `original` to `patched`.
+
+    Only the paths the operations wrote are compared, so the result stays as
+    small as the request rather than the document.
+    """
+    changes = []
+    for tokens in _touched_paths(original, patched, operations):
+        before = resolve(original, tokens, _MISSING)
+        after = resolve(patched, tokens, _MISSING)
+        pointer = format_pointer(tokens)
+        if after is _MISSING:
+            if before is not _MISSING:
+                changes.append({"op": "remove", "path": pointer})
+        elif before is _MISSING:
+            changes.append({"op": "add", "path": pointer, "value": after})
+        elif not json_equal(before, after):
+            changes.append({"op": "replace", "path": pointer, "value": after})
+    return changes
+
+def diff_documents(source: Any, target: Any) -> List[Dict[str, Any]]:
+    """Build an RFC 6902 patch turning `source` into `target`.
+
+    Branches the two documents share are skipped without being compared,
+    so diffing versions that share structure costs only the changed paths.
+    Arrays that differ are replaced whole.
+    """
+    changes: List[Dict[str, Any]] = []
+
+    def visit(before: Any, after: Any, tokens: List[str]) -> None:
+        if before is after:
+            return
+        if isinstance(before, dict) and isinstance(after, dict):
+            for key in before:
+                if key not in after:
+                    changes.append({"op": "remove", "path": format_pointer(tokens + [key])})
+            for key, value in after.items():
+                if key in before:
+                    visit(before[key], value, tokens + [key])
+                else:
+                    changes.append({"op": "add", "path": format_pointer(tokens + [key]), "value": value})
+        elif not json_equal(before, after):
+            changes.append({"op": "replace", "path": format_pointer(tokens), "value": after})
+
+    visit(source, target, [])
+    return changes
@@ -0,0 +1,30 @@
+import sys
+import importlib.util
+from types import ModuleType
+from typing import Optional
+
+def lazy_import(name: str) -> ModuleType:
+    """Get a module that is only executed when one of its attributes is first used.
+
+    Keeps heavy dependencies off the import path of the API so workers boot
+    quickly; the cost is paid by the first request that needs the module.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def optional_lazy_import(name: str) -> Optional[ModuleType]:
+    """Like `lazy_import`, but None when the module is not installed"""
+    try:
+        return lazy_import(name)
+    except ModuleNotFoundError:
+        return None
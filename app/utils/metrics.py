@@ -0,0 +1,259 @@
+import math
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds; covers cached reads (sub-millisecond) up to whole theme builds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+Sampler = Callable[[], Union[float, Dict[LabelValues, float]]]
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """Get the series for one combination of label values"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> object:
+        """Create the value of a new series"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    @abstractmethod
+    def _render_child(self, values: LabelValues, child) -> List[str]:
+        """Render the exposition lines of one series"""
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or cache hits.
+
+    A metric whose value is already tracked elsewhere can instead be read
+    when scraped, through `set_function`.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._sampler: Optional[Sampler] = None
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def set_function(self, sampler: Optional[Sampler]) -> None:
+        """Read the value when scraped; labelled metrics return a dict keyed by label values"""
+        self._sampler = sampler
+
+    def render(self) -> List[str]:
+        if self._sampler is not None:
+            sampled = self._sampler()
+            if not isinstance(sampled, dict):
+                sampled = {(): sampled}
+            for values, value in sampled.items():
+                self.labels(*values).set(value)
+        return super().render()
+
+    def _render_child(self, values: LabelValues, child: _Value) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. a queue depth"""
+
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+class Histogram(_Metric):
+    """Distribution of observations, e.g. durations in seconds, in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_child(self, values: LabelValues, child: _HistogramValue) -> List[str]:
+        names = self.labelnames + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_labels(names, values + (_format_value(bound),))} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and status", ("method", "route", "status")
+)
+FIGMA_REQUESTS = metrics.counter("figma_requests_total", "Figma API requests by endpoint and status", ("endpoint", "status"))
+FIGMA_REQUEST_SECONDS = metrics.histogram("figma_request_duration_seconds", "Figma API request latency", ("endpoint",))
+CACHE_HITS = metrics.counter("cache_hits_total", "Cache hits since startup", ("cache",))
+CACHE_MISSES = metrics.counter("cache_misses_total", "Cache misses since startup", ("cache",))
+THEME_BUILDS = metrics.counter("theme_builds_total", "Theme builds by operation and result", ("operation", "result"))
+THEME_BUILD_STAGE_SECONDS = metrics.histogram("theme_build_stage_duration_seconds", "Duration of each theme build stage", ("stage",))
+ASSET_IMAGES = metrics.counter("asset_images_total", "Asset images by outcome", ("result",))
+ASSET_STAGE_SECONDS = metrics.histogram(
+    "asset_stage_duration_seconds", "Duration of each asset pipeline stage per image", ("stage",)
+)
+QUEUE_DEPTH = metrics.gauge("queue_depth", "Items waiting or in progress in each internal queue", ("queue",))
+
+class MetricsMiddleware:
+    """Records request latency per route template, so path parameters do not multiply series"""
+
+    def __init__(self, app: ASGIApp, histogram: Histogram = HTTP_REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        root_path = scope.get("root_path", "")
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched route, or extends root_path for a mount, on the shared scope
+            route = scope.get("route")
+            if route is not None:
+                template = route.path
+            elif scope.get("root_path", "") != root_path:
+                template = scope["root_path"][len(root_path):]
+            else:
+                template = "unmatched"
+            self.histogram.labels(scope["method"], template, str(status)).observe(time.perf_counter() - started)
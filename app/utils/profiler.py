@@ -0,0 +1,363 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from types import FrameType
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# The profile of the request being handled; tasks it starts inherit it
+_active_profile: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar("active_profile", default=None)
+
+FrameKey = Tuple[str, str, int]
+
+def _frame_key(frame: FrameType) -> FrameKey:
+    code = frame.f_code
+    return (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+
+def _coroutine_frame(awaitable) -> Optional[FrameType]:
+    return getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None) or getattr(awaitable, "ag_frame", None)
+
+def _awaiting(awaitable):
+    return getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+
+class _TaskTimeline:
+    __slots__ = ("name", "samples", "weights")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+
+class SamplingProfiler:
+    """Samples the stacks of chosen asyncio tasks from a background thread.
+
+    Every `interval` the loop thread's stack is read. A followed task that
+    is running is recorded with its await chain plus the synchronous calls
+    below it; a suspended task is recorded with its await chain ending in
+    what it is waiting on (`<await Future>` for a thread or process pool,
+    a socket read, a gathered group of tasks). Each task gets its own
+    timeline, so a request and the job it queued are shown separately.
+    Sampling stops when every followed task has finished, or after
+    `max_seconds`, and `on_finish` is then called from the sampler thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        max_seconds: float,
+        on_finish: Optional[Callable[["SamplingProfiler"], None]] = None
+    ):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.on_finish = on_finish
+        self.created_at = time.time()
+        self.duration = 0.0
+        self.truncated = False
+        self._loop_thread = threading.get_ident()
+        self._tasks: Dict[asyncio.Task, _TaskTimeline] = {}
+        self._finished: List[_TaskTimeline] = []
+        self._frames: List[FrameKey] = []
+        self._frame_index: Dict[FrameKey, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.id[:8]}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def follow(self, task: asyncio.Task, name: str) -> None:
+        """Sample a task until it finishes or `unfollow` is called"""
+        with self._lock:
+            self._tasks[task] = _TaskTimeline(name)
+        task.add_done_callback(self.unfollow)
+
+    def unfollow(self, task: asyncio.Task) -> None:
+        with self._lock:
+            timeline = self._tasks.pop(task, None)
+            if timeline is not None:
+                self._finished.append(timeline)
+            if not self._tasks:
+                self._stop.set()
+
+    def _run(self) -> None:
+        started = last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            if now - started > self.max_seconds:
+                self.truncated = True
+                break
+            self._sample(now - last)
+            last = now
+        self.duration = time.perf_counter() - started
+        with self._lock:
+            # Tasks still followed after the time limit keep what was sampled
+            self._finished.extend(self._tasks.values())
+            self._tasks.clear()
+        if self.on_finish is not None:
+            try:
+                self.on_finish(self)
+            except Exception:
+                logger.exception("Failed to save profile %s", self.id)
+
+    def _sample(self, weight: float) -> None:
+        leaf = sys._current_frames().get(self._loop_thread)
+        with self._lock:
+            tasks = list(self._tasks.items())
+        for task, timeline in tasks:
+            stack = self._task_stack(task, leaf)
+            if stack:
+                timeline.samples.append(stack)
+                timeline.weights.append(weight)
+
+    def _task_stack(self, task: asyncio.Task, leaf: Optional[FrameType]) -> List[int]:
+        """Frame indices from the task's outermost coroutine to the innermost call, root first"""
+        chain: List[FrameType] = []
+        waiting_on = None
+        awaitable = task.get_coro()
+        while awaitable is not None:
+            frame = _coroutine_frame(awaitable)
+            if frame is None:
+                waiting_on = awaitable
+                break
+            chain.append(frame)
+            awaitable = _awaiting(awaitable)
+        if not chain:
+            return []
+
+        # If the innermost coroutine frame is on the loop thread's stack, the task is running
+        callees: List[FrameType] = []
+        current = leaf
+        while current is not None and current is not chain[-1]:
+            callees.append(current)
+            current = current.f_back
+        keys = [_frame_key(frame) for frame in chain]
+        if current is not None:
+            keys.extend(_frame_key(callee) for callee in reversed(callees))
+        elif waiting_on is not None:
+            # A bare `await future` leaves only the future's iterator on the chain; name the future itself
+            waiting_on = getattr(task, "_fut_waiter", None) or waiting_on
+            keys.append((f"<await {type(waiting_on).__name__}>", "", 0))
+        return [self._index(key) for key in keys]
+
+    def _index(self, key: FrameKey) -> int:
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self._frames)
+            self._frames.append(key)
+        return index
+
+    def speedscope(self) -> dict:
+        """Export in the speedscope file format, one sampled profile per task"""
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "jarvis-theme-service",
+            "shared": {"frames": [{"name": name, "file": path, "line": line} for name, path, line in self._frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": timeline.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(timeline.weights),
+                    "samples": timeline.samples,
+                    "weights": timeline.weights
+                }
+                for timeline in self._finished
+            ]
+        }
+
+def collapsed_stacks(profile: dict) -> str:
+    """Convert a speedscope profile to the collapsed format read by flamegraph.pl, in milliseconds"""
+    frames = [frame["name"] for frame in profile["shared"]["frames"]]
+    totals: Dict[str, float] = {}
+    for timeline in profile["profiles"]:
+        for stack, weight in zip(timeline["samples"], timeline["weights"]):
+            line = ";".join([timeline["name"]] + [frames[index] for index in stack])
+            totals[line] = totals.get(line, 0.0) + weight
+    return "".join(f"{line} {max(1, round(weight * 1000))}\n" for line, weight in totals.items())
+
+class ProfileStore:
+    """Keeps the most recent profiles as speedscope JSON files"""
+
+    def __init__(self, directory: str, history: int):
+        self.directory = directory
+        self.history = history
+
+    def path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.speedscope.json")
+
+    def save(self, profiler: SamplingProfiler) -> None:
+        profile = profiler.speedscope()
+        profile["metadata"] = {
+            "id": profiler.id,
+            "created_at": profiler.created_at,
+            "duration_seconds": profiler.duration,
+            "truncated": profiler.truncated
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path(profiler.id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, self.path(profiler.id))
+        self._trim()
+        logger.info("Saved profile %s of %s (%.1fs)", profiler.id, profiler.name, profiler.duration)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self.path(profile_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".speedscope.json"):
+                profile = self.get(name.split(".", 1)[0])
+                if profile is not None:
+                    profiles.append({"name": profile["name"], **profile["metadata"]})
+        return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+    def _trim(self) -> None:
+        paths = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith(".speedscope.json")
+        ]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.history:]:
+            os.remove(path)
+
+class ProfileLimiter:
+    """Allows one profile at a time, and at most `max_per_hour` started in any hour"""
+
+    def __init__(self, max_per_hour: int):
+        self.max_per_hour = max_per_hour
+        self._started: Deque[float] = deque()
+        self._active = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[str]:
+        """Take the profiling slot, or return why it is refused"""
+        now = time.monotonic()
+        with self._lock:
+            if self._active:
+                return "busy"
+            while self._started and now - self._started[0] >= 3600:
+                self._started.popleft()
+            if len(self._started) >= self.max_per_hour:
+                return "rate-limited"
+            self._started.append(now)
+            self._active = True
+        return None
+
+    def release(self) -> None:
+        with self._lock:
+            self._active = False
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_HISTORY)
+
+def follow_task(task: asyncio.Task, name: str) -> None:
+    """Include a task started by a profiled request, such as a queued theme build, in its profile"""
+    profiler = _active_profile.get()
+    if profiler is not None:
+        profiler.follow(task, name)
+
+def authorized(token: Optional[str]) -> bool:
+    """Check a profiling token; profiling is disabled while PROFILE_TOKEN is empty"""
+    return bool(settings.PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, settings.PROFILE_TOKEN)
+
+class ProfilingMiddleware:
+    """Profiles requests that carry the profiling token in `X-Profile` or `?profile=`.
+
+    The response is sent as usual, with `X-Profile-Id` naming the stored
+    profile, or `X-Profile-Status` saying why none was taken. The profile
+    covers the request and any job it queued, and is written once they
+    finish. Reads of the stored profiles themselves are never profiled.
+    """
+
+    excluded_prefix = "/api/profiles"
+
+    def __init__(self, app: ASGIApp, store: Optional[ProfileStore] = None, limiter: Optional[ProfileLimiter] = None):
+        self.app = app
+        self.store = store if store is not None else profile_store
+        self.limiter = limiter if limiter is not None else ProfileLimiter(settings.PROFILE_MAX_PER_HOUR)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        token = None
+        if scope["type"] == "http" and settings.PROFILE_TOKEN and not scope["path"].startswith(self.excluded_prefix):
+            token = self._token(scope)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+        if not authorized(token):
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"denied")]))
+            return
+        refused = self.limiter.acquire()
+        if refused is not None:
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", refused.encode())]))
+            return
+
+        profiler = SamplingProfiler(
+            f"{scope['method']} {scope['path']}",
+            settings.PROFILE_INTERVAL_SECONDS,
+            settings.PROFILE_MAX_SECONDS,
+            on_finish=self._finish
+        )
+        request_task = asyncio.current_task()
+        profiler.follow(request_task, "request")
+        profiler.start()
+        context_token = _active_profile.set(profiler)
+        try:
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-id", profiler.id.encode())]))
+        finally:
+            _active_profile.reset(context_token)
+            profiler.unfollow(request_task)
+
+    def _finish(self, profiler: SamplingProfiler) -> None:
+        try:
+            self.store.save(profiler)
+        finally:
+            self.limiter.release()
+
+    def _token(self, scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1")
+        query = scope.get("query_string", b"")
+        if PROFILE_QUERY.encode() in query:
+            for name, value in parse_qsl(query.decode("latin-1")):
+                if name == PROFILE_QUERY:
+                    return value
+        return None
+
+    def _with_headers(self, send: Send, headers: List[Tuple[bytes, bytes]]) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+        return send_wrapper
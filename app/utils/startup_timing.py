@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Dependencies kept off the import path; the report shows which have loaded
+HEAVY_MODULES = ["aiohttp", "PIL.Image", "aiofiles", "ijson", "brotli", "multiprocessing"]
+
+def process_age() -> float:
+    """Seconds since this process started, or 0 where the OS does not expose it"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces, so fields are counted from its closing paren
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+def module_loaded(name: str) -> bool:
+    """Check whether a module has actually executed, not just been registered lazily"""
+    module = sys.modules.get(name)
+    return module is not None and type(module).__name__ != "_LazyModule"
+
+class StartupTimer:
+    """Records the duration of each startup phase, from process start to the first response"""
+
+    def __init__(self):
+        # Count from process start so the interpreter and imports before this module are included
+        self.started = time.perf_counter() - process_age()
+        self.phases: List[Tuple[str, float]] = []
+        self.services: Dict[str, float] = {}
+        self.first_response: Optional[float] = None
+        self._last = self.started
+
+    def mark(self, phase: str) -> None:
+        """Close the phase running since the previous mark"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def service_started(self, name: str, seconds: float) -> None:
+        self.services[name] = seconds
+
+    def response_sent(self) -> None:
+        if self.first_response is not None:
+            return
+        self.first_response = time.perf_counter()
+        report = self.report()
+        logger.info(
+            "First response %.1fms after process start (%s)",
+            report["time_to_first_response_ms"],
+            ", ".join(f"{phase} {ms:.1f}ms" for phase, ms in report["phases"].items())
+        )
+
+    def report(self) -> dict:
+        return {
+            "phases": {phase: round(seconds * 1000, 2) for phase, seconds in self.phases},
+            "services": {name: round(seconds * 1000, 2) for name, seconds in self.services.items()},
+            "time_to_first_response_ms": (
+                round((self.first_response - self.started) * 1000, 2) if self.first_response is not None else None
+            ),
+            "loaded_modules": {name: module_loaded(name) for name in HEAVY_MODULES}
+        }
+
+class StartupTimingMiddleware:
+    """Tells the startup timer when the first HTTP response has started"""
+
+    def __init__(self, app: ASGIApp, timer: StartupTimer):
+        self.app = app
+        self.timer = timer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.timer.first_response is not None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self.timer.response_sent()
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+startup_timer = StartupTimer()
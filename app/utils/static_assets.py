@@ -0,0 +1,295 @@
+import os
+import re
+import time
+import logging
+import mimetypes
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import anyio
+from starlette.requests import Request
+from starlette.types import Receive, Scope, Send
+from ..config import settings
+from .http_cache import accepted_encodings, encoded_etag, etag_matches
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed file names start with a SHA-256 digest and never change
+HASHED_NAME = re.compile(r"^[0-9a-f]{64}[-.]")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "no-cache"
+
+# Precompressed siblings, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+CONTENT_TYPES = {
+    ".avif": "image/avif",
+    ".webp": "image/webp",
+    ".png": "image/png",
+    ".json": "application/json"
+}
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+class _Entry:
+    """Metadata, and for small files the contents, of one file representation"""
+
+    __slots__ = ("path", "size", "mtime_ns", "etag", "data", "checked_at")
+
+    def __init__(self, path: str, size: int, mtime_ns: int, etag: str, data: Optional[bytes]):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.etag = etag
+        self.data = data
+        self.checked_at = time.monotonic()
+
+class _Asset:
+    __slots__ = ("identity", "encoded", "content_type", "immutable")
+
+    def __init__(self, identity: _Entry, encoded: Dict[str, _Entry], content_type: str, immutable: bool):
+        self.identity = identity
+        self.encoded = encoded
+        self.content_type = content_type
+        self.immutable = immutable
+
+class StaticAssets:
+    """ASGI app serving the asset store with caching-friendly headers.
+
+    Content-addressed names get a strong ETag derived from the name and
+    `Cache-Control: immutable`. Single byte ranges are honoured, and `.br`
+    or `.gz` siblings written next to a file are served to clients that
+    accept them. Files up to `max_file_bytes` are kept in an LRU memory
+    cache, so hot assets are served without touching the disk; larger
+    files use the server's zero-copy extension when it offers one and
+    chunked reads otherwise.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_file_bytes: Optional[int] = None,
+        max_cache_bytes: Optional[int] = None,
+        revalidate_seconds: Optional[float] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.directory = os.path.realpath(directory)
+        self.max_file_bytes = settings.STATIC_CACHE_MAX_FILE_BYTES if max_file_bytes is None else max_file_bytes
+        self.max_cache_bytes = settings.STATIC_CACHE_MAX_BYTES if max_cache_bytes is None else max_cache_bytes
+        self.revalidate_seconds = settings.STATIC_REVALIDATE_SECONDS if revalidate_seconds is None else revalidate_seconds
+        self.chunk_size = settings.STATIC_CHUNK_SIZE if chunk_size is None else chunk_size
+        self._assets: "OrderedDict[str, _Asset]" = OrderedDict()
+        self._cached_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send_empty(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+        path = self._resolve(scope["path"])
+        asset = await self._lookup(path) if path is not None else None
+        if asset is None:
+            await self._send_empty(send, 404, [(b"content-type", b"text/plain")], b"Not Found")
+            return
+
+        request = Request(scope)
+        headers = [
+            (b"cache-control", (IMMUTABLE_CACHE_CONTROL if asset.immutable else MUTABLE_CACHE_CONTROL).encode()),
+            (b"accept-ranges", b"bytes")
+        ]
+        if asset.encoded:
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        byte_range = request.headers.get("range")
+        encoding, entry = (None, asset.identity) if byte_range else self._negotiate(request, asset)
+        headers.append((b"etag", entry.etag.encode()))
+        if etag_matches(request, entry.etag):
+            await self._send_empty(send, 304, headers)
+            return
+
+        headers.append((b"content-type", asset.content_type.encode()))
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding.encode()))
+        start, end, status = 0, entry.size, 200
+        if byte_range and self._if_range_matches(request, entry):
+            parsed = self._parse_range(byte_range, entry.size)
+            if parsed is None:
+                headers.append((b"content-range", f"bytes */{entry.size}".encode()))
+                await self._send_empty(send, 416, headers)
+                return
+            if parsed != (0, entry.size):
+                start, end = parsed
+                status = 206
+                headers.append((b"content-range", f"bytes {start}-{end - 1}/{entry.size}".encode()))
+        headers.append((b"content-length", str(end - start).encode()))
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if scope["method"] == "HEAD" or end == start:
+            await send({"type": "http.response.body", "body": b""})
+        elif entry.data is not None:
+            await send({"type": "http.response.body", "body": entry.data[start:end]})
+        else:
+            await self._send_file(scope, send, entry.path, start, end)
+
+    def _resolve(self, request_path: str) -> Optional[str]:
+        """Map a request path to a file path in the asset directory, refusing hidden and partial files"""
+        parts = request_path.strip("/").split("/")
+        for part in parts:
+            if not part or part.startswith(".") or part.endswith(".tmp") or "\\" in part:
+                return None
+        return os.path.join(self.directory, *parts)
+
+    async def _lookup(self, path: str) -> Optional[_Asset]:
+        """Get a cached asset, touching the disk on a worker thread only to revalidate or load it"""
+        asset = self._assets.get(path)
+        if asset is not None:
+            if time.monotonic() - asset.identity.checked_at < self.revalidate_seconds:
+                self._assets.move_to_end(path)
+                return asset
+            if await anyio.to_thread.run_sync(self._is_current, asset):
+                asset.identity.checked_at = time.monotonic()
+                if path in self._assets:
+                    self._assets.move_to_end(path)
+                return asset
+            self._forget(path)
+
+        asset = await anyio.to_thread.run_sync(self._load, path)
+        if asset is not None:
+            self._forget(path)
+            self._remember(path, asset)
+        return asset
+
+    def _load(self, path: str) -> Optional[_Asset]:
+        """Read a file and its precompressed siblings; runs on a worker thread"""
+        # Symlinks leading out of the asset directory are not followed
+        if os.path.commonpath([self.directory, os.path.realpath(path)]) != self.directory:
+            return None
+        name = os.path.basename(path)
+        immutable = bool(HASHED_NAME.match(name))
+        identity = self._load_entry(path, name, immutable)
+        if identity is None:
+            return None
+        encoded = {}
+        for encoding, suffix in ENCODINGS:
+            entry = self._load_entry(f"{path}{suffix}", name, immutable, encoding)
+            if entry is not None:
+                encoded[encoding] = entry
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1]) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        return _Asset(identity, encoded, content_type, immutable)
+
+    def _load_entry(self, path: str, name: str, immutable: bool, encoding: Optional[str] = None) -> Optional[_Entry]:
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not os.path.isfile(path):
+            return None
+        if immutable:
+            # The name identifies the content, so every worker and host agrees on the tag
+            etag = f'"{name}"'
+        else:
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if encoding is not None:
+            etag = encoded_etag(etag, encoding)
+        data = None
+        if stat.st_size <= self.max_file_bytes:
+            with open(path, "rb") as f:
+                data = f.read()
+        return _Entry(path, stat.st_size, stat.st_mtime_ns, etag, data)
+
+    def _is_current(self, asset: _Asset) -> bool:
+        for entry in [asset.identity] + list(asset.encoded.values()):
+            try:
+                stat = os.stat(entry.path)
+            except FileNotFoundError:
+                return False
+            if (stat.st_mtime_ns, stat.st_size) != (entry.mtime_ns, entry.size):
+                return False
+        return True
+
+    def _remember(self, path: str, asset: _Asset) -> None:
+        self._assets[path] = asset
+        self._cached_bytes += self._asset_bytes(asset)
+        while self._cached_bytes > self.max_cache_bytes and len(self._assets) > 1:
+            oldest = next(iter(self._assets))
+            self._forget(oldest)
+
+    def _forget(self, path: str) -> None:
+        asset = self._assets.pop(path, None)
+        if asset is not None:
+            self._cached_bytes -= self._asset_bytes(asset)
+
+    def _asset_bytes(self, asset: _Asset) -> int:
+        entries = [asset.identity] + list(asset.encoded.values())
+        return sum(len(entry.data) for entry in entries if entry.data is not None)
+
+    def _negotiate(self, request: Request, asset: _Asset) -> Tuple[Optional[str], _Entry]:
+        """Pick a precompressed sibling the client accepts, falling back to the identity file"""
+        if not asset.encoded:
+            return None, asset.identity
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for encoding, _ in ENCODINGS:
+            if encoding in asset.encoded and encoding in accepted:
+                return encoding, asset.encoded[encoding]
+        return None, asset.identity
+
+    def _if_range_matches(self, request: Request, entry: _Entry) -> bool:
+        """Apply a Range only if the client's If-Range validator still matches"""
+        if_range = request.headers.get("if-range")
+        return if_range is None or if_range.strip() == entry.etag
+
+    def _parse_range(self, header: str, size: int) -> Optional[Tuple[int, int]]:
+        """Parse a single byte range into [start, end), or None if it cannot be satisfied.
+
+        Multiple ranges are answered with the whole file, as RFC 9110 allows.
+        """
+        match = RANGE_PATTERN.match(header.strip())
+        if match is None:
+            return (0, size)
+        first, last = match.groups()
+        if not first and not last:
+            return (0, size)
+        if not first:
+            suffix = int(last)
+            if suffix == 0:
+                return None
+            return (max(0, size - suffix), size)
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+        if start >= size or end <= start:
+            return None
+        return (start, end)
+
+    async def _send_file(self, scope: Scope, send: Send, path: str, start: int, end: int) -> None:
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": start,
+                    "count": end - start
+                })
+            return
+        if "http.response.pathsend" in extensions and start == 0 and end == os.path.getsize(path):
+            await send({"type": "http.response.pathsend", "path": path})
+            return
+        async with await anyio.open_file(path, "rb") as f:
+            await f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b""})
+
+    async def _send_empty(self, send: Send, status: int, headers: list, body: bytes = b"") -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers + [(b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,244 @@
+import sys
+import json
+import time
+import uuid
+import queue
+import random
+import atexit
+import logging
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..config import settings
+
+access_logger = logging.getLogger("app.access")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every record has; anything else on a record was passed through `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class RequestContext:
+    __slots__ = ("request_id", "sampled")
+
+    def __init__(self, request_id: str, sampled: bool):
+        self.request_id = request_id
+        self.sampled = sampled
+
+# Set by the request logging middleware; tasks started by a request inherit it
+_request_context: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar("request_context", default=None)
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object, with `extra` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller and leaves formatting to the listener.
+
+    The listener runs in this process, so records are queued as they are:
+    the message is interpolated and exceptions formatted on the listener
+    thread instead of the request path. Arguments are therefore rendered
+    as they are when written, not when logged. A full queue drops the
+    record and counts it.
+    """
+
+    def __init__(self, record_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class RequestSamplingFilter(logging.Filter):
+    """Drops sub-WARNING records of requests not sampled, and tags the rest with the request id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _request_context.get()
+        if context is None:
+            return True
+        if not context.sampled and record.levelno < logging.WARNING:
+            return False
+        record.request_id = context.request_id
+        return True
+
+class LoggingManager:
+    """Owns the logging pipeline and the settings that can change at runtime.
+
+    Callers put records on a bounded queue through a non-blocking handler
+    on the root logger; a `QueueListener` thread formats and writes them.
+    Per-route sample rates decide, once per request, whether its access
+    line and sub-WARNING records are kept.
+    """
+
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self.sample_rates: Dict[str, float] = {}
+        self._prefixes = []
+        self.set_sample_rates(settings.LOG_SAMPLE_RATES)
+        self.slow_request_ms = settings.LOG_SLOW_REQUEST_MS
+
+    def configure(
+        self,
+        level: Optional[str] = None,
+        levels: Optional[Dict[str, str]] = None,
+        log_format: Optional[str] = None,
+        queue_size: Optional[int] = None,
+        sample_rates: Optional[Dict[str, float]] = None,
+        slow_request_ms: Optional[float] = None,
+        stream=None
+    ) -> None:
+        """Install the queue handler on the root logger, replacing a previous configuration"""
+        log_format = settings.LOG_FORMAT if log_format is None else log_format
+        if log_format not in ("json", "text"):
+            raise ValueError(f"Unknown log format: {log_format}")
+        self.stop()
+
+        output = logging.StreamHandler(sys.stderr if stream is None else stream)
+        output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+        record_queue = queue.Queue(settings.LOG_QUEUE_SIZE if queue_size is None else queue_size)
+        self.handler = NonBlockingQueueHandler(record_queue)
+        self.handler.addFilter(RequestSamplingFilter())
+        self.listener = QueueListener(record_queue, output)
+        logging.getLogger().addHandler(self.handler)
+        self.listener.start()
+
+        self.set_levels(settings.LOG_LEVEL if level is None else level, settings.LOG_LEVELS if levels is None else levels)
+        self.set_sample_rates(settings.LOG_SAMPLE_RATES if sample_rates is None else sample_rates)
+        self.slow_request_ms = settings.LOG_SLOW_REQUEST_MS if slow_request_ms is None else slow_request_ms
+
+    def stop(self) -> None:
+        """Write out queued records and remove the handler"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        if self.handler is not None:
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = None
+
+    def set_levels(self, level: Optional[str] = None, levels: Optional[Dict[str, Optional[str]]] = None) -> None:
+        """Set the root level and per-logger levels; a None logger level defers to its parent"""
+        updates = dict(levels or {})
+        if level is not None:
+            updates[""] = level
+        resolved = {}
+        for name, value in updates.items():
+            if value is None:
+                resolved[name] = logging.NOTSET
+                continue
+            number = logging.getLevelName(value.upper())
+            if not isinstance(number, int):
+                raise ValueError(f"Unknown log level: {value}")
+            resolved[name] = number
+        for name, number in resolved.items():
+            logging.getLogger(name or None).setLevel(number)
+
+    def set_sample_rates(self, sample_rates: Dict[str, float]) -> None:
+        """Replace the per-route sample rates"""
+        for prefix, rate in sample_rates.items():
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError(f"Sample rate for {prefix} must be between 0 and 1")
+        self.sample_rates = dict(sample_rates)
+        # Longest prefix first, so the most specific route wins
+        self._prefixes = sorted(self.sample_rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def sample_rate(self, path: str) -> float:
+        for prefix, rate in self._prefixes:
+            if path.startswith(prefix):
+                return rate
+        return 1.0
+
+    def state(self) -> dict:
+        """Describe the current levels, sampling and queue"""
+        root = logging.getLogger()
+        levels = {
+            name: logging.getLevelName(logger.level)
+            for name, logger in sorted(logging.Logger.manager.loggerDict.items())
+            if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET
+        }
+        record_queue = self.handler.queue if self.handler is not None else None
+        return {
+            "level": logging.getLevelName(root.level),
+            "levels": levels,
+            "sample_rates": self.sample_rates,
+            "slow_request_ms": self.slow_request_ms,
+            "queue": {
+                "size": record_queue.qsize() if record_queue is not None else 0,
+                "max_size": record_queue.maxsize if record_queue is not None else 0,
+                "dropped": self.handler.dropped if self.handler is not None else 0
+            }
+        }
+
+class RequestLoggingMiddleware:
+    """Samples each request by route, tags its records with a request id and writes an access line.
+
+    Server errors and requests slower than `slow_request_ms` are logged at
+    WARNING, so they are kept whatever the sample rate.
+    """
+
+    def __init__(self, app: ASGIApp, manager: "LoggingManager"):
+        self.app = app
+        self.manager = manager
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        rate = self.manager.sample_rate(path)
+        sampled = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        token = _request_context.set(RequestContext(request_id or uuid.uuid4().hex, sampled))
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            level = logging.WARNING if status >= 500 or duration_ms >= self.manager.slow_request_ms else logging.INFO
+            if (sampled or level >= logging.WARNING) and access_logger.isEnabledFor(level):
+                access_logger.log(
+                    level, "%s %s %d %.1fms", scope["method"], path, status, duration_ms,
+                    extra={"method": scope["method"], "path": path, "status": status, "duration_ms": round(duration_ms, 2)}
+                )
+            _request_context.reset(token)
+
+log_manager = LoggingManager()
+atexit.register(log_manager.stop)
@@ -0,0 +1,75 @@
+import re
+import json
+import hashlib
+from typing import Any, Dict, NamedTuple
+from .asset_processor import ASSET_URL_PREFIX
+
+# Keys under these names hold image URLs, written as url() values
+IMAGE_KEYS = {"images", "backgroundImage"}
+# Manifests describe image variants for the JS client and have no CSS form
+SKIPPED_KEYS = {"imageManifests"}
+# Characters that would end the declaration or the rule a value sits in
+UNSAFE_VALUE = re.compile(r"[;{}<>\\\n\r]")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]+")
+
+# Stylesheets are served under the theme routes, at /api/themes/{id}/css/{digest}.css
+STYLESHEET_URL_PREFIX = "/api/themes/"
+
+class ThemeStylesheet(NamedTuple):
+    css: bytes
+    tokens: Dict[str, str]
+    # Content hash of the stylesheet, used in its immutable URL
+    digest: str
+    url: str
+    # The token map with the stylesheet URL, as served JSON
+    tokens_body: bytes
+    # Strong ETag of `tokens_body`, which names the theme and so differs between themes with equal tokens
+    tokens_etag: str
+    # Compressed copies of `css` and `tokens_body`, keyed by their coded ETag
+    encoded: Dict[str, bytes]
+
+def _name_part(key: str) -> str:
+    return INVALID_NAME_CHARS.sub("-", CAMEL_BOUNDARY.sub("-", key)).strip("-").lower()
+
+def _css_value(value: Any, image: bool) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if not isinstance(value, str):
+        return ""
+    if image:
+        return 'url("' + value.replace("\\", "\\\\").replace('"', '\\"') + '")' if value.startswith(ASSET_URL_PREFIX) else ""
+    return "" if UNSAFE_VALUE.search(value) else value.strip()
+
+def flatten_tokens(components: Dict[str, Any]) -> Dict[str, str]:
+    """Flatten nested components into CSS custom properties, e.g. `--button-primary-hover-background`"""
+    tokens: Dict[str, str] = {}
+
+    def visit(value: Any, prefix: str, image: bool) -> None:
+        if isinstance(value, dict):
+            for key, child in value.items():
+                if key in SKIPPED_KEYS:
+                    continue
+                name = _name_part(str(key))
+                visit(child, f"{prefix}-{name}" if name else prefix, image or key in IMAGE_KEYS)
+            return
+        css_value = _css_value(value, image)
+        if css_value:
+            tokens[f"-{prefix}"] = css_value
+
+    visit(components, "", False)
+    return tokens
+
+def compile_theme_css(theme_id: str, components: Dict[str, Any]) -> ThemeStylesheet:
+    """Compile a theme's components into a minified `:root` stylesheet and its token map"""
+    tokens = flatten_tokens(components)
+    css = (":root{" + ";".join(f"{name}:{value}" for name, value in tokens.items()) + "}").encode("utf-8")
+    digest = hashlib.sha256(css).hexdigest()[:16]
+    url = f"{STYLESHEET_URL_PREFIX}{theme_id}/css/{digest}.css"
+    tokens_body = json.dumps(
+        {"theme_id": theme_id, "digest": digest, "css_url": url, "tokens": tokens}, separators=(",", ":")
+    ).encode("utf-8")
+    tokens_etag = '"' + hashlib.sha256(tokens_body).hexdigest()[:32] + '"'
+    return ThemeStylesheet(css, tokens, digest, url, tokens_body, tokens_etag, {})
@@ -3,6 +3,7 @@ import os
 from typing import Dict, Any
 from datetime import datetime
 from ..models.theme import Theme
+from .theme_schema import theme_validator
 
 class ThemeLoader:
     @staticmethod
@@ -35,21 +36,4 @@ class ThemeLoader:
     @staticmethod
     def validate_theme_structure(theme_data: Dict[str, Any]) -> bool:
         """Validate the structure of a theme configuration"""
-        required_fields = ["id", "name", "components"]
-        if not all(field in theme_data for field in required_fields):
-            return False
-        
-        required_components = [
-            "app",
-            "navbar",
-            "sidebar",
-            "button",
-            "card",
-            "input",
-            "modal",
-            "toast",
-            "loading"
-        ]
-        
-        components = theme_data.get("components", {})
-        return all(component in components for component in required_components) 
\ No newline at end of file
+        return theme_validator.validate(theme_data).valid
@@ -0,0 +1,281 @@
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Pattern, Sequence, Tuple, Union
+from ..config import settings
+from .json_patch import format_pointer
+
+REQUIRED_COMPONENTS = ["app", "navbar", "sidebar", "button", "card", "input", "modal", "toast", "loading"]
+
+# Keys whose string values are colors: the base style keys, their state variants
+# (`hoverBackground`, `activeText`) and anything named `...Color`, e.g. `spinnerColor`.
+# Other `...Text` and `...Border` keys, such as `buttonText`, may hold labels or shorthands.
+_STATES = r"(?:hover|active|focus|disabled|selected|checked|pressed|visited)"
+COLOR_KEY = re.compile(
+    r"^(?:color|background|text|overlay|placeholder"
+    rf"|{_STATES}(?:Background|Text|Overlay|Placeholder)"
+    r"|[a-z][a-zA-Z0-9]*Color)$"
+)
+# Keys holding a color or a `border` shorthand, e.g. "1px solid #333"
+BORDER_KEY = re.compile(rf"^(?:border|{_STATES}Border)$")
+
+NAMED_COLORS = (
+    "aliceblue antiquewhite aqua aquamarine azure beige bisque black blanchedalmond blue blueviolet brown "
+    "burlywood cadetblue chartreuse chocolate coral cornflowerblue cornsilk crimson cyan darkblue darkcyan "
+    "darkgoldenrod darkgray darkgreen darkgrey darkkhaki darkmagenta darkolivegreen darkorange darkorchid "
+    "darkred darksalmon darkseagreen darkslateblue darkslategray darkslategrey darkturquoise darkviolet "
+    "deeppink deepskyblue dimgray dimgrey dodgerblue firebrick floralwhite forestgreen fuchsia gainsboro "
+    "ghostwhite gold goldenrod gray green greenyellow grey honeydew hotpink indianred indigo ivory khaki "
+    "lavender lavenderblush lawngreen lemonchiffon lightblue lightcoral lightcyan lightgoldenrodyellow "
+    "lightgray lightgreen lightgrey lightpink lightsalmon lightseagreen lightskyblue lightslategray "
+    "lightslategrey lightsteelblue lightyellow lime limegreen linen magenta maroon mediumaquamarine "
+    "mediumblue mediumorchid mediumpurple mediumseagreen mediumslateblue mediumspringgreen mediumturquoise "
+    "mediumvioletred midnightblue mintcream mistyrose moccasin navajowhite navy oldlace olive olivedrab "
+    "orange orangered orchid palegoldenrod palegreen paleturquoise palevioletred papayawhip peachpuff peru "
+    "pink plum powderblue purple rebeccapurple red rosybrown royalblue saddlebrown salmon sandybrown "
+    "seagreen seashell sienna silver skyblue slateblue slategray slategrey snow springgreen steelblue tan "
+    "teal thistle tomato turquoise violet wheat white whitesmoke yellow yellowgreen"
+).split()
+_NUMBER = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?"
+_CHANNEL = rf"(?:{_NUMBER}(?:%|deg|grad|rad|turn)?|none)"
+_COLOR = (
+    r"(?:#(?:[0-9a-f]{3,4}|[0-9a-f]{6}|[0-9a-f]{8})"
+    # Comma-separated, or space-separated with an optional "/ alpha"
+    rf"|(?:rgba?|hsla?)\(\s*{_CHANNEL}\s*(?:,\s*{_CHANNEL}\s*){{2,3}}\)"
+    rf"|(?:rgba?|hsla?)\(\s*{_CHANNEL}(?:\s+{_CHANNEL}){{2}}(?:\s*/\s*{_CHANNEL})?\s*\)"
+    rf"|transparent|currentcolor|inherit|{'|'.join(NAMED_COLORS)})"
+)
+COLOR_VALUE = re.compile(rf"^{_COLOR}$", re.IGNORECASE)
+_BORDER_PART = (
+    rf"(?:{_COLOR}|0|{_NUMBER}(?:px|em|rem|pt|%)|thin|medium|thick"
+    r"|none|hidden|dotted|dashed|solid|double|groove|ridge|inset|outset)"
+)
+BORDER_VALUE = re.compile(rf"^{_BORDER_PART}(?:\s+{_BORDER_PART}){{0,2}}$", re.IGNORECASE)
+
+# (pointer tokens, message); the path is formatted only for failing documents
+Issue = Tuple[Tuple[str, ...], str]
+Rule = Callable[[Any, Tuple[str, ...], List[Issue]], None]
+
+class ValidationResult(NamedTuple):
+    valid: bool
+    # Each error as {"path": JSON pointer, "message": ...}
+    errors: List[Dict[str, str]]
+    digest: str
+
+_JSON_TYPES = {
+    "object": (dict,), "array": (list,), "string": (str,), "boolean": (bool,), "null": (type(None),), "number": (int, float)
+}
+
+def _type_check(types: Sequence[str]) -> Callable[[Any], bool]:
+    python_types = tuple(python_type for name in types for python_type in _JSON_TYPES[name])
+    allows_bool = "boolean" in types
+    # bool is an int in Python but not a number in JSON
+    return lambda value: isinstance(value, python_types) and (allows_bool or not isinstance(value, bool))
+
+def compile_rule(spec: Dict[str, Any], definitions: Dict[str, Rule]) -> Rule:
+    """Compile a schema node into a validation function.
+
+    Supports the subset the theme schema uses: `type`, `minLength`,
+    `pattern`, `minimum`, `maximum`, `required`, `properties`,
+    `patternProperties` (the first matching pattern applies),
+    `additionalProperties`, `items` and `$ref` to a named definition.
+    """
+    if "$ref" in spec:
+        name = spec["$ref"]
+        # Resolved when called, so definitions may refer to themselves
+        return lambda value, path, issues: definitions[name](value, path, issues)
+
+    checks: List[Rule] = []
+    types = spec.get("type")
+    type_names = [types] if isinstance(types, str) else list(types or [])
+    is_type = _type_check(type_names) if type_names else None
+
+    if "minLength" in spec:
+        min_length = spec["minLength"]
+        checks.append(lambda value, path, issues: issues.append((path, f"must have at least {min_length} characters"))
+                      if isinstance(value, str) and len(value) < min_length else None)
+    if "pattern" in spec:
+        pattern: Pattern = re.compile(spec["pattern"]) if isinstance(spec["pattern"], str) else spec["pattern"]
+        message = spec.get("patternMessage", f"must match {pattern.pattern}")
+        checks.append(lambda value, path, issues: issues.append((path, message))
+                      if isinstance(value, str) and not pattern.match(value) else None)
+    if "minimum" in spec or "maximum" in spec:
+        minimum, maximum = spec.get("minimum"), spec.get("maximum")
+
+        def check_range(value, path, issues):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if minimum is not None and value < minimum:
+                    issues.append((path, f"must be at least {minimum}"))
+                elif maximum is not None and value > maximum:
+                    issues.append((path, f"must be at most {maximum}"))
+        checks.append(check_range)
+    if "items" in spec:
+        item_rule = compile_rule(spec["items"], definitions)
+
+        def check_items(value, path, issues):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    item_rule(item, path + (str(index),), issues)
+        checks.append(check_items)
+    if any(key in spec for key in ("required", "properties", "patternProperties", "additionalProperties")):
+        required = tuple(spec.get("required", ()))
+        properties = {key: compile_rule(child, definitions) for key, child in spec.get("properties", {}).items()}
+        patterns = [
+            (re.compile(pattern) if isinstance(pattern, str) else pattern, compile_rule(child, definitions))
+            for pattern, child in spec.get("patternProperties", {}).items()
+        ]
+        additional = spec.get("additionalProperties", True)
+        additional_rule = compile_rule(additional, definitions) if isinstance(additional, dict) else None
+
+        def check_object(value, path, issues):
+            if not isinstance(value, dict):
+                return
+            for key in required:
+                if key not in value:
+                    issues.append((path + (key,), "is required"))
+            for key, child in value.items():
+                rule = properties.get(key)
+                if rule is None:
+                    rule = next((rule for pattern, rule in patterns if pattern.match(key)), None)
+                if rule is None:
+                    if additional is False:
+                        issues.append((path + (key,), "is not allowed"))
+                        continue
+                    rule = additional_rule
+                if rule is not None:
+                    rule(child, path + (key,), issues)
+        checks.append(check_object)
+
+    expected = " or ".join(type_names)
+
+    def validate(value, path, issues):
+        if is_type is not None and not is_type(value):
+            issues.append((path, f"must be {expected}"))
+            return
+        for check in checks:
+            check(value, path, issues)
+    return validate
+
+def compile_schema(schema: Dict[str, Any]) -> Rule:
+    """Compile a schema and its `definitions` once, for repeated validation"""
+    definitions: Dict[str, Rule] = {}
+    for name, spec in schema.get("definitions", {}).items():
+        definitions[name] = compile_rule(spec, definitions)
+    return compile_rule(schema, definitions)
+
+_ASSET_MAP = {"type": "object", "additionalProperties": {"type": "string", "minLength": 1}}
+_SIZE = {"type": ["number", "null"], "minimum": 0}
+# Rules for the keys of a component and of any group nested in one, such as `button.primary` or a Figma fill
+_STYLE = {
+    "properties": {
+        "images": _ASSET_MAP,
+        "imageManifests": _ASSET_MAP,
+        "backgroundImage": {"type": "string", "minLength": 1},
+        "opacity": {"type": "number", "minimum": 0, "maximum": 1},
+        "width": _SIZE,
+        "height": _SIZE,
+        "radius": _SIZE,
+        "weight": _SIZE,
+        "spacing": _SIZE
+    },
+    "patternProperties": {BORDER_KEY: {"$ref": "border"}, COLOR_KEY: {"$ref": "color"}},
+    "additionalProperties": {"$ref": "value"},
+    "items": {"$ref": "value"}
+}
+
+THEME_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "required": ["id", "name", "components"],
+    "properties": {
+        "id": {"type": "string", "minLength": 1},
+        "name": {"type": "string", "minLength": 1},
+        "description": {"type": ["string", "null"]},
+        "figma_url": {"type": "string"},
+        "components": {
+            "type": "object",
+            "required": REQUIRED_COMPONENTS,
+            "additionalProperties": {"$ref": "component"}
+        }
+    },
+    "definitions": {
+        "component": {"type": "object", **_STYLE},
+        "value": _STYLE,
+        "color": {
+            **_STYLE,
+            "type": ["string", "object", "null"],
+            "pattern": COLOR_VALUE,
+            "patternMessage": "must be a hex, rgb(), rgba(), hsl(), hsla() or named color"
+        },
+        "border": {
+            **_STYLE,
+            "type": ["string", "object", "null"],
+            "pattern": BORDER_VALUE,
+            "patternMessage": "must be a color or a border shorthand such as 1px solid #333"
+        }
+    }
+}
+
+class ThemeValidator:
+    """Validates theme documents against the compiled theme schema.
+
+    Results are memoized by a hash of the document, so re-validating an
+    unchanged theme (or a repeated line in a batch) is a dictionary lookup.
+    Every problem is reported, not just the first.
+    """
+
+    def __init__(self, cache_size: int = 4096, schema: Dict[str, Any] = THEME_SCHEMA):
+        self._rule = compile_schema(schema)
+        self.cache_size = cache_size
+        self._results: "OrderedDict[str, ValidationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def validate(self, document: Any) -> ValidationResult:
+        """Validate a parsed theme document"""
+        try:
+            canonical = json.dumps(document, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            return ValidationResult(False, [{"path": "", "message": f"is not JSON: {e}"}], "")
+        return self._memoized(hashlib.sha256(canonical).hexdigest(), lambda: document)
+
+    def validate_json(self, raw: Union[str, bytes]) -> ValidationResult:
+        """Validate a serialized theme document; a repeated document is not parsed again"""
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        return self._memoized(hashlib.sha256(raw.strip()).hexdigest(), lambda: json.loads(raw))
+
+    def _memoized(self, digest: str, load: Callable[[], Any]) -> ValidationResult:
+        with self._lock:
+            result = self._results.get(digest)
+            if result is not None:
+                self._results.move_to_end(digest)
+                self.hits += 1
+                return result
+            self.misses += 1
+        try:
+            document = load()
+        except ValueError as e:
+            return ValidationResult(False, [{"path": "", "message": f"is not valid JSON: {e}"}], digest)
+        issues: List[Issue] = []
+        self._rule(document, (), issues)
+        result = ValidationResult(
+            not issues, [{"path": format_pointer(list(path)), "message": message} for path, message in issues], digest
+        )
+        with self._lock:
+            self._results[digest] = result
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+def describe_errors(result: ValidationResult) -> str:
+    """Summarize a failed validation for an error response"""
+    return "; ".join(f"{error['path'] or '/'} {error['message']}" for error in result.errors)
+
+theme_validator = ThemeValidator(settings.VALIDATION_CACHE_SIZE)
@@ -0,0 +1,116 @@
+"""Event-loop lag and theme read latency while a theme's images are processed.
+
+Compares processing images inline on the event loop with the thread and
+process pools. A local stub server returns large PNGs, and theme list reads
+are served through the ASGI app while the assets are being processed.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_asset_event_loop
+"""
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+os.environ.setdefault("THEME_STORE", "memory")
+
+import httpx
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+
+from app.main import app
+from app.utils.asset_index import AssetIndex
+from app.utils.asset_processor import AssetProcessor, INLINE_EXECUTOR, PROCESS_EXECUTOR, THREAD_EXECUTOR
+from app.utils.http_client import HTTPClient
+
+IMAGES = 4
+IMAGE_SIZE = (2400, 2400)
+PROBE_INTERVAL = 0.005
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+def png_bytes():
+    buffer = BytesIO()
+    Image.merge("RGB", [Image.effect_noise(IMAGE_SIZE, 64) for _ in range(3)]).save(buffer, "PNG")
+    return buffer.getvalue()
+
+async def probe_lag(done, samples):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+async def read_themes(client, done, samples):
+    while not done.is_set():
+        start = time.perf_counter()
+        response = await client.get("/api/themes/")
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(PROBE_INTERVAL)
+
+async def measure(executor_kind, components, client):
+    http_client = HTTPClient(max_retries=0)
+    directory = tempfile.mkdtemp()
+    processor = AssetProcessor(http_client, AssetIndex(os.path.join(directory, "assets.db")))
+    processor.assets_dir = directory
+    processor.executor_kind = executor_kind
+
+    done = asyncio.Event()
+    lag, reads = [], []
+    probes = [
+        asyncio.create_task(probe_lag(done, lag)),
+        asyncio.create_task(read_themes(client, done, reads))
+    ]
+    start = time.perf_counter()
+    try:
+        await processor.process_assets(components)
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*probes)
+        await processor.close()
+        await http_client.close()
+
+    print(
+        f"{executor_kind:<8} total={elapsed:6.2f}s  "
+        f"loop lag p50={statistics.median(lag):7.2f}ms p99={percentile(lag, 99):7.2f}ms max={max(lag):7.2f}ms  "
+        f"theme read p99={percentile(reads, 99):7.2f}ms max={max(reads):8.2f}ms reads={len(reads)}"
+    )
+
+async def run():
+    # Distinct images, so content-addressed storage cannot skip processing
+    bodies = [png_bytes() for _ in range(IMAGES)]
+
+    async def handler(request):
+        return web.Response(body=bodies[int(request.match_info["name"])], content_type="image/png")
+
+    application = web.Application()
+    application.add_routes([web.get("/images/{name}", handler)])
+    server = TestServer(application)
+    await server.start_server()
+    components = {
+        f"component{index}": {"backgroundImage": str(server.make_url(f"/images/{index}"))}
+        for index in range(IMAGES)
+    }
+
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            for executor_kind in (INLINE_EXECUTOR, THREAD_EXECUTOR, PROCESS_EXECUTOR):
+                await measure(executor_kind, components, client)
+    finally:
+        await server.close()
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{IMAGES} images of {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}, {os.cpu_count()} CPUs")
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Peak RSS while ingesting hundreds of large images, buffered vs streamed.
+
+Each mode runs in a fresh interpreter so `ru_maxrss` reflects only that
+mode. "buffered" keeps every body in memory (the old `response.read()`
+behaviour); "streamed" spills bodies over ASSET_SPILL_BYTES to temporary
+files. Every image has the same content, so after the first few are
+encoded the rest are matched by digest and only the download path is
+exercised, which is what this measures.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_asset_memory
+"""
+import asyncio
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+IMAGES = 300
+IMAGE_SIZE = (1200, 1200)
+
+def png_bytes():
+    from PIL import Image
+    buffer = BytesIO()
+    Image.merge("RGB", [Image.effect_noise(IMAGE_SIZE, 64) for _ in range(3)]).save(buffer, "PNG")
+    return buffer.getvalue()
+
+async def ingest(mode):
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from app.utils.asset_index import AssetIndex
+    from app.utils.asset_processor import AssetProcessor
+    from app.utils.http_client import HTTPClient
+
+    body = png_bytes()
+
+    async def handler(request):
+        return web.Response(body=body, content_type="image/png")
+
+    application = web.Application()
+    application.add_routes([web.get("/images/{name}", handler)])
+    server = TestServer(application)
+    await server.start_server()
+    components = {
+        f"component{index}": {"backgroundImage": str(server.make_url(f"/images/{index}"))}
+        for index in range(IMAGES)
+    }
+
+    directory = tempfile.mkdtemp()
+    http_client = HTTPClient(max_retries=0, limit_per_host=100)
+    processor = AssetProcessor(http_client, AssetIndex(os.path.join(directory, "assets.db")))
+    processor.assets_dir = directory
+    processor.per_host_concurrency = processor.concurrency
+    if mode == "buffered":
+        processor.spill_bytes = processor.max_bytes
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    try:
+        await processor.process_assets(components)
+    finally:
+        elapsed = time.perf_counter() - start
+        await processor.close()
+        await http_client.close()
+        await server.close()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"{mode:<9} {IMAGES} x {len(body) / 1e6:.1f} MB  {elapsed:6.2f}s  "
+        f"peak RSS {peak / 1024:7.1f} MiB (+{(peak - baseline) / 1024:.1f} MiB over startup)"
+    )
+
+def main():
+    if len(sys.argv) > 1:
+        logging.disable(logging.INFO)
+        asyncio.run(ingest(sys.argv[1]))
+        return
+    for mode in ("buffered", "streamed"):
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_asset_memory", mode], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Sequential vs concurrent asset processing for a 300-image theme.
+
+A local stub server answers every image after a fixed latency, standing in
+for the Figma image CDN.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_asset_pipeline
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from io import BytesIO
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from PIL import Image
+
+from app.utils.asset_index import AssetIndex
+from app.utils.asset_processor import AssetProcessor
+from app.utils.http_client import HTTPClient
+
+IMAGES = 300
+LATENCY = 0.05
+
+def png_bytes():
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), (0, 168, 255)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+async def run():
+    body = png_bytes()
+
+    async def handler(request):
+        await asyncio.sleep(LATENCY)
+        return web.Response(body=body, content_type="image/png")
+
+    application = web.Application()
+    application.add_routes([web.get("/images/{name}", handler)])
+    server = TestServer(application)
+    await server.start_server()
+    components = {
+        f"component{index}": {"images": {"image": str(server.make_url(f"/images/{index}"))}}
+        for index in range(IMAGES)
+    }
+
+    try:
+        for label, concurrency, per_host in [
+            ("sequential", 1, 1),
+            ("default limits", None, None),
+            ("32 global / 32 per host", 32, 32)
+        ]:
+            http_client = HTTPClient(max_retries=0, limit_per_host=per_host or 100)
+            directory = tempfile.mkdtemp()
+            processor = AssetProcessor(http_client, AssetIndex(os.path.join(directory, "assets.db")))
+            processor.assets_dir = directory
+            if concurrency is not None:
+                processor.concurrency = concurrency
+                processor.per_host_concurrency = per_host
+            start = time.perf_counter()
+            await processor.process_assets(components)
+            elapsed = time.perf_counter() - start
+            await processor.close()
+            await http_client.close()
+            print(
+                f"{label:<24} concurrency={processor.concurrency:3d} per_host={processor.per_host_concurrency:3d} "
+                f"{elapsed:6.2f}s  (sum of latencies {IMAGES * LATENCY:.1f}s)"
+            )
+    finally:
+        await server.close()
+
+def main():
+    logging.disable(logging.INFO)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Measure worker cold start: import time of the app, its slowest modules, and time to first response.
+
+Each run boots a fresh interpreter, so nothing is shared between samples.
+
+Run with: python -m benchmarks.bench_cold_start
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+import tempfile
+from collections import defaultdict
+
+RUNS = 7
+TOP_MODULES = 12
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT = """
+import time, json, logging
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+logging.disable(logging.INFO)
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    client.get("/health")
+    report = client.get("/health/startup").json()
+report["import_ms"] = (imported - started) * 1000
+print(json.dumps(report))
+"""
+
+def boot(env):
+    result = subprocess.run(
+        [sys.executable, "-c", BOOT], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def import_profile(env):
+    """Self time in ms of each module imported by `import app.main`, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = int(self_us) / 1000
+    return self_times
+
+def main():
+    data_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        THEME_DB_PATH=os.path.join(data_dir, "themes.db"),
+        ASSET_INDEX_PATH=os.path.join(data_dir, "assets.db"),
+        ASSETS_DIR=os.path.join(data_dir, "assets")
+    )
+    # The Figma key is checked on first use, so the worker must boot without it
+    env.pop("FIGMA_API_KEY", None)
+
+    reports = [boot(env) for _ in range(RUNS)]
+    print(f"cold starts: {RUNS}")
+    print(f"import app.main        median={statistics.median(r['import_ms'] for r in reports):.1f}ms")
+    # Phases run back to back from process start, so "import" includes interpreter startup
+    for phase in reports[0]["phases"]:
+        print(f"{phase:<22} median={statistics.median(r['phases'][phase] for r in reports):.1f}ms")
+    for name in reports[0]["services"]:
+        print(f"service {name:<14} median={statistics.median(r['services'][name] for r in reports):.1f}ms")
+    print(f"first response         median={statistics.median(r['time_to_first_response_ms'] for r in reports):.1f}ms")
+    loaded = [name for name, is_loaded in reports[-1]["loaded_modules"].items() if is_loaded]
+    print(f"heavy modules loaded at first response: {', '.join(loaded) or 'none'}")
+
+    totals = defaultdict(list)
+    for _ in range(3):
+        for name, ms in import_profile(env).items():
+            totals[name].append(ms)
+    # Group by top-level package, since that is what a lazy import can defer
+    packages = defaultdict(float)
+    for name, samples in totals.items():
+        packages[name.split(".")[0]] += statistics.median(samples)
+    print(f"\nslowest packages by import self time (median of 3):")
+    for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:TOP_MODULES]:
+        print(f"  {name:<24} {ms:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Size and latency of the full theme list with 500 themes, sent uncompressed,
+compressed on every request, and served from the compressed copies kept on
+the cached response.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_compression
+"""
+import os
+import time
+import random
+import logging
+import statistics
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.themes import get_theme_service
+
+THEMES = 500
+ITERATIONS = 200
+
+def recolor(value, rng):
+    """Give every color in a component tree a random value, so the themes differ"""
+    if isinstance(value, dict):
+        return {key: recolor(item, rng) for key, item in value.items()}
+    if isinstance(value, str) and value.startswith("#"):
+        return f"#{rng.randrange(0x1000000):06x}"
+    return value
+
+def seed(theme_service):
+    rng = random.Random(1)
+    default_theme = theme_service.store.get("default")
+    for index in range(THEMES):
+        theme_service.store.put(default_theme.copy(update={
+            "id": f"bench-{index}",
+            "name": f"Bench {index}",
+            "components": recolor(default_theme.components, rng),
+            "is_active": False
+        }))
+    theme_service.response_cache.invalidate()
+
+def timed(client, encoding, before=None):
+    samples = []
+    for _ in range(ITERATIONS):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        with client.stream("GET", "/api/themes/", headers={"Accept-Encoding": encoding}) as response:
+            body = b"".join(response.iter_raw())
+        samples.append((time.perf_counter() - start) * 1000)
+    return len(body), statistics.median(samples)
+
+def main():
+    logging.disable(logging.INFO)
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        seed(theme_service)
+        try:
+            print(f"GET /api/themes/ with {THEMES} themes, median of {ITERATIONS}")
+            size, ms = timed(client, "identity")
+            print(f"  identity:            {size / 1024:8.1f}KB  {ms:6.2f}ms")
+            cached = theme_service.response_cache.theme_list(theme_service.store.list())
+            for encoding in ("gzip", "br"):
+                size, ms = timed(client, encoding, cached.encoded.clear)
+                print(f"  {encoding:<4} compress always: {size / 1024:8.1f}KB  {ms:6.2f}ms")
+                size, ms = timed(client, encoding)
+                print(f"  {encoding:<4} cached body:     {size / 1024:8.1f}KB  {ms:6.2f}ms")
+        finally:
+            for index in range(THEMES):
+                theme_service.store.delete(f"bench-{index}")
+            theme_service.response_cache.invalidate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Bytes transferred and wall time for full vs selective Figma extraction.
+
+Serves a synthetic 100k-node file from a local stub of the Figma API and
+extracts components with a full download and with the two-phase
+depth-limited + nodes?ids= mode.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_figma_selective
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.utils.figma import FigmaClient
+from app.utils.http_client import HTTPClient
+from benchmarks.bench_figma_traversal import make_document
+
+def index_nodes(root):
+    nodes = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes[node["id"]] = node
+        stack.extend(node.get("children", []))
+    return nodes
+
+def truncate(node, depth):
+    copy = {key: value for key, value in node.items() if key != "children"}
+    if depth > 0 and "children" in node:
+        copy["children"] = [truncate(child, depth - 1) for child in node["children"]]
+    return copy
+
+async def run():
+    file_data = make_document()
+    nodes = index_nodes(file_data["document"])
+    file_data["components"] = {
+        node_id: {"name": node["name"]} for node_id, node in nodes.items() if node["type"] == "COMPONENT"
+    }
+    full_body = json.dumps(file_data).encode("utf-8")
+    sent = {"bytes": 0, "requests": 0}
+
+    def respond(body):
+        sent["bytes"] += len(body)
+        sent["requests"] += 1
+        return web.Response(body=body, content_type="application/json")
+
+    async def file_handler(request):
+        if "depth" not in request.query:
+            return respond(full_body)
+        shallow = dict(file_data, document=truncate(file_data["document"], int(request.query["depth"])))
+        return respond(json.dumps(shallow).encode("utf-8"))
+
+    async def nodes_handler(request):
+        depth = int(request.query.get("depth", 1))
+        result = {node_id: {"document": truncate(nodes[node_id], depth)} for node_id in request.query["ids"].split(",")}
+        return respond(json.dumps({"nodes": result}).encode("utf-8"))
+
+    application = web.Application()
+    application.add_routes([
+        web.get("/v1/files/bench", file_handler),
+        web.get("/v1/files/bench/nodes", nodes_handler)
+    ])
+    server = TestServer(application)
+    await server.start_server()
+    http_client = HTTPClient(max_retries=0)
+    client = FigmaClient(http_client)
+    client.base_url = str(server.make_url("/v1"))
+    url = "https://www.figma.com/file/bench/Synthetic"
+
+    try:
+        for label, extract in [
+            ("full download + parse", client.extract_components),
+            ("selective (depth + nodes)", client.fetch_components_selective)
+        ]:
+            sent.update(bytes=0, requests=0)
+            start = time.perf_counter()
+            components = await extract(url)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label:<28} {elapsed * 1000:8.1f}ms  transferred={sent['bytes'] / 1024 / 1024:6.2f}MiB "
+                f"requests={sent['requests']:4d}  components={len(components)}"
+            )
+    finally:
+        await http_client.close()
+        await server.close()
+
+def main():
+    logging.disable(logging.INFO)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
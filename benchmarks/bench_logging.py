@@ -0,0 +1,105 @@
+"""Compare synchronous logging with the queued, sampled pipeline.
+
+"sync DEBUG" is the previous setup: the root logger at DEBUG and every
+record formatted and written on the calling thread. "queued" is the
+default structured pipeline: records handed to a background writer,
+read routes sampled, per-read chatter at DEBUG.
+
+The first table uses a sink whose writes stall (a backed-up pipe or log
+collector), where a synchronous handler blocks the event loop. The
+second counts the records a read endpoint produces and its latency.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_logging
+"""
+import os
+import time
+import logging
+import statistics
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.structured_logging import TEXT_FORMAT, log_manager
+
+CALLS = 2000
+REQUESTS = 2000
+STALL_SECONDS = 0.0002
+
+class Sink:
+    """Counts written lines, optionally stalling on each write"""
+
+    def __init__(self, stall: float = 0.0):
+        self.stall = stall
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        if self.stall:
+            time.sleep(self.stall)
+        self.lines += text.count("\n")
+
+    def flush(self) -> None:
+        pass
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+def use_sync_logging(sink):
+    log_manager.stop()
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    logging.getLogger().addHandler(handler)
+    log_manager.set_levels("DEBUG")
+    log_manager.set_sample_rates({})
+    return lambda: logging.getLogger().removeHandler(handler)
+
+def use_queued_logging(sink):
+    log_manager.configure(stream=sink)
+    return log_manager.stop
+
+def per_call_us(theme_id="3f2a9c"):
+    logger = logging.getLogger("app.services.theme_service")
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        logger.info("Theme applied successfully: %s", theme_id)
+    return (time.perf_counter() - start) * 1e6 / CALLS
+
+def request_latency(client, path="/api/themes/current"):
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return samples
+
+def main():
+    # The test client's own request log is not part of the service
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    setups = [("sync DEBUG", use_sync_logging), ("queued", use_queued_logging)]
+    with TestClient(app) as client:
+        print(f"caller cost per record, sink stalling {STALL_SECONDS * 1e6:.0f}us per write")
+        for label, setup in setups:
+            teardown = setup(Sink(STALL_SECONDS))
+            print(f"  {label:<12} {per_call_us():.1f}us")
+            teardown()
+
+        print("GET /api/themes/current")
+        for label, setup in setups:
+            sink = Sink()
+            teardown = setup(sink)
+            request_latency(client, "/")
+            before = sink.lines
+            samples = request_latency(client)
+            teardown()
+            print(
+                f"  {label:<12} records/request={(sink.lines - before) / REQUESTS:.2f} "
+                f"p50={statistics.median(samples):.3f}ms p99={percentile(samples, 99):.3f}ms"
+            )
+    log_manager.configure()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measure the cost of instrumentation: a histogram observation, and a read request with and without the metrics middleware.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_metrics
+"""
+import os
+import time
+import logging
+import statistics
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.metrics import HTTP_REQUEST_SECONDS, MetricsMiddleware, metrics
+
+OBSERVATIONS = 200000
+REQUESTS = 2000
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+def observe_ns():
+    series = HTTP_REQUEST_SECONDS.labels("GET", "/bench", "200")
+    start = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        series.observe(0.003)
+    return (time.perf_counter() - start) * 1e9 / OBSERVATIONS
+
+def request_latency(client, path="/api/themes/current"):
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return samples
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"histogram observe: {observe_ns():.0f}ns")
+    with TestClient(app) as client:
+        request_latency(client)
+        instrumented = request_latency(client)
+        # Rebuild the middleware stack without the metrics middleware
+        app.user_middleware = [entry for entry in app.user_middleware if entry.cls is not MetricsMiddleware]
+        app.middleware_stack = app.build_middleware_stack()
+        bare = request_latency(client)
+        start = time.perf_counter()
+        body = metrics.render()
+        render_ms = (time.perf_counter() - start) * 1000
+    for label, samples in (("with metrics", instrumented), ("without metrics", bare)):
+        print(f"{label:<16} p50={statistics.median(samples):.3f}ms p99={percentile(samples, 99):.3f}ms")
+    print(f"/metrics render: {render_ms:.2f}ms for {len(body.splitlines())} lines")
+
+if __name__ == "__main__":
+    main()
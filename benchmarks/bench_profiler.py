@@ -0,0 +1,55 @@
+"""Measure what the on-demand profiler costs: requests without the profiling
+header (the production path), and requests that are profiled.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_profiler
+"""
+import os
+import time
+import logging
+import tempfile
+import statistics
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.utils.profiler import ProfileLimiter, ProfilingMiddleware, profile_store
+
+REQUESTS = 1000
+PROFILED_REQUESTS = 100
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+def request_latency(client, count, headers=None, path="/api/themes/current"):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return samples
+
+def main():
+    logging.disable(logging.INFO)
+    settings.PROFILE_TOKEN = "benchmark"
+    profile_store.directory = tempfile.mkdtemp()
+    profile_store.history = PROFILED_REQUESTS
+    with TestClient(app) as client:
+        request_latency(client, REQUESTS)
+        enabled = request_latency(client, REQUESTS)
+        # The benchmark needs more profiles than the hourly limit allows
+        for entry in app.user_middleware:
+            if entry.cls is ProfilingMiddleware:
+                entry.options["limiter"] = ProfileLimiter(PROFILED_REQUESTS)
+        app.middleware_stack = app.build_middleware_stack()
+        profiled = request_latency(client, PROFILED_REQUESTS, headers={"x-profile": "benchmark"})
+    for label, samples in (("not profiled", enabled), ("profiled", profiled)):
+        print(f"{label:<13} p50={statistics.median(samples):.3f}ms p99={percentile(samples, 99):.3f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare per-request ThemeService construction with the shared instance.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_service_lifespan
+"""
+import os
+import asyncio
+import logging
+import statistics
+import time
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.themes import get_theme_service
+from app.services.theme_service import ThemeService
+
+REQUESTS = 500
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+def measure(client, path="/api/themes/current"):
+    samples = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return samples
+
+def report(label, samples):
+    print(
+        f"{label:<24} p50={statistics.median(samples):.3f}ms "
+        f"p99={percentile(samples, 99):.3f}ms mean={statistics.mean(samples):.3f}ms"
+    )
+
+async def per_request_service():
+    """Build a service for one request and close it afterwards, as a per-request dependency would"""
+    service = ThemeService()
+    try:
+        yield service
+    finally:
+        await service.close()
+
+async def construct(count):
+    elapsed = 0.0
+    for _ in range(count):
+        start = time.perf_counter()
+        service = ThemeService()
+        elapsed += time.perf_counter() - start
+        await service.close()
+    return elapsed
+
+def main():
+    logging.disable(logging.INFO)
+    construct_ms = asyncio.run(construct(100)) * 1000 / 100
+    print(f"ThemeService() construction: {construct_ms:.3f}ms")
+
+    with TestClient(app) as client:
+        app.dependency_overrides[get_theme_service] = per_request_service
+        per_request = measure(client)
+        app.dependency_overrides.clear()
+        shared = measure(client)
+
+    report("per-request service", per_request)
+    report("shared service", shared)
+
+if __name__ == "__main__":
+    main()
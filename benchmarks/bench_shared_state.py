@@ -0,0 +1,94 @@
+"""How quickly a worker follows themes applied by another worker process on the
+same SQLite store, and what following costs its reads.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_shared_state
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from app.config import settings
+from app.models.theme import Theme
+from app.services.theme_service import ThemeService
+from app.services.theme_store import SQLiteThemeStore
+
+APPLIES = 40
+ITERATIONS = 20_000
+
+def make_theme(theme_id):
+    now = datetime.utcnow()
+    return Theme(id=theme_id, name=theme_id, components={"app": {"background": "#000000"}}, created_at=now, updated_at=now)
+
+def other_worker(db_path, sent, spacing):
+    """Apply two themes in turn, `spacing` seconds apart, reporting when each apply finished"""
+    logging.disable(logging.INFO)
+
+    async def run():
+        service = ThemeService(store=SQLiteThemeStore(db_path))
+        sent.put(None)
+        await asyncio.sleep(0.1)
+        for index in range(APPLIES):
+            await asyncio.sleep(spacing)
+            await service.apply_theme("one" if index % 2 else "two")
+            # CLOCK_MONOTONIC, comparable across processes
+            sent.put(time.perf_counter())
+        await service.close()
+
+    asyncio.run(run())
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) * 1e6 / ITERATIONS
+
+async def follow(db_path, interval):
+    settings.THEME_SYNC_INTERVAL_SECONDS = interval
+    service = ThemeService(store=SQLiteThemeStore(db_path))
+    service.start()
+    context = multiprocessing.get_context("spawn")
+    sent = context.Queue()
+    process = context.Process(target=other_worker, args=(db_path, sent, interval * 1.5))
+    process.start()
+    # The other worker's startup writes are followed before measuring begins
+    await asyncio.to_thread(sent.get)
+    service.sync_shared_state()
+    subscription = service.events.subscribe()
+    latencies = []
+    while len(latencies) < APPLIES:
+        await subscription.queue.get()
+        received = time.perf_counter()
+        latencies.append((received - sent.get(timeout=5)) * 1000)
+    process.join()
+    await service.close()
+    latencies.sort()
+    print(
+        f"apply in another process -> event here, polling every {interval * 1000:.0f}ms: "
+        f"median {statistics.median(latencies):.2f}ms, p99 {latencies[int(len(latencies) * 0.99)]:.2f}ms"
+    )
+
+def main():
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "themes.db")
+        service = ThemeService(store=SQLiteThemeStore(db_path))
+        for theme_id in ("one", "two"):
+            service.store.put(make_theme(theme_id))
+        store = service.store
+        print(f"cached theme read:         {timed(lambda: store.get('one')):.2f}us")
+        print(f"sync with nothing changed: {timed(store.sync):.2f}us")
+        asyncio.run(service.close())
+
+        # The default interval, and a short one that trades idle checks for latency
+        for interval in (settings.THEME_SYNC_INTERVAL_SECONDS, 0.005):
+            asyncio.run(follow(db_path, interval))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Request throughput of the asset server against Starlette's StaticFiles.
+
+Requests go straight to each ASGI app in-process, so the numbers compare
+per-request overhead rather than network or server costs.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_static_assets
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+import httpx
+from starlette.staticfiles import StaticFiles
+
+from app.utils.static_assets import StaticAssets
+
+REQUESTS = 3000
+CONCURRENCY = 32
+SIZE = 40 * 1024
+NAME = f"{'ab' * 32}-960.webp"
+
+async def measure(label, application, headers=None):
+    async with httpx.AsyncClient(app=application, base_url="http://test") as client:
+        path = f"/ab/{NAME}"
+        await client.get(path)
+        queue = iter(range(REQUESTS))
+
+        async def worker():
+            for _ in queue:
+                response = await client.get(path, headers=headers)
+                assert response.status_code in (200, 206, 304)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - start
+    print(f"{label:<32} {REQUESTS / elapsed:8.0f} req/s")
+
+async def run(directory):
+    static_files = StaticFiles(directory=directory)
+    static_assets = StaticAssets(directory)
+    await measure("StaticFiles full body", static_files)
+    await measure("StaticAssets full body", static_assets)
+    await measure("StaticAssets range 0-1023", static_assets, {"Range": "bytes=0-1023"})
+    await measure("StaticAssets If-None-Match (304)", static_assets, {"If-None-Match": f'"{NAME}"'})
+
+def main():
+    logging.disable(logging.INFO)
+    directory = tempfile.mkdtemp()
+    os.makedirs(os.path.join(directory, "ab"))
+    with open(os.path.join(directory, "ab", NAME), "wb") as f:
+        f.write(os.urandom(SIZE))
+    print(f"{REQUESTS} requests for a {SIZE // 1024} KiB file, {CONCURRENCY} concurrent")
+    asyncio.run(run(directory))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Read/write latency of the SQLite theme store with 10k stored themes.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_theme_store
+"""
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from app.models.theme import Theme
+from app.services.theme_service import ThemeService
+from app.services.theme_store import SQLiteThemeStore
+
+THEMES = 10_000
+ITERATIONS = 2_000
+
+def load_components():
+    path = os.path.join(os.path.dirname(__file__), "..", "app", "data", "default_theme.json")
+    with open(path) as f:
+        return json.load(f)["components"]
+
+def timed(label, fn, iterations=ITERATIONS):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    samples.sort()
+    print(
+        f"{label:<28} p50={statistics.median(samples):8.1f}us "
+        f"p99={samples[int(len(samples) * 0.99) - 1]:8.1f}us"
+    )
+
+def main():
+    logging.disable(logging.INFO)
+    components = load_components()
+    path = os.path.join(tempfile.mkdtemp(), "themes.db")
+    store = SQLiteThemeStore(path)
+
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    for index in range(THEMES):
+        store.put(Theme(
+            id=f"theme-{index}",
+            name=f"Theme {index}",
+            components=components,
+            created_at=now,
+            updated_at=now
+        ))
+    print(f"inserted {THEMES} themes in {time.perf_counter() - start:.2f}s")
+    store.close()
+
+    # Reopen to measure cold reads from disk, then warm reads from cache
+    service = ThemeService(store=SQLiteThemeStore(path))
+    loop = asyncio.new_event_loop()
+    run = loop.run_until_complete
+
+    start = time.perf_counter()
+    run(service.get_all_themes())
+    print(f"cold get_all_themes: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    timed("get_current_theme", lambda: run(service.get_current_theme()))
+    timed("get_all_themes (cached)", lambda: run(service.get_all_themes()), iterations=200)
+    timed("get by name (indexed)", lambda: service.store.get_by_name("Theme 9000"))
+    timed("apply_theme", lambda: run(service.apply_theme("theme-42")), iterations=500)
+    run(service.close())
+    loop.close()
+
+if __name__ == "__main__":
+    main()
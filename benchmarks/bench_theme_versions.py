@@ -0,0 +1,129 @@
+"""Compare keeping 1,000 versions of a large theme as full deep copies with
+versions that share unchanged branches (JSON Patch edits recorded in the
+version store), in memory and persisted to SQLite: time per edit, database
+size against one JSON document per version, and the memory taken by reloading
+every version in a fresh process. Each edit changes one color.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_theme_versions
+"""
+import os
+import copy
+import json
+import time
+import logging
+import tempfile
+import random
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from app.models.theme import Theme
+from app.services.theme_store import MemoryThemeStore, SQLiteThemeStore
+from app.services.theme_versions import ThemeVersionStore
+from app.utils.json_patch import apply_patch, diff_documents
+
+VERSIONS = 1000
+COMPONENTS = 300
+VARIANTS = ("primary", "secondary", "danger", "ghost")
+KEYS = ("background", "text", "border", "hoverBackground", "activeText", "focusBorder")
+
+def large_components():
+    rng = random.Random(1)
+    return {
+        f"component{index}": {
+            variant: {key: f"#{rng.randrange(0x1000000):06x}" for key in KEYS} for variant in VARIANTS
+        }
+        for index in range(COMPONENTS)
+    }
+
+def edits():
+    rng = random.Random(2)
+    for _ in range(VERSIONS):
+        yield f"component{rng.randrange(COMPONENTS)}", rng.choice(VARIANTS), rng.choice(KEYS), f"#{rng.randrange(0x1000000):06x}"
+
+def deep_copy_history(components):
+    history = [components]
+    for component, variant, key, value in edits():
+        components = copy.deepcopy(components)
+        components[component][variant][key] = value
+        history.append(components)
+    return history
+
+def versioned_history(components, theme_store=None):
+    now = datetime.utcnow()
+    theme = Theme(id="bench", name="Bench", components=components, created_at=now, updated_at=now)
+    store = ThemeVersionStore(theme_store or MemoryThemeStore(), VERSIONS + 1, lambda components: set())
+    store.record(theme, "create")
+    for component, variant, key, value in edits():
+        patch = [{"op": "replace", "path": f"/{component}/{variant}/{key}", "value": value}]
+        theme = theme.copy(update={"components": apply_patch(theme.components, patch)})
+        store.record(theme, "patch")
+    return store, theme
+
+def measure(build):
+    components = large_components()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(components)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+def database_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+def load_versions(path):
+    store = SQLiteThemeStore(path)
+    versions = [store.get_version("bench", number) for number in range(1, VERSIONS + 2)]
+    store.close()
+    return versions
+
+def main():
+    logging.disable(logging.INFO)
+    history, copies_size, copies_time = measure(deep_copy_history)
+    (store, theme), versions_size, versions_time = measure(versioned_history)
+    print(f"{VERSIONS} versions of a theme with {COMPONENTS * len(VARIANTS) * len(KEYS)} values")
+    print(f"  deep copies:     {copies_size / 1e6:7.1f}MB  {copies_time * 1e6 / VERSIONS:8.1f}us per edit")
+    print(f"  shared versions: {versions_size / 1e6:7.1f}MB  {versions_time * 1e6 / VERSIONS:8.1f}us per edit")
+    documents = [json.dumps(components, separators=(",", ":")) for components in history]
+    full_size = sum(len(document) for document in documents)
+    _, full_load_size, full_load_time = measure(lambda _: [json.loads(document) for document in documents])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "themes.db")
+        sqlite_store = SQLiteThemeStore(path)
+        start = time.perf_counter()
+        versioned_history(large_components(), sqlite_store)
+        sqlite_time = time.perf_counter() - start
+        sqlite_store.close()
+        _, load_size, load_time = measure(lambda _: load_versions(path))
+        print(f"  persisted to SQLite:       {sqlite_time * 1e6 / VERSIONS:8.1f}us per edit")
+        print(f"  storage: one JSON document per version {full_size / 1e6:.1f}MB, shared nodes {database_size(path) / 1e6:.1f}MB")
+        print(
+            f"  reloading every version: JSON documents {full_load_size / 1e6:.1f}MB in {full_load_time * 1000:.0f}ms, "
+            f"shared nodes {load_size / 1e6:.1f}MB in {load_time * 1000:.0f}ms"
+        )
+
+    first, last = store.get(theme, 1), store.latest(theme)
+    start = time.perf_counter()
+    changes = diff_documents(first.components, last.components)
+    shared_diff_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    diff_documents(history[0], history[-1])
+    copies_diff_ms = (time.perf_counter() - start) * 1000
+    print(f"  diff first..last ({len(changes)} changes): deep copies {copies_diff_ms:.2f}ms, shared {shared_diff_ms:.2f}ms")
+
+    # Restoring a version: a copy of the deep-copied snapshot, or the shared version's components as they are
+    start = time.perf_counter()
+    copy.deepcopy(history[VERSIONS // 2])
+    copies_rollback_us = (time.perf_counter() - start) * 1e6
+    now = datetime.utcnow()
+    theme = Theme(id="bench", name="Bench", components=last.components, created_at=now, updated_at=now)
+    start = time.perf_counter()
+    theme.copy(update={"components": store.get(theme, VERSIONS // 2).components})
+    shared_rollback_us = (time.perf_counter() - start) * 1e6
+    print(f"  rollback: deep copies {copies_rollback_us:.0f}us, shared {shared_rollback_us:.0f}us")
+
+if __name__ == "__main__":
+    main()
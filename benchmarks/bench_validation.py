@@ -0,0 +1,49 @@
+"""Measure theme validation throughput: single documents through the compiled
+schema, and NDJSON batches through /api/validate/batch with distinct and
+repeated (memoized) documents.
+
+Run with: FIGMA_API_KEY=dummy python -m benchmarks.bench_validation
+"""
+import os
+import json
+import time
+import logging
+
+os.environ.setdefault("FIGMA_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.theme_schema import ThemeValidator, theme_validator
+
+DOCUMENTS = 2000
+
+def themes(distinct: bool):
+    with open(os.path.join("app", "data", "default_theme.json")) as f:
+        theme = json.load(f)
+    for index in range(DOCUMENTS):
+        theme["id"] = f"theme-{index}" if distinct else "theme"
+        yield json.dumps(theme)
+
+def main():
+    logging.disable(logging.INFO)
+    documents = [json.loads(line) for line in themes(distinct=True)]
+    validator = ThemeValidator()
+    start = time.perf_counter()
+    for document in documents:
+        validator.validate(document)
+    elapsed = time.perf_counter() - start
+    print(f"validate, distinct documents: {elapsed * 1e6 / DOCUMENTS:.1f}us per theme")
+
+    with TestClient(app) as client:
+        for label, distinct in (("distinct", True), ("repeated", False)):
+            body = ("\n".join(themes(distinct)) + "\n").encode()
+            theme_validator.clear()
+            start = time.perf_counter()
+            response = client.post("/api/validate/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+            elapsed = time.perf_counter() - start
+            assert response.text.count('"valid":true') == DOCUMENTS
+            print(f"batch of {DOCUMENTS}, {label:<8}: {elapsed * 1000:.0f}ms ({DOCUMENTS / elapsed:.0f} themes/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Keep the durable theme store out of the working tree during tests
+_data_dir = tempfile.mkdtemp()
+os.environ.setdefault("THEME_DB_PATH", os.path.join(_data_dir, "themes.db"))
+os.environ.setdefault("FIGMA_CACHE_DIR", os.path.join(_data_dir, "figma_cache"))
+os.environ.setdefault("ASSETS_DIR", os.path.join(_data_dir, "assets"))
+os.environ.setdefault("ASSET_INDEX_PATH", os.path.join(_data_dir, "assets.db"))
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import time
+import zlib
+from io import BytesIO
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import HTTPException
+from PIL import Image
+from app.utils import asset_processor as asset_processor_module
+from app.utils.asset_index import AssetIndex
+from app.utils.asset_processor import AssetProcessor, BEST_EFFORT, FAIL_FAST, PROCESS_EXECUTOR
+from app.utils.http_client import HTTPClient
+
+def png_bytes(color=(255, 0, 0), size=(8, 8), mode="RGB", noise=False):
+    buffer = BytesIO()
+    if noise:
+        image = Image.merge("RGB", [Image.effect_noise(size, 64) for _ in range(3)]).convert(mode)
+    else:
+        image = Image.new(mode, size, color + (128,) if mode == "RGBA" else color)
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def color_for(name):
+    return tuple(zlib.crc32(name.encode("utf-8")).to_bytes(4, "big")[:3])
+
+class ImageServer:
+    def __init__(self, delay=0.02, size=(8, 8), mode="RGB", noise=False):
+        self.delay = delay
+        self.size = size
+        self.mode = mode
+        self.noise = noise
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+
+    async def handler(self, request):
+        name = request.match_info["name"]
+        self.requests.append(name)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if name.startswith("missing"):
+                return web.Response(status=404)
+            return web.Response(body=png_bytes(color_for(name), self.size, self.mode, self.noise), content_type="image/png")
+        finally:
+            self.active -= 1
+
+def run(image_server, scenario):
+    async def runner():
+        application = web.Application()
+        application.add_routes([web.get("/images/{name}", image_server.handler)])
+        server = TestServer(application)
+        await server.start_server()
+        try:
+            return await scenario(lambda name: str(server.make_url(f"/images/{name}")))
+        finally:
+            await server.close()
+    return asyncio.run(runner())
+
+@pytest.fixture
+def processor(tmp_path):
+    asset_processor = AssetProcessor(HTTPClient(max_retries=0), AssetIndex(str(tmp_path / "index" / "assets.db")))
+    asset_processor.assets_dir = str(tmp_path / "assets")
+    asset_processor.concurrency = 4
+    asset_processor.per_host_concurrency = 3
+    asset_processor.executor_kind = "thread"
+    return asset_processor
+
+def asset_file(processor, path):
+    return os.path.join(processor.assets_dir, path[len("/assets/"):])
+
+def read_manifest(processor, component, field):
+    with open(asset_file(processor, component["imageManifests"][field])) as f:
+        return json.load(f)
+
+def test_assets_download_concurrently_in_order(processor):
+    image_server = ImageServer()
+    progress = []
+
+    async def scenario(url):
+        components = {
+            f"component{index}": {"backgroundImage": url(f"bg{index}"), "images": {"icon": url("shared")}}
+            for index in range(10)
+        }
+        try:
+            return await processor.process_assets(components, lambda done, total: progress.append((done, total)))
+        finally:
+            await processor.close()
+
+    processed = run(image_server, scenario)
+    assert list(processed) == [f"component{index}" for index in range(10)]
+    paths = [data["backgroundImage"] for data in processed.values()]
+    assert len(set(paths)) == 10
+    assert len({data["images"]["icon"] for data in processed.values()}) == 1
+    assert all(os.path.exists(asset_file(processor, path)) for path in paths)
+
+    # The shared icon is downloaded once, and the per-host limit caps concurrency
+    assert len(image_server.requests) == 11
+    assert image_server.peak == 3
+    assert progress[-1] == (11, 11)
+
+def test_fail_fast_raises(processor):
+    async def scenario(url):
+        components = {"card": {"images": {"ok": url("ok"), "bad": url("missing")}}}
+        try:
+            with pytest.raises(HTTPException):
+                await processor.process_assets(components, policy=FAIL_FAST)
+        finally:
+            await processor.close()
+
+    run(ImageServer(), scenario)
+
+def test_best_effort_keeps_source_url(processor):
+    async def scenario(url):
+        components = {"card": {"images": {"ok": url("ok"), "bad": url("missing")}}}
+        try:
+            return await processor.process_assets(components, policy=BEST_EFFORT), url("missing")
+        finally:
+            await processor.close()
+
+    processed, missing_url = run(ImageServer(), scenario)
+    assert processed["card"]["images"]["ok"].startswith("/assets/")
+    assert processed["card"]["images"]["bad"] == missing_url
+
+def test_process_pool_resizes_large_images(processor):
+    processor.executor_kind = PROCESS_EXECUTOR
+    processor.workers = 2
+
+    async def scenario(url):
+        components = {f"card{index}": {"backgroundImage": url(f"large{index}")} for index in range(3)}
+        try:
+            return await processor.process_assets(components)
+        finally:
+            await processor.close()
+
+    processed = run(ImageServer(size=(2400, 60)), scenario)
+    for data in processed.values():
+        with Image.open(asset_file(processor, data["backgroundImage"])) as image:
+            assert image.size == (2000, 50)
+    assert not [name for _, _, names in os.walk(processor.assets_dir) for name in names if name.endswith(".tmp")]
+
+def test_image_processing_does_not_block_event_loop(processor, monkeypatch):
+    original = asset_processor_module.encode_variants
+
+    def slow_encode_variants(*args):
+        time.sleep(0.2)
+        return original(*args)
+
+    monkeypatch.setattr(asset_processor_module, "encode_variants", slow_encode_variants)
+    processor.workers = 2
+    processor.process_queue_size = 0
+
+    async def scenario(url):
+        components = {f"card{index}": {"backgroundImage": url(f"bg{index}")} for index in range(4)}
+        task = asyncio.create_task(processor.process_assets(components))
+        max_gap = 0.0
+        while not task.done():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_gap = max(max_gap, time.perf_counter() - start)
+        try:
+            await task
+        finally:
+            await processor.close()
+        return max_gap
+
+    assert run(ImageServer(), scenario) < 0.1
+
+def test_shared_assets_are_stored_once_and_collected(processor, monkeypatch):
+    encoded = []
+    original = asset_processor_module.encode_variants
+
+    def counting_encode_variants(*args):
+        encoded.append(args[2])
+        return original(*args)
+
+    monkeypatch.setattr(asset_processor_module, "encode_variants", counting_encode_variants)
+
+    async def scenario(url):
+        try:
+            first = await processor.process_assets(
+                {"card": {"backgroundImage": url("logo"), "images": {"icon": url("icon")}}}, theme_id="first"
+            )
+            await processor.commit_theme_assets("first", first)
+            second = await processor.process_assets({"card": {"backgroundImage": url("logo")}}, theme_id="second")
+            await processor.commit_theme_assets("second", second)
+            return first, second
+        finally:
+            await processor.close()
+
+    first, second = run(ImageServer(), scenario)
+    logo = first["card"]["backgroundImage"]
+    icon = first["card"]["images"]["icon"]
+    assert second["card"]["backgroundImage"] == logo
+    assert logo.startswith(f"/assets/{os.path.basename(logo)[:2]}/")
+    # Two images, each decoded and encoded in every format by a single job
+    assert sorted(encoded) == sorted(set(encoded))
+    assert len(encoded) == 2
+
+    # Re-open the index to check references persist
+    processor.index = AssetIndex(processor.index.path)
+    assert processor.index.ref_count(os.path.basename(logo)[:64]) == 2
+
+    asyncio.run(processor.delete_theme_assets("first"))
+    assert os.path.exists(asset_file(processor, logo))
+    assert not os.path.exists(asset_file(processor, icon))
+
+    asyncio.run(processor.delete_theme_assets("second"))
+    shard = os.path.dirname(asset_file(processor, logo))
+    assert not [name for name in os.listdir(shard) if name.startswith(os.path.basename(logo)[:64])]
+    processor.index.close()
+
+class SlowImageServer(ImageServer):
+    """Answers images named "slow..." only after a long delay"""
+
+    async def handler(self, request):
+        if request.match_info["name"].startswith("slow"):
+            await asyncio.sleep(0.5)
+        return await super().handler(request)
+
+def test_reused_assets_survive_a_delete_during_the_build(processor):
+    async def scenario(url):
+        try:
+            first = await processor.process_assets({"card": {"backgroundImage": url("logo")}}, theme_id="first")
+            await processor.commit_theme_assets("first", first)
+            build = asyncio.create_task(processor.process_assets(
+                {"card": {"backgroundImage": url("logo")}, "hero": {"backgroundImage": url("slow")}}, theme_id="second"
+            ))
+            # The shared logo is found stored while the other image is still downloading
+            await asyncio.sleep(0.25)
+            assert not build.done()
+            await processor.delete_theme_assets("first")
+            second = await build
+            await processor.commit_theme_assets("second", second)
+            assert processor.index.theme_assets("second") == sorted(processor.asset_digests(second))
+            return second
+        finally:
+            await processor.close()
+
+    second = run(SlowImageServer(), scenario)
+    logo = second["card"]["backgroundImage"]
+    assert os.path.exists(asset_file(processor, logo))
+    assert os.path.exists(asset_file(processor, second["card"]["imageManifests"]["backgroundImage"]))
+
+def test_photos_get_lossy_variants_at_each_width(processor):
+    processor.formats = ["webp", "avif"]
+    processor.widths = [300, 600]
+
+    async def scenario(url):
+        try:
+            processed = await processor.process_assets({"hero": {"backgroundImage": url("photo")}})
+            return processed, processor.build_report([read_manifest(processor, processed["hero"], "backgroundImage")])
+        finally:
+            await processor.close()
+
+    processed, report = run(ImageServer(size=(1200, 600), noise=True), scenario)
+    manifest = read_manifest(processor, processed["hero"], "backgroundImage")
+    assert not manifest["lossless"]
+    assert processed["hero"]["backgroundImage"] == manifest["src"]
+    assert manifest["src"].endswith("-1200.webp")
+    assert [source["type"] for source in manifest["sources"]] == ["image/avif", "image/webp"]
+    for source in manifest["sources"]:
+        assert [entry.rsplit(" ", 1)[1] for entry in source["srcset"].split(", ")] == ["300w", "600w", "1200w"]
+    assert all(os.path.exists(asset_file(processor, variant["url"])) for variant in manifest["variants"])
+    manifest_path = asset_file(processor, processed["hero"]["imageManifests"]["backgroundImage"])
+    assert os.path.exists(f"{manifest_path}.gz") and os.path.exists(f"{manifest_path}.br")
+    assert {variant["height"] for variant in manifest["variants"]} == {150, 300, 600}
+    assert report["assets"] == 1
+    assert 0 < report["formats"]["webp"]["savings"] < 1
+    assert report["formats"]["avif"]["bytes"] < report["source_bytes"]
+
+def test_flat_images_keep_alpha_and_a_lossless_png(processor):
+    async def scenario(url):
+        try:
+            return await processor.process_assets({"logo": {"images": {"mark": url("mark")}}})
+        finally:
+            await processor.close()
+
+    processed = run(ImageServer(size=(64, 32), mode="RGBA"), scenario)
+    manifest = read_manifest(processor, processed["logo"], "mark")
+    assert manifest["lossless"]
+    assert manifest["src"].endswith("-64.png")
+    assert [source["type"] for source in manifest["sources"]] == ["image/webp", "image/png"]
+    for variant in manifest["variants"]:
+        with Image.open(asset_file(processor, variant["url"])) as image:
+            assert image.mode == "RGBA"
+            assert image.getpixel((0, 0))[3] == 128
+
+class StalledImageServer:
+    """Sends the start of a huge PNG, then stalls before the rest"""
+
+    def __init__(self, size):
+        self.body = png_bytes(size=size)
+        self.stall = 2.0
+
+    async def handler(self, request):
+        response = web.StreamResponse(headers={"Content-Type": "image/png"})
+        await response.prepare(request)
+        await response.write(self.body[:4096])
+        await asyncio.sleep(self.stall)
+        await response.write(self.body[4096:])
+        return response
+
+def test_oversized_dimensions_are_refused_from_the_header(processor, monkeypatch):
+    encoded = []
+    monkeypatch.setattr(asset_processor_module, "encode_variants", lambda *args: encoded.append(args))
+    processor.max_pixels = 1_000_000
+
+    async def scenario(url):
+        start = time.perf_counter()
+        try:
+            processed = await processor.process_assets({"hero": {"backgroundImage": url("huge")}}, policy=BEST_EFFORT)
+        finally:
+            await processor.close()
+        return processed, time.perf_counter() - start
+
+    processed, elapsed = run(StalledImageServer((5000, 5000)), scenario)
+    assert processed["hero"]["backgroundImage"].endswith("/images/huge")
+    assert elapsed < 1.0
+    assert encoded == []
+
+def test_byte_cap_aborts_download(processor):
+    processor.max_bytes = 50_000
+
+    async def scenario(url):
+        try:
+            with pytest.raises(HTTPException) as excinfo:
+                await processor.process_assets({"hero": {"backgroundImage": url("photo")}}, policy=FAIL_FAST)
+            return excinfo.value
+        finally:
+            await processor.close()
+
+    error = run(ImageServer(size=(200, 200), noise=True), scenario)
+    assert "byte limit" in error.detail
+
+def test_large_bodies_spill_to_a_temporary_file(processor, tmp_path, monkeypatch):
+    sources = []
+    original = asset_processor_module.encode_variants
+
+    def recording_encode_variants(*args):
+        sources.append(args[0])
+        return original(*args)
+
+    monkeypatch.setattr(asset_processor_module, "encode_variants", recording_encode_variants)
+    processor.spill_bytes = 1024
+    processor.chunk_size = 512
+    processor.spill_dir = str(tmp_path / "spill")
+    os.makedirs(processor.spill_dir)
+
+    async def scenario(url):
+        try:
+            return await processor.process_assets({"hero": {"backgroundImage": url("photo")}})
+        finally:
+            await processor.close()
+
+    processed = run(ImageServer(size=(64, 64), noise=True), scenario)
+    assert processed["hero"]["backgroundImage"].startswith("/assets/")
+    assert sources and all(isinstance(source, str) for source in sources)
+    assert os.listdir(processor.spill_dir) == []
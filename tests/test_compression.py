@@ -0,0 +1,89 @@
+import gzip
+import brotli
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.themes import get_theme_service
+from app.utils import compression
+from app.utils.compression import negotiate_encoding
+
+def test_negotiate_encoding_prefers_brotli():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+
+def test_theme_list_is_compressed_once_per_version(monkeypatch):
+    compressed = []
+
+    def counting_compress(body, encoding):
+        compressed.append(encoding)
+        return compress(body, encoding)
+
+    compress = compression.compress
+    monkeypatch.setattr(compression, "compress", counting_compress)
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        theme_service.response_cache.invalidate()
+        identity = client.get("/api/themes/", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in identity.headers
+        assert identity.headers["vary"] == "Accept-Encoding"
+
+        # Stream the raw bytes so the client does not decode them
+        with client.stream("GET", "/api/themes/", headers={"Accept-Encoding": "gzip, br"}) as response:
+            body = b"".join(response.iter_raw())
+        assert response.headers["content-encoding"] == "br"
+        brotli_etag = response.headers["etag"]
+        assert brotli_etag == identity.headers["etag"][:-1] + '-br"'
+        assert int(response.headers["content-length"]) == len(body) < len(identity.content)
+        assert brotli.decompress(body) == identity.content
+
+        with client.stream("GET", "/api/themes/", headers={"Accept-Encoding": "gzip"}) as response:
+            assert gzip.decompress(b"".join(response.iter_raw())) == identity.content
+        for _ in range(3):
+            assert client.get("/api/themes/", headers={"Accept-Encoding": "br"}).content == identity.content
+        assert compressed == ["br", "gzip"]
+        # Kept on the cached response under the coded ETags, so they go when the theme list changes
+        cached = theme_service.response_cache.theme_list(theme_service.store.list())
+        assert set(cached.encoded) == {brotli_etag, identity.headers["etag"][:-1] + '-gzip"'}
+
+        # Any coding of the current version revalidates, and the 304 confirms the tag the client holds
+        not_modified = client.get("/api/themes/", headers={"Accept-Encoding": "br", "If-None-Match": identity.headers["etag"]})
+        assert not_modified.status_code == 304
+        not_modified = client.get("/api/themes/", headers={"Accept-Encoding": "br", "If-None-Match": brotli_etag})
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == brotli_etag
+        not_modified = client.get("/api/themes/", headers={"Accept-Encoding": "identity", "If-None-Match": brotli_etag})
+        assert not_modified.status_code == 304
+
+def test_small_and_streamed_responses_are_not_compressed():
+    with TestClient(app) as client:
+        response = client.get("/health", headers={"Accept-Encoding": "br"})
+        assert "content-encoding" not in response.headers
+        assert "vary" not in response.headers
+
+        batch = client.post(
+            "/api/validate/batch",
+            content=b'{"id": "a"}\n' * 200,
+            headers={"Accept-Encoding": "br", "Content-Type": "application/x-ndjson"}
+        )
+        assert "content-encoding" not in batch.headers
+        assert batch.text.count("\n") == 200
+
+def test_themes_with_equal_tokens_get_their_own_bodies():
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        default_theme = theme_service.store.get("default")
+        for theme_id in ("tokens-a", "tokens-b"):
+            theme_service.store.put(default_theme.copy(update={"id": theme_id, "is_active": False}))
+        try:
+            responses = {}
+            for theme_id in ("tokens-a", "tokens-b"):
+                response = client.get(f"/api/themes/{theme_id}/tokens", headers={"Accept-Encoding": "gzip"})
+                assert response.headers["content-encoding"] == "gzip"
+                assert response.json()["theme_id"] == theme_id
+                responses[theme_id] = response
+            assert responses["tokens-a"].json()["digest"] == responses["tokens-b"].json()["digest"]
+            assert responses["tokens-a"].headers["etag"] != responses["tokens-b"].headers["etag"]
+        finally:
+            for theme_id in ("tokens-a", "tokens-b"):
+                theme_service.store.delete(theme_id)
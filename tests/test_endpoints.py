@@ -45,4 +45,52 @@ def test_delete_nonexistent_theme():
 def test_apply_nonexistent_theme():
     response = client.post("/api/themes/apply/nonexistent")
     assert response.status_code == 404
-    assert response.json()["detail"] == "Theme not found" 
\ No newline at end of file
+    assert response.json()["detail"] == "Theme not found" 
+
+def test_theme_service_is_shared():
+    from app.routers.themes import get_theme_service
+    assert get_theme_service() is get_theme_service()
+
+def test_lifespan_starts_and_stops_services():
+    from app.services.registry import registry
+    with TestClient(app) as lifespan_client:
+        assert registry.is_started("theme_service")
+        response = lifespan_client.get("/api/themes/current")
+        assert response.status_code == 200
+    assert not registry.is_started("theme_service")
+
+def test_current_theme_etag_not_modified():
+    response = client.get("/api/themes/current")
+    etag = response.headers["etag"]
+    assert etag
+
+    cached = client.get("/api/themes/current", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+def test_themes_etag_changes_after_apply():
+    from app.routers.themes import get_theme_service
+    theme_service = get_theme_service()
+    default_theme = theme_service.store.get("default")
+    custom_theme = default_theme.copy(update={"id": "etag-test", "is_active": False})
+    theme_service.store.put(custom_theme)
+    theme_service.response_cache.invalidate()
+    etag = client.get("/api/themes").headers["etag"]
+
+    assert client.post("/api/themes/apply/etag-test").status_code == 200
+    response = client.get("/api/themes", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert client.get("/api/themes/current").json()["id"] == "etag-test"
+
+    client.post("/api/themes/reset")
+    theme_service.store.delete("etag-test")
+    theme_service.response_cache.invalidate()
+
+def test_theme_asset_report():
+    response = client.get("/api/themes/default/assets")
+    assert response.status_code == 200
+    assert response.json()["theme_id"] == "default"
+    assert response.json()["assets"] == 0
+    assert client.get("/api/themes/nonexistent/assets").status_code == 404
@@ -0,0 +1,71 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.utils.figma import FigmaClient
+from app.utils.figma_cache import FigmaDocumentCache
+from app.utils.http_client import HTTPClient
+
+def make_document(version, size=0):
+    return {
+        "version": version,
+        "lastModified": "2024-12-28T00:00:00Z",
+        "document": {"name": "Doc", "children": [], "padding": "x" * size}
+    }
+
+def test_cache_hit_requires_matching_version(tmp_path):
+    cache = FigmaDocumentCache(str(tmp_path), max_bytes=1024 * 1024)
+    cache.put("abc", make_document("1"))
+    assert cache.get("abc", "1", "2024-12-28T00:00:00Z")["version"] == "1"
+    assert cache.get("abc", "2", "2024-12-28T00:00:00Z") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_cache_survives_reopen(tmp_path):
+    cache = FigmaDocumentCache(str(tmp_path), max_bytes=1024 * 1024)
+    cache.put("abc", make_document("1"))
+    cache.close()
+    reopened = FigmaDocumentCache(str(tmp_path), max_bytes=1024 * 1024)
+    assert reopened.get_latest("abc")["version"] == "1"
+
+def test_least_recently_used_documents_are_evicted(tmp_path):
+    cache = FigmaDocumentCache(str(tmp_path), max_bytes=1024 * 1024)
+    cache.put("old", make_document("1"))
+    cache.put("new", make_document("1"))
+    cache.get_latest("old")
+    cache.max_bytes = cache.size
+    cache.put("newest", make_document("1"))
+    assert cache.get_latest("new") is None
+    assert cache.get_latest("old") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_unchanged_file_is_not_downloaded_again(tmp_path, monkeypatch):
+    monkeypatch.setenv("FIGMA_API_KEY", "test-token")
+    requests = []
+
+    async def handler(request):
+        requests.append(request.query.get("depth"))
+        return web.json_response(make_document("7"))
+
+    async def scenario():
+        application = web.Application()
+        application.add_routes([web.get("/v1/files/abc", handler)])
+        server = TestServer(application)
+        await server.start_server()
+        http_client = HTTPClient(max_retries=0)
+        figma_client = FigmaClient(http_client, FigmaDocumentCache(str(tmp_path), 1024 * 1024))
+        figma_client.base_url = str(server.make_url("/v1"))
+        try:
+            for _ in range(3):
+                document = await figma_client.fetch_file("https://www.figma.com/file/abc/Doc")
+                assert document["version"] == "7"
+
+            figma_client.offline = True
+            await figma_client.fetch_file("https://www.figma.com/file/abc/Doc")
+        finally:
+            await figma_client.close()
+            await http_client.close()
+            await server.close()
+
+    asyncio.run(scenario())
+    # One full download, then only depth-limited revalidation; nothing offline
+    assert requests == ["1", None, "1", "1"]
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.utils.figma import FigmaClient
+from app.utils.http_client import HTTPClient
+
+def component(node_id, name):
+    return {"id": node_id, "name": name, "type": "COMPONENT", "fills": [
+        {"type": "SOLID", "color": {"r": 0, "g": 1, "b": 0}}
+    ]}
+
+DOCUMENT = {"id": "0:0", "name": "Document", "type": "DOCUMENT", "children": [
+    {"id": "1:0", "name": "Page", "type": "CANVAS", "children": [
+        component("2:1", "Shallow"),
+        {"id": "2:2", "name": "Frame", "type": "FRAME", "children": [
+            {"id": "3:1", "name": "Group", "type": "GROUP", "children": [
+                component(f"4:{index}", f"Deep {index}") for index in range(5)
+            ]}
+        ]}
+    ]}
+]}
+
+def find(node, node_id):
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current["id"] == node_id:
+            return current
+        stack.extend(current.get("children", []))
+    return None
+
+def truncate(node, depth):
+    copy = {key: value for key, value in node.items() if key != "children"}
+    if depth > 0 and "children" in node:
+        copy["children"] = [truncate(child, depth - 1) for child in node["children"]]
+    return copy
+
+@pytest.fixture
+def figma_client(monkeypatch):
+    monkeypatch.setenv("FIGMA_API_KEY", "test-token")
+    client = FigmaClient(HTTPClient(max_retries=0))
+    client.node_batch_size = 2
+    client.node_concurrency = 2
+    return client
+
+def test_selective_fetch_requests_only_component_nodes(figma_client):
+    requests = []
+    active = {"now": 0, "peak": 0}
+
+    async def file_handler(request):
+        requests.append(("file", request.query.get("depth")))
+        depth = int(request.query["depth"])
+        components = {node_id: {"name": "x"} for node_id in ["2:1"] + [f"4:{index}" for index in range(5)]}
+        return web.json_response({"document": truncate(DOCUMENT, depth), "components": components})
+
+    async def nodes_handler(request):
+        ids = request.query["ids"].split(",")
+        requests.append(("nodes", tuple(ids)))
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        depth = int(request.query["depth"])
+        return web.json_response({"nodes": {
+            node_id: {"document": truncate(find(DOCUMENT, node_id), depth)} for node_id in ids
+        }})
+
+    async def scenario():
+        application = web.Application()
+        application.add_routes([
+            web.get("/v1/files/abc", file_handler),
+            web.get("/v1/files/abc/nodes", nodes_handler)
+        ])
+        server = TestServer(application)
+        await server.start_server()
+        figma_client.base_url = str(server.make_url("/v1"))
+        try:
+            return await figma_client.fetch_components_selective("https://www.figma.com/file/abc/Doc")
+        finally:
+            await figma_client.close()
+            await server.close()
+
+    components = asyncio.run(scenario())
+    assert list(components) == ["Document/Page/Shallow"] + [f"Document/Deep {index}" for index in range(5)]
+    assert components["Document/Deep 3"]["fill"]["color"] == "#00ff00"
+    assert requests[0] == ("file", "2")
+    assert sorted(ids for kind, ids in requests[1:]) == [("4:0", "4:1"), ("4:2", "4:3"), ("4:4",)]
+    assert active["peak"] <= 2
@@ -0,0 +1,122 @@
+import io
+import json
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.utils.figma import FigmaClient
+from app.utils.figma_cache import FigmaDocumentCache
+from app.utils import figma_stream
+from app.utils.figma_stream import collect_components, collect_components_async
+from app.utils.http_client import HTTPClient
+
+FILL = [{"type": "SOLID", "color": {"r": 1, "g": 0, "b": 0}, "opacity": 0.5}]
+
+DOCUMENT = {
+    "name": "Design System",
+    "version": "42",
+    "lastModified": "2024-12-28T00:00:00Z",
+    "document": {
+        "name": "Document",
+        "children": [
+            {
+                # Children before name/type, as the streaming parser must not rely on key order
+                "children": [
+                    {"name": "Primary", "type": "COMPONENT", "fills": FILL, "absoluteBoundingBox": {"width": 120.5, "height": 40}},
+                    {"name": "Icon", "type": "FRAME", "children": [{"name": "Glyph", "type": "COMPONENT"}]}
+                ],
+                "name": "Buttons",
+                "type": "CANVAS"
+            }
+        ]
+    },
+    "components": {"1:2": {"name": "Primary"}},
+    "styles": {}
+}
+
+@pytest.fixture
+def figma_client(monkeypatch):
+    monkeypatch.setenv("FIGMA_API_KEY", "test-token")
+    return FigmaClient(HTTPClient(max_retries=0))
+
+def test_streaming_matches_tree_traversal(figma_client):
+    expected = figma_client._collect_components(DOCUMENT["document"])
+    collector = collect_components(io.BytesIO(json.dumps(DOCUMENT).encode()), figma_client._extract_style_properties)
+    assert collector.components == expected
+    filtered = collect_components(
+        io.BytesIO(json.dumps(DOCUMENT).encode()), figma_client._extract_style_properties, figma_client.STYLE_KEYS
+    )
+    assert filtered.components == expected
+    assert list(collector.components) == ["Document/Buttons/Primary", "Document/Buttons/Icon/Glyph"]
+    assert collector.components["Document/Buttons/Primary"]["fill"]["color"] == "#ff0000"
+    assert collector.metadata["version"] == "42"
+
+def test_deep_documents_do_not_hit_recursion_limit(figma_client):
+    depth = 20000
+    body = '{"document": ' + '{"name": "n", "type": "FRAME", "children": [' * depth
+    body += '{"name": "leaf", "type": "COMPONENT"}' + "]}" * depth + "}"
+    collector = collect_components(io.BytesIO(body.encode()), figma_client._extract_style_properties)
+    assert len(collector.components) == 1
+    assert collector.nodes == depth + 1
+
+def test_stream_components_fills_document_cache(figma_client, tmp_path):
+    requests = []
+
+    async def handler(request):
+        requests.append(request.query.get("depth"))
+        return web.json_response(DOCUMENT)
+
+    async def scenario():
+        application = web.Application()
+        application.add_routes([web.get("/v1/files/abc", handler)])
+        server = TestServer(application)
+        await server.start_server()
+        figma_client.document_cache = FigmaDocumentCache(str(tmp_path), 1024 * 1024)
+        figma_client.base_url = str(server.make_url("/v1"))
+        try:
+            first = await figma_client.stream_components("https://www.figma.com/file/abc/Doc")
+            second = await figma_client.stream_components("https://www.figma.com/file/abc/Doc")
+        finally:
+            await figma_client.close()
+            await server.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert "Document/Buttons/Primary" in first
+    assert requests == ["1", None, "1"]
+
+class ChunkedReader:
+    """Async byte stream returning a body a few bytes at a time"""
+
+    def __init__(self, body, size):
+        self.body = body
+        self.size = size
+
+    async def read(self, size=-1):
+        chunk, self.body = self.body[:self.size], self.body[self.size:]
+        return chunk
+
+def test_async_streaming_parses_off_the_event_loop(figma_client, monkeypatch):
+    monkeypatch.setattr(figma_stream, "PARSE_CHUNK_BYTES", 64)
+    parsed_on_loop = []
+    extract = figma_client._extract_style_properties
+
+    def recording_extract(props):
+        try:
+            asyncio.get_running_loop()
+            parsed_on_loop.append(True)
+        except RuntimeError:
+            parsed_on_loop.append(False)
+        return extract(props)
+
+    body = json.dumps(DOCUMENT).encode()
+    sink = io.BytesIO()
+    collector = asyncio.run(collect_components_async(ChunkedReader(body, 10), recording_extract, sink=sink))
+    assert collector.components == figma_client._collect_components(DOCUMENT["document"])
+    assert sink.getvalue() == body
+    assert parsed_on_loop and not any(parsed_on_loop)
+
+    # A truncated document fails once the stream ends
+    with pytest.raises(figma_stream.ijson.IncompleteJSONError):
+        asyncio.run(collect_components_async(ChunkedReader(body[:-5], 10), extract))
@@ -0,0 +1,97 @@
+import asyncio
+import os
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.utils.figma import FigmaClient
+from app.utils.http_client import HTTPClient
+
+def run_with_server(routes, scenario):
+    async def runner():
+        application = web.Application()
+        application.add_routes(routes)
+        server = TestServer(application)
+        await server.start_server()
+        try:
+            await scenario(server)
+        finally:
+            await server.close()
+    asyncio.run(runner())
+
+def test_connections_are_reused():
+    peers = []
+
+    async def handler(request):
+        peers.append(request.transport.get_extra_info("peername"))
+        return web.json_response({"ok": True})
+
+    async def scenario(server):
+        client = HTTPClient(max_retries=0)
+        for _ in range(5):
+            async with client.request("GET", str(server.make_url("/"))) as response:
+                assert response.status == 200
+                await response.read()
+        await client.close()
+
+    run_with_server([web.get("/", handler)], scenario)
+    assert len(peers) == 5
+    assert len(set(peers)) == 1
+
+def test_retries_honor_retry_after():
+    attempts = []
+
+    async def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if len(attempts) == 2:
+            return web.Response(status=503)
+        return web.json_response({"ok": True})
+
+    async def scenario(server):
+        client = HTTPClient(max_retries=3, backoff=0.01)
+        async with client.request("GET", str(server.make_url("/"))) as response:
+            assert response.status == 200
+        await client.close()
+
+    run_with_server([web.get("/", handler)], scenario)
+    assert len(attempts) == 3
+
+def test_retries_give_up_after_max_retries():
+    attempts = []
+
+    async def handler(request):
+        attempts.append(request)
+        return web.Response(status=500)
+
+    async def scenario(server):
+        client = HTTPClient(max_retries=2, backoff=0.01)
+        async with client.request("GET", str(server.make_url("/"))) as response:
+            assert response.status == 500
+        await client.close()
+
+    run_with_server([web.get("/", handler)], scenario)
+    assert len(attempts) == 3
+
+def test_figma_client_uses_shared_pool(monkeypatch):
+    monkeypatch.setenv("FIGMA_API_KEY", "test-token")
+    tokens = []
+
+    async def handler(request):
+        tokens.append(request.headers["X-Figma-Token"])
+        return web.json_response({"document": {"name": "Doc", "children": [
+            {"name": "Button", "type": "COMPONENT", "fills": []}
+        ]}})
+
+    async def scenario(server):
+        http_client = HTTPClient(max_retries=0)
+        figma_client = FigmaClient(http_client)
+        figma_client.base_url = str(server.make_url("/v1"))
+        components = await figma_client.extract_components("https://www.figma.com/file/abc/Doc")
+        assert "Doc/Button" in components
+        session = await http_client.session()
+        await figma_client.close()
+        assert not session.closed
+        await http_client.close()
+
+    run_with_server([web.get("/v1/files/abc", handler)], scenario)
+    assert tokens == ["test-token"]
@@ -0,0 +1,138 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.themes import get_theme_service
+
+REQUIRED_COMPONENTS = ["app", "navbar", "sidebar", "button", "card", "input", "modal", "toast", "loading"]
+
+class FakeFigmaClient:
+    streaming = False
+    selective = False
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.fetches = 0
+
+    async def fetch_file(self, figma_url):
+        self.fetches += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError("Figma is down")
+        return {"document": {}}
+
+    async def parse_components(self, file_data):
+        return {name: {"background": "#000000"} for name in REQUIRED_COMPONENTS}
+
+    async def close(self):
+        pass
+
+class FakeAssetProcessor:
+    async def process_assets(self, components, progress=None, theme_id=None):
+        if progress is not None:
+            progress(1, 1)
+        return components
+
+    async def commit_theme_assets(self, theme_id, components, retained=None):
+        pass
+
+    async def close(self):
+        pass
+
+    async def delete_theme_assets(self, theme_id):
+        pass
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        theme_service = get_theme_service()
+        theme_service.asset_processor = FakeAssetProcessor()
+        yield test_client
+
+def wait_for_job(client, job_id):
+    for _ in range(100):
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("Job did not finish")
+
+def test_create_theme_runs_as_job(client):
+    get_theme_service().figma_client = FakeFigmaClient()
+    response = client.post("/api/themes/", json={"name": "Queued", "figma_url": "https://www.figma.com/file/abc/Queued"})
+    assert response.status_code == 202
+    assert response.headers["location"] == f"/api/jobs/{response.json()['id']}"
+
+    job = wait_for_job(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert job["stages"] == {"fetch": "done", "parse": "done", "assets": "done", "store": "done"}
+    assert (job["assets_done"], job["assets_total"]) == (1, 1)
+    themes = {theme["id"]: theme for theme in client.get("/api/themes").json()}
+    assert themes[job["theme_id"]]["name"] == "Queued"
+    client.delete(f"/api/themes/{job['theme_id']}")
+
+def test_inflight_jobs_for_same_url_are_deduplicated(client):
+    figma_client = FakeFigmaClient(delay=0.1)
+    get_theme_service().figma_client = figma_client
+    payload = {"name": "Dup", "figma_url": "https://www.figma.com/file/dup/Dup"}
+    first = client.post("/api/themes/", json=payload).json()
+    second = client.post("/api/themes/", json=payload).json()
+    assert first["id"] == second["id"]
+
+    job = wait_for_job(client, first["id"])
+    assert figma_client.fetches == 1
+    client.delete(f"/api/themes/{job['theme_id']}")
+
+def test_failed_job_reports_stage(client):
+    get_theme_service().figma_client = FakeFigmaClient(fail=True)
+    response = client.post("/api/themes/", json={"name": "Broken", "figma_url": "https://www.figma.com/file/bad/Broken"})
+    job = wait_for_job(client, response.json()["id"])
+    assert job["status"] == "failed"
+    assert job["stages"]["fetch"] == "failed"
+    assert "Figma is down" in job["error"]
+
+def test_unknown_job(client):
+    response = client.get("/api/jobs/nonexistent")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Job not found"
+
+@pytest.fixture
+def rebuilt_theme(client):
+    theme_service = get_theme_service()
+    default_theme = theme_service.store.get("default")
+    theme_service.store.put(default_theme.copy(update={"id": "rebuilt", "is_active": False}))
+    theme_service.figma_client = FakeFigmaClient(delay=0.2)
+    yield "rebuilt"
+    client.post("/api/themes/reset")
+    client.delete("/api/themes/rebuilt")
+
+def submit_rebuild(client, theme_id):
+    payload = {"name": "Rebuilt", "figma_url": "https://www.figma.com/file/new/Rebuilt"}
+    response = client.put(f"/api/themes/{theme_id}", json=payload)
+    assert response.status_code == 202
+    return response.json()["id"]
+
+def test_update_keeps_theme_applied_during_build(client, rebuilt_theme):
+    job_id = submit_rebuild(client, rebuilt_theme)
+    assert client.post(f"/api/themes/apply/{rebuilt_theme}").status_code == 200
+
+    assert wait_for_job(client, job_id)["status"] == "succeeded"
+    theme = client.get(f"/api/themes/{rebuilt_theme}").json()
+    assert theme["name"] == "Rebuilt"
+    assert theme["is_active"]
+    assert client.get("/api/themes/current").json()["id"] == rebuilt_theme
+
+def test_update_conflicts_with_patch_made_during_build(client, rebuilt_theme):
+    job_id = submit_rebuild(client, rebuilt_theme)
+    etag = client.get(f"/api/themes/{rebuilt_theme}").headers["etag"]
+    patch = [{"op": "replace", "path": "/app/background", "value": "#123456"}]
+    assert client.patch(f"/api/themes/{rebuilt_theme}", json=patch, headers={"If-Match": etag}).status_code == 200
+
+    job = wait_for_job(client, job_id)
+    assert job["status"] == "failed"
+    assert "modified while it was being rebuilt" in job["error"]
+    theme = client.get(f"/api/themes/{rebuilt_theme}").json()
+    assert theme["components"]["app"]["background"] == "#123456"
+    assert theme["name"] != "Rebuilt"
@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.theme import ThemeCreate
+from app.routers.themes import get_theme_service
+from app.utils.figma import FigmaClient
+from app.utils.http_client import HTTPClient
+from app.utils.metrics import FIGMA_REQUESTS, THEME_BUILDS, THEME_BUILD_STAGE_SECONDS, MetricsRegistry, _Metric
+
+REQUIRED_COMPONENTS = ["app", "navbar", "sidebar", "button", "card", "input", "modal", "toast", "loading"]
+
+def sample(text, series):
+    """Read one sample from a Prometheus text exposition"""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def stage_count(stage):
+    return sum(THEME_BUILD_STAGE_SECONDS.labels(stage).counts)
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("path",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    depth = registry.gauge("depth", "Depth")
+    depth.set_function(lambda: 3)
+
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    for value in (0.05, 0.1, 0.5, 5):
+        latency.observe(value)
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert sample(text, 'requests_total{path="/a\\"b"}') == 3
+    assert sample(text, 'latency_seconds_bucket{le="0.1"}') == 2
+    assert sample(text, 'latency_seconds_bucket{le="1"}') == 3
+    assert sample(text, 'latency_seconds_bucket{le="+Inf"}') == 4
+    assert sample(text, "latency_seconds_count") == 4
+    assert sample(text, "latency_seconds_sum") == pytest.approx(5.65)
+    assert sample(text, "depth") == 3
+    # Registering the same metric again returns the existing one
+    assert registry.counter("requests_total", "Requests", ("path",)) is requests
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests", ("path",))
+
+def test_incomplete_metric_types_fail_when_created():
+    class Unrendered(_Metric):
+        kind = "gauge"
+
+        def _new_child(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Unrendered("unrendered", "Missing _render_child")
+
+def test_request_latency_by_route_template():
+    with TestClient(app) as client:
+        client.get("/api/themes/current")
+        client.get("/api/themes/first/assets")
+        client.get("/api/themes/second/assets")
+        client.get("/assets/missing.png")
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    count = 'http_request_duration_seconds_count{method="GET",route="%s",status="%s"}'
+    assert sample(text, count % ("/api/themes/current", "200")) >= 1
+    # Path parameters are folded into the route template
+    assert sample(text, count % ("/api/themes/{theme_id}/assets", "404")) >= 2
+    assert "/api/themes/first/assets" not in text
+    assert sample(text, count % ("/assets", "404")) >= 1
+    assert sample(text, 'queue_depth{queue="theme_jobs"}') == 0
+    assert sample(text, 'cache_misses_total{cache="theme_response"}') >= 1
+
+def test_figma_requests_counted_by_status(monkeypatch):
+    monkeypatch.setenv("FIGMA_API_KEY", "test-token")
+    figma_client = FigmaClient(HTTPClient(max_retries=0))
+    ok = FIGMA_REQUESTS.labels("files", "200").value
+    missing = FIGMA_REQUESTS.labels("files", "404").value
+
+    async def file_handler(request):
+        if request.match_info["key"] == "gone":
+            return web.json_response({"message": "Not found"}, status=404)
+        return web.json_response({"document": {"id": "0:0", "name": "Document", "type": "DOCUMENT"}})
+
+    async def scenario():
+        application = web.Application()
+        application.add_routes([web.get("/v1/files/{key}", file_handler)])
+        server = TestServer(application)
+        await server.start_server()
+        figma_client.base_url = str(server.make_url("/v1"))
+        try:
+            await figma_client._make_request("GET", "files/abc")
+            with pytest.raises(Exception):
+                await figma_client._make_request("GET", "files/gone")
+        finally:
+            await figma_client.close()
+            await server.close()
+
+    asyncio.run(scenario())
+    assert FIGMA_REQUESTS.labels("files", "200").value == ok + 1
+    assert FIGMA_REQUESTS.labels("files", "404").value == missing + 1
+
+class FakeFigmaClient:
+    streaming = False
+    selective = False
+    document_cache = None
+
+    async def fetch_file(self, figma_url):
+        return {"document": {}}
+
+    async def parse_components(self, file_data):
+        return {name: {"background": "#000000"} for name in REQUIRED_COMPONENTS}
+
+    async def close(self):
+        pass
+
+def test_theme_build_stages_timed():
+    builds = THEME_BUILDS.labels("create", "success").value
+    stages = {stage: stage_count(stage) for stage in ("fetch", "parse", "assets", "store")}
+    with TestClient(app):
+        theme_service = get_theme_service()
+        theme_service.figma_client = FakeFigmaClient()
+
+        async def scenario():
+            return await theme_service.create_theme(
+                ThemeCreate(name="Timed", figma_url="https://www.figma.com/file/abc/Timed")
+            )
+
+        theme = asyncio.run(scenario())
+        asyncio.run(theme_service.delete_theme(theme.id))
+
+    assert THEME_BUILDS.labels("create", "success").value == builds + 1
+    for stage, count in stages.items():
+        assert stage_count(stage) == count + 1
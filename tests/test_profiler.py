@@ -0,0 +1,115 @@
+import time
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.routers.themes import get_theme_service
+from app.utils.profiler import ProfileLimiter, SamplingProfiler, profile_store
+
+REQUIRED_COMPONENTS = ["app", "navbar", "sidebar", "button", "card", "input", "modal", "toast", "loading"]
+
+class SlowFigmaClient:
+    streaming = False
+    selective = False
+    document_cache = None
+
+    async def fetch_file(self, figma_url):
+        await asyncio.sleep(0.1)
+        return {"document": {}}
+
+    async def parse_components(self, file_data):
+        return {name: {"background": "#000000"} for name in REQUIRED_COMPONENTS}
+
+    async def close(self):
+        pass
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profile_store, "directory", str(tmp_path))
+    return {"x-profile": "secret"}
+
+def wait_for_profile(client, headers, profile_id):
+    for _ in range(200):
+        response = client.get(f"/api/profiles/{profile_id}", headers=headers)
+        if response.status_code == 200:
+            return response.json()
+        time.sleep(0.01)
+    raise AssertionError("Profile was not stored")
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_profile_shows_running_calls_and_awaits():
+    async def scenario():
+        profiler = SamplingProfiler("test", 0.001, 5)
+        task = asyncio.current_task()
+        profiler.follow(task, "main")
+        profiler.start()
+        busy(0.05)
+        await asyncio.sleep(0.05)
+        profiler.unfollow(task)
+        profiler._thread.join()
+        return profiler.speedscope()
+
+    profile = asyncio.run(scenario())
+    frames = [frame["name"] for frame in profile["shared"]["frames"]]
+    timeline = profile["profiles"][0]
+    assert timeline["name"] == "main"
+    leaves = {frames[stack[-1]] for stack in timeline["samples"]}
+    assert "busy" in leaves
+    assert "<await Future>" in leaves
+    # Every sample is rooted at the task's coroutine
+    assert all(frames[stack[0]] == "test_profile_shows_running_calls_and_awaits.<locals>.scenario" for stack in timeline["samples"])
+
+def test_profiling_disabled_without_token():
+    with TestClient(app) as client:
+        response = client.get("/api/themes/current", headers={"x-profile": "anything"})
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+        assert client.get("/api/profiles/", headers={"x-profile": "anything"}).status_code == 404
+
+def test_wrong_token_is_not_profiled(profiling):
+    with TestClient(app) as client:
+        response = client.get("/api/themes/current?profile=wrong")
+        assert response.headers["x-profile-status"] == "denied"
+        assert "x-profile-id" not in response.headers
+        assert client.get("/api/profiles/", headers={"x-profile": "wrong"}).status_code == 403
+
+def test_profile_follows_queued_build(profiling):
+    with TestClient(app) as client:
+        get_theme_service().figma_client = SlowFigmaClient()
+        response = client.post(
+            "/api/themes/", headers=profiling,
+            json={"name": "Profiled", "figma_url": "https://www.figma.com/file/abc/Profiled"}
+        )
+        assert response.status_code == 202
+        profile = wait_for_profile(client, profiling, response.headers["x-profile-id"])
+
+        names = [timeline["name"] for timeline in profile["profiles"]]
+        assert names[0] == "request"
+        assert names[1].startswith("create_theme job ")
+        frames = [frame["name"] for frame in profile["shared"]["frames"]]
+        job_frames = {frames[index] for stack in profile["profiles"][1]["samples"] for index in stack}
+        assert "SlowFigmaClient.fetch_file" in job_frames
+        assert profile["metadata"]["id"] == response.headers["x-profile-id"]
+
+        collapsed = client.get(f"/api/profiles/{profile['metadata']['id']}?format=collapsed", headers=profiling)
+        assert "SlowFigmaClient.fetch_file" in collapsed.text
+        assert [entry["id"] for entry in client.get("/api/profiles/", headers=profiling).json()] == [
+            profile["metadata"]["id"]
+        ]
+        theme_id = client.get(f"/api/jobs/{response.json()['id']}").json()["theme_id"]
+        client.delete(f"/api/themes/{theme_id}")
+
+def test_limiter_allows_one_profile_at_a_time_and_caps_the_hour():
+    limiter = ProfileLimiter(max_per_hour=2)
+    assert limiter.acquire() is None
+    assert limiter.acquire() == "busy"
+    limiter.release()
+    assert limiter.acquire() is None
+    limiter.release()
+    assert limiter.acquire() == "rate-limited"
@@ -0,0 +1,90 @@
+import os
+import sys
+import json
+import asyncio
+import subprocess
+import pytest
+from fastapi import HTTPException
+from app.utils.figma import FigmaClient
+from app.utils.http_client import HTTPClient
+from app.utils.lazy_import import lazy_import, optional_lazy_import
+from app.utils.startup_timing import StartupTimer, StartupTimingMiddleware
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Boots the app in a fresh interpreter, since this test process has already imported everything
+COLD_START = """
+import json
+from app.main import app
+from app.utils.startup_timing import HEAVY_MODULES, module_loaded
+
+after_import = {name: module_loaded(name) for name in HEAVY_MODULES}
+# The test client's httpx pulls in brotli itself, so it is imported only after the check
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    client.get("/health")
+    report = client.get("/health/startup").json()
+print(json.dumps({"after_import": after_import, "report": report}))
+"""
+
+def test_app_boots_without_heavy_imports_or_figma_key():
+    env = {key: value for key, value in os.environ.items() if key != "FIGMA_API_KEY"}
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    assert not any(output["after_import"].values())
+
+    report = output["report"]
+    assert list(report["phases"]) == ["import", "app setup", "server start", "service startup"]
+    assert set(report["services"]) == {"http_client", "theme_service"}
+    assert report["time_to_first_response_ms"] > 0
+    # No outbound request has been made, so the HTTP and image stacks are still unloaded
+    assert report["loaded_modules"]["aiohttp"] is False
+    assert report["loaded_modules"]["PIL.Image"] is False
+
+def test_figma_key_checked_on_first_call(monkeypatch):
+    monkeypatch.delenv("FIGMA_API_KEY", raising=False)
+    monkeypatch.setenv("FIGMA_CACHE_ENABLED", "false")
+    client = FigmaClient(HTTPClient(max_retries=0))
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(client.fetch_file("https://www.figma.com/file/abc123/Theme"))
+    assert exc.value.status_code == 400
+    assert "FIGMA_API_KEY" in exc.value.detail
+
+def test_lazy_import_defers_execution(tmp_path, monkeypatch):
+    (tmp_path / "lazy_probe.py").write_text("EXECUTED = []\nEXECUTED.append(True)\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_probe", raising=False)
+
+    module = lazy_import("lazy_probe")
+    assert type(module).__name__ == "_LazyModule"
+    assert module.VALUE == 42
+    assert module.EXECUTED == [True]
+    assert type(module).__name__ != "_LazyModule"
+    assert optional_lazy_import("not_an_installed_module") is None
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("not_an_installed_module")
+
+def test_middleware_records_first_response_once():
+    timer = StartupTimer()
+    timer.mark("import")
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message["type"])
+
+    middleware = StartupTimingMiddleware(app, timer)
+    asyncio.run(middleware({"type": "http"}, None, send))
+    first = timer.first_response
+    asyncio.run(middleware({"type": "http"}, None, send))
+
+    assert first is not None and timer.first_response == first
+    assert sent == ["http.response.start", "http.response.body"] * 2
+    assert timer.report()["time_to_first_response_ms"] >= timer.report()["phases"]["import"]
@@ -0,0 +1,136 @@
+import gzip
+import os
+import asyncio
+import brotli
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.utils.static_assets import StaticAssets
+
+DIGEST = "ab" * 32
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+@pytest.fixture
+def assets_dir(tmp_path):
+    write(str(tmp_path / "ab" / f"{DIGEST}-480.webp"), bytes(range(256)) * 4)
+    manifest = b'{"digest": "' + DIGEST.encode() + b'", "variants": []}'
+    write(str(tmp_path / "ab" / f"{DIGEST}.json"), manifest)
+    write(str(tmp_path / "ab" / f"{DIGEST}.json.gz"), gzip.compress(manifest))
+    write(str(tmp_path / "ab" / f"{DIGEST}.json.br"), brotli.compress(manifest))
+    write(str(tmp_path / "legacy.png"), b"legacy")
+    write(str(tmp_path / ".hidden"), b"secret")
+    return tmp_path
+
+@pytest.fixture
+def client(assets_dir):
+    return TestClient(StaticAssets(str(assets_dir), revalidate_seconds=0))
+
+def test_hashed_assets_are_immutable(client):
+    response = client.get(f"/ab/{DIGEST}-480.webp")
+    assert response.status_code == 200
+    assert response.content == bytes(range(256)) * 4
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["etag"] == f'"{DIGEST}-480.webp"'
+    assert "vary" not in response.headers
+
+    cached = client.get(f"/ab/{DIGEST}-480.webp", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+def test_unhashed_files_revalidate(client, assets_dir):
+    response = client.get("/legacy.png")
+    assert response.headers["cache-control"] == "no-cache"
+    write(str(assets_dir / "legacy.png"), b"replaced!")
+    updated = client.get("/legacy.png", headers={"If-None-Match": response.headers["etag"]})
+    assert updated.status_code == 200
+    assert updated.content == b"replaced!"
+
+def test_byte_ranges(client):
+    path = f"/ab/{DIGEST}-480.webp"
+    partial = client.get(path, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(10, 20))
+    assert partial.headers["content-range"] == "bytes 10-19/1024"
+
+    suffix = client.get(path, headers={"Range": "bytes=-4"})
+    assert suffix.content == bytes(range(252, 256))
+
+    assert client.get(path, headers={"Range": "bytes=2000-"}).status_code == 416
+    stale = client.get(path, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert stale.status_code == 200
+    assert len(stale.content) == 1024
+
+def test_precompressed_siblings_are_negotiated(client):
+    path = f"/ab/{DIGEST}.json"
+    brotli_response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+    assert brotli_response.headers["content-encoding"] == "br"
+    assert brotli_response.headers["vary"] == "Accept-Encoding"
+    assert brotli_response.json()["digest"] == DIGEST
+
+    gzip_response = client.get(path, headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert brotli_response.headers["etag"] == f'"{DIGEST}.json-br"'
+    assert gzip_response.headers["etag"] == f'"{DIGEST}.json-gzip"'
+    assert gzip_response.json()["digest"] == DIGEST
+
+    identity = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["content-type"] == "application/json"
+    # The tag of any coding revalidates the file
+    revalidated = client.get(path, headers={"Accept-Encoding": "identity", "If-None-Match": brotli_response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+def test_large_files_are_streamed_from_disk(assets_dir):
+    client = TestClient(StaticAssets(str(assets_dir), max_file_bytes=100, chunk_size=100))
+    path = f"/ab/{DIGEST}-480.webp"
+    assert client.get(path).content == bytes(range(256)) * 4
+    assert client.get(path, headers={"Range": "bytes=250-259"}).content == bytes([250, 251, 252, 253, 254, 255, 0, 1, 2, 3])
+
+def test_hidden_and_escaping_paths_are_refused(client):
+    assert client.get("/.hidden").status_code == 404
+    assert client.get("/ab/../../etc/passwd").status_code == 404
+    assert client.get("/missing.webp").status_code == 404
+    assert client.post("/legacy.png").status_code == 405
+
+def test_symlinks_out_of_the_directory_are_refused(assets_dir, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    write(str(outside / "secret.png"), b"secret")
+    os.symlink(str(outside / "secret.png"), str(assets_dir / "link.png"))
+    assert TestClient(StaticAssets(str(assets_dir))).get("/link.png").status_code == 404
+
+def on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+def test_disk_is_only_touched_off_the_event_loop(assets_dir, monkeypatch):
+    static = StaticAssets(str(assets_dir), revalidate_seconds=60)
+    loads = []
+    original_load = static._load
+
+    def recording_load(path):
+        loads.append(on_event_loop())
+        return original_load(path)
+
+    monkeypatch.setattr(static, "_load", recording_load)
+    client = TestClient(static)
+    for _ in range(3):
+        assert client.get(f"/ab/{DIGEST}-480.webp").status_code == 200
+    # Loaded once on a worker thread; hits within the revalidation window never reach the disk
+    assert loads == [False]
+
+def test_assets_are_mounted_on_the_app():
+    write(os.path.join(settings.ASSETS_DIR, "cd", f"{'cd' * 32}-64.png"), b"png")
+    with TestClient(app) as test_client:
+        response = test_client.get(f"/assets/cd/{'cd' * 32}-64.png")
+    assert response.status_code == 200
+    assert response.content == b"png"
+    assert response.headers["content-type"] == "image/png"
@@ -0,0 +1,105 @@
+import io
+import sys
+import json
+import queue
+import logging
+import pytest
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.utils.structured_logging import JsonFormatter, NonBlockingQueueHandler, log_manager
+
+@pytest.fixture
+def log_output():
+    """Route the app's logs into a buffer, restoring the default configuration afterwards"""
+    buffer = io.StringIO()
+    log_manager.configure(
+        level="INFO", levels={}, sample_rates={"/api/themes/current": 0.0}, slow_request_ms=60000, stream=buffer
+    )
+
+    def records():
+        # Stopping the listener writes out everything queued so far
+        log_manager.stop()
+        return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+    yield records
+    log_manager.configure()
+
+def test_json_formatter_includes_extra_and_exception():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.getLogger("test").makeRecord(
+            "test", logging.ERROR, __file__, 1, "Failed %s", ("build",), sys.exc_info(),
+            extra={"theme_id": "t1"}
+        )
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Failed build"
+    assert entry["level"] == "ERROR"
+    assert entry["theme_id"] == "t1"
+    assert "RuntimeError: boom" in entry["exception"]
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    logger = logging.getLogger("test.full_queue")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(5):
+            logger.warning("message %d", i)
+    finally:
+        logger.removeHandler(handler)
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 4
+    # Formatting is left to the listener, so the record keeps its arguments
+    assert handler.queue.get_nowait().args == (0,)
+
+def test_requests_sampled_by_route(log_output):
+    with TestClient(app) as client:
+        client.get("/api/themes/current")
+        client.get("/api/themes/")
+        client.get("/api/themes/missing/assets")
+    access = [entry for entry in log_output() if entry["logger"] == "app.access"]
+
+    paths = [entry["path"] for entry in access]
+    assert "/api/themes/current" not in paths
+    assert "/api/themes/" in paths
+    entry = access[paths.index("/api/themes/")]
+    assert entry["status"] == 200
+    assert entry["method"] == "GET"
+    assert entry["request_id"]
+
+def test_slow_requests_logged_whatever_the_sample_rate(log_output):
+    log_manager.slow_request_ms = 0
+    with TestClient(app) as client:
+        client.get("/api/themes/current", headers={"x-request-id": "abc123"})
+    access = [entry for entry in log_output() if entry["logger"] == "app.access"]
+    assert [(entry["path"], entry["level"], entry["request_id"]) for entry in access] == [
+        ("/api/themes/current", "WARNING", "abc123")
+    ]
+
+def test_levels_and_sample_rates_change_at_runtime(log_output, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_RUNTIME_CHANGES", True)
+    with TestClient(app) as client:
+        response = client.put("/api/logging/", json={
+            "levels": {"app.utils.figma": "debug"},
+            "sample_rates": {"/api/jobs": 0.5}
+        })
+        assert response.status_code == 200
+        state = response.json()
+        assert state["levels"]["app.utils.figma"] == "DEBUG"
+        assert state["sample_rates"] == {"/api/themes/current": 0.0, "/api/jobs": 0.5}
+        assert logging.getLogger("app.utils.figma").isEnabledFor(logging.DEBUG)
+
+        response = client.put("/api/logging/", json={"levels": {"app.utils.figma": None}})
+        assert "app.utils.figma" not in response.json()["levels"]
+
+        assert client.put("/api/logging/", json={"level": "loud"}).status_code == 400
+        assert client.put("/api/logging/", json={"sample_rates": {"/": 2}}).status_code == 400
+        assert client.get("/api/logging/").json()["level"] == "INFO"
+
+def test_runtime_changes_rejected_unless_enabled(log_output):
+    with TestClient(app) as client:
+        response = client.put("/api/logging/", json={"level": "debug"})
+        assert response.status_code == 403
+        assert client.get("/api/logging/").json()["level"] == "INFO"
@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.themes import get_theme_service
+from app.utils.theme_css import compile_theme_css, flatten_tokens
+
+def test_flatten_tokens():
+    tokens = flatten_tokens({
+        "button": {"primary": {"hoverBackground": "#00cc00", "borderWidth": 2}},
+        "card": {
+            "backgroundImage": "/assets/ab/abc.webp",
+            "images": {"logo": "https://example.com/logo.png"},
+            "imageManifests": {"logo": "/assets/ab/abc.json"},
+            "text": "red;} body{display:none"
+        }
+    })
+    assert tokens == {
+        "--button-primary-hover-background": "#00cc00",
+        "--button-primary-border-width": "2",
+        "--card-background-image": 'url("/assets/ab/abc.webp")'
+    }
+
+def test_compile_is_minified_and_content_hashed():
+    stylesheet = compile_theme_css("theme-a", {"app": {"background": "#000", "text": "#fff"}})
+    assert stylesheet.css == b":root{--app-background:#000;--app-text:#fff}"
+    assert stylesheet.url == f"/api/themes/theme-a/css/{stylesheet.digest}.css"
+    assert compile_theme_css("theme-a", {"app": {"background": "#000", "text": "#fff"}}).digest == stylesheet.digest
+    assert compile_theme_css("theme-a", {"app": {"background": "#111", "text": "#fff"}}).digest != stylesheet.digest
+
+def test_current_theme_css_endpoints():
+    with TestClient(app) as client:
+        response = client.get("/api/themes/current/css")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/css")
+        assert response.headers["cache-control"] == "no-cache"
+        assert b"--button-primary-hover-background:#00cc00" in response.content
+        versioned_url = response.headers["content-location"]
+
+        assert client.get("/api/themes/current/css", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+        versioned = client.get(versioned_url)
+        assert versioned.content == response.content
+        assert "immutable" in versioned.headers["cache-control"]
+        assert client.get("/api/themes/default/css/0000000000000000.css").status_code == 404
+
+        tokens = client.get("/api/themes/current/tokens").json()
+        assert tokens["css_url"] == versioned_url
+        assert tokens["tokens"]["--app-background"] == "#0a0a0a"
+        assert client.get("/api/themes/missing/css").status_code == 404
+
+def test_stylesheet_compiled_once_per_version():
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        default_theme = theme_service.store.get("default")
+        theme_service.store.put(default_theme.copy(update={"id": "css-test", "is_active": False}))
+        try:
+            client.post("/api/themes/apply/css-test")
+            first = client.get("/api/themes/current/css")
+            assert first.headers["content-location"].startswith("/api/themes/css-test/css/")
+            client.post("/api/themes/reset")
+            misses = theme_service.stylesheets.misses
+            client.post("/api/themes/apply/css-test")
+            assert client.get("/api/themes/css-test/css").content == first.content
+            # Applying again does not recompile an unchanged theme
+            assert theme_service.stylesheets.misses == misses
+
+            etag = client.get("/api/themes/css-test").headers["etag"]
+            patch = [{"op": "replace", "path": "/app/background", "value": "#123456"}]
+            client.patch("/api/themes/css-test", json=patch, headers={"If-Match": etag})
+            assert theme_service.stylesheets.misses == misses + 1
+            updated = client.get("/api/themes/current/css")
+            assert b"--app-background:#123456" in updated.content
+            assert updated.headers["content-location"] != first.headers["content-location"]
+        finally:
+            client.post("/api/themes/reset")
+            client.delete("/api/themes/css-test")
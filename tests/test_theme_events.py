@@ -0,0 +1,61 @@
+import asyncio
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.themes import get_theme_service
+from app.services.theme_events import ThemeEventBroker
+
+def test_publish_reaches_subscribers():
+    async def scenario():
+        broker = ThemeEventBroker(max_queue_size=4)
+        subscription = broker.subscribe()
+        broker.publish("default", '"v1"')
+        events = subscription.events(heartbeat=1)
+        event = await events.__anext__()
+        assert event.theme_id == "default"
+        assert event.version == '"v1"'
+        assert event.sequence == 1
+    asyncio.run(scenario())
+
+def test_heartbeat_when_idle():
+    async def scenario():
+        broker = ThemeEventBroker()
+        subscription = broker.subscribe()
+        assert await subscription.events(heartbeat=0.01).__anext__() is None
+    asyncio.run(scenario())
+
+def test_slow_consumer_is_dropped():
+    async def scenario():
+        broker = ThemeEventBroker(max_queue_size=2)
+        slow = broker.subscribe()
+        for index in range(3):
+            broker.publish("default", f'"v{index}"')
+        assert broker.subscriber_count == 0
+        assert [event async for event in slow.events(heartbeat=1)] == []
+    asyncio.run(scenario())
+
+def test_websocket_receives_theme_changes():
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/themes/events") as websocket:
+            initial = websocket.receive_json()
+            assert initial["event"] == "theme_current"
+            assert initial["theme_id"] == "default"
+
+            assert client.post("/api/themes/reset").status_code == 200
+            changed = websocket.receive_json()
+            assert changed["event"] == "theme_changed"
+            assert changed["theme_id"] == "default"
+            # The event names the identity ETag, which revalidates any coding of the theme
+            current = client.get("/api/themes/current", headers={"Accept-Encoding": "identity"})
+            assert changed["version"] == current.headers["etag"]
+
+def test_failed_event_stream_does_not_keep_its_subscription(monkeypatch):
+    async def unavailable():
+        raise HTTPException(status_code=503, detail="Theme store unavailable")
+
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        subscribers = theme_service.events.subscriber_count
+        monkeypatch.setattr(theme_service, "get_current_theme_event", unavailable)
+        assert client.get("/api/themes/events").status_code == 503
+        assert theme_service.events.subscriber_count == subscribers
@@ -0,0 +1,95 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.themes import get_theme_service
+from app.utils.json_patch import JsonPatchError, JsonPatchTestFailed, apply_patch, diff_paths
+
+def test_apply_patch_operations():
+    document = {"button": {"background": "#000", "a/b": 1, "states": ["hover", "focus"]}, "card": {}}
+    patch = [
+        {"op": "replace", "path": "/button/background", "value": "#fff"},
+        {"op": "add", "path": "/button/states/1", "value": "active"},
+        {"op": "remove", "path": "/button/a~1b"},
+        {"op": "copy", "from": "/button/background", "path": "/card/background"},
+        {"op": "move", "from": "/card", "path": "/panel"},
+        {"op": "test", "path": "/panel/background", "value": "#fff"}
+    ]
+    patched = apply_patch(document, patch)
+
+    assert patched == {
+        "button": {"background": "#fff", "states": ["hover", "active", "focus"]},
+        "panel": {"background": "#fff"}
+    }
+    # The input document is never modified
+    assert document["button"]["background"] == "#000"
+    assert diff_paths(document, patched, patch) == [
+        {"op": "add", "path": "/panel", "value": {"background": "#fff"}},
+        {"op": "remove", "path": "/card"},
+        {"op": "replace", "path": "/button/background", "value": "#fff"},
+        {"op": "replace", "path": "/button/states", "value": ["hover", "active", "focus"]},
+        {"op": "remove", "path": "/button/a~1b"}
+    ]
+
+@pytest.mark.parametrize("patch, error", [
+    ([{"op": "replace", "path": "/missing/color", "value": 1}], JsonPatchError),
+    ([{"op": "remove", "path": "/list/5"}], JsonPatchError),
+    ([{"op": "add", "path": "/list/01", "value": 1}], JsonPatchError),
+    ([{"op": "add", "path": "color"}], JsonPatchError),
+    ([{"op": "move", "from": "/list", "path": "/list/0"}], JsonPatchError),
+    ([{"op": "test", "path": "/flag", "value": 1}], JsonPatchTestFailed),
+])
+def test_apply_patch_rejects_invalid_operations(patch, error):
+    with pytest.raises(error):
+        apply_patch({"list": [1, 2], "flag": True}, patch)
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        default_theme = theme_service.store.get("default")
+        theme_service.store.put(default_theme.copy(update={"id": "patch-test", "is_active": False}))
+        theme_service.response_cache.invalidate()
+        yield client
+        theme_service.store.delete("patch-test")
+        theme_service.response_cache.invalidate()
+
+def test_patch_theme_with_if_match(client):
+    # A compressed copy's ETag carries the coding, and still matches the version it was made from
+    response = client.get("/api/themes/patch-test", headers={"Accept-Encoding": "br"})
+    etag = response.headers["etag"]
+    assert etag.endswith('-br"')
+    original_button = response.json()["components"]["button"]
+
+    patch = [{"op": "replace", "path": "/button/primary/background", "value": "#123456"}]
+    response = client.patch(
+        "/api/themes/patch-test", json=patch,
+        headers={"If-Match": etag, "Content-Type": "application/json-patch+json"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["changes"] == [{"op": "replace", "path": "/button/primary/background", "value": "#123456"}]
+    assert body["etag"] == response.headers["etag"] != etag
+
+    theme = client.get("/api/themes/patch-test", headers={"Accept-Encoding": "identity"})
+    assert theme.headers["etag"] == body["etag"]
+    assert theme.json()["components"]["button"] == {
+        **original_button, "primary": {**original_button["primary"], "background": "#123456"}
+    }
+
+    # The old version no longer matches
+    stale = client.patch("/api/themes/patch-test", json=patch, headers={"If-Match": etag})
+    assert stale.status_code == 412
+
+def test_patch_theme_rejections(client):
+    etag = client.get("/api/themes/patch-test").headers["etag"]
+    patch = [{"op": "replace", "path": "/button/primary/background", "value": "#123456"}]
+
+    assert client.patch("/api/themes/patch-test", json=patch).status_code == 428
+    assert client.patch("/api/themes/default", json=patch, headers={"If-Match": "*"}).status_code == 400
+    assert client.patch("/api/themes/missing", json=patch, headers={"If-Match": "*"}).status_code == 404
+    failed_test = [{"op": "test", "path": "/button/primary/background", "value": "nope"}] + patch
+    assert client.patch("/api/themes/patch-test", json=failed_test, headers={"If-Match": etag}).status_code == 409
+    required = [{"op": "remove", "path": "/button"}]
+    assert client.patch("/api/themes/patch-test", json=required, headers={"If-Match": etag}).status_code == 400
+    # Nothing was written by the rejected patches
+    assert client.get("/api/themes/patch-test").headers["etag"] == etag
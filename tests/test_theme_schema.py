@@ -0,0 +1,99 @@
+import json
+import asyncio
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.main import app
+from app.routers.validation import validate_lines
+from app.utils.theme_schema import ThemeValidator
+
+with open("app/data/default_theme.json") as f:
+    DEFAULT_THEME = json.load(f)
+
+def invalid_theme():
+    theme = json.loads(json.dumps(DEFAULT_THEME))
+    del theme["components"]["card"]
+    theme["components"]["button"]["primary"]["hoverBackground"] = "green;"
+    theme["components"]["loading"]["opacity"] = 2
+    theme["components"]["navbar"] = "dark"
+    theme["components"]["extra"] = {"fill": {"color": "#12345", "opacity": 1}, "effects": [{"radius": -4}]}
+    return theme
+
+def test_reports_every_error():
+    result = ThemeValidator().validate(invalid_theme())
+    assert not result.valid
+    assert sorted(result.errors, key=lambda error: error["path"]) == [
+        {"path": "/components/button/primary/hoverBackground", "message": "must be a hex, rgb(), rgba(), hsl(), hsla() or named color"},
+        {"path": "/components/card", "message": "is required"},
+        {"path": "/components/extra/effects/0/radius", "message": "must be at least 0"},
+        {"path": "/components/extra/fill/color", "message": "must be a hex, rgb(), rgba(), hsl(), hsla() or named color"},
+        {"path": "/components/loading/opacity", "message": "must be at most 1"},
+        {"path": "/components/navbar", "message": "must be object"}
+    ]
+
+def test_accepts_real_colors_and_only_checks_color_keys():
+    theme = json.loads(json.dumps(DEFAULT_THEME))
+    assert ThemeValidator().validate(theme).valid
+    theme["components"]["card"].update({
+        "background": "white",
+        "text": "hsl(120deg 100% 50%)",
+        "overlay": "rgb(0 0 0 / 50%)",
+        "border": "1px solid #333",
+        "focusBorder": "2px dashed rebeccapurple",
+        "spinnerColor": "CurrentColor"
+    })
+    # Not colors: labels and shorthands under names that merely end in Text or Border
+    theme["components"]["button"].update({"buttonText": "Submit", "inputBorder": "1px inset"})
+    assert ThemeValidator().validate(theme).valid
+
+    theme["components"]["card"].update({"background": "whiteish", "border": "1px solid #33", "text": "hsl(120deg 100%)"})
+    result = ThemeValidator().validate(theme)
+    assert sorted(error["path"] for error in result.errors) == [
+        "/components/card/background", "/components/card/border", "/components/card/text"
+    ]
+
+def test_results_memoized_by_content():
+    validator = ThemeValidator()
+    assert validator.validate(DEFAULT_THEME).valid
+    # Key order does not change the content hash
+    reordered = dict(reversed(list(DEFAULT_THEME.items())))
+    assert validator.validate(reordered).valid
+    assert (validator.hits, validator.misses) == (1, 1)
+
+    raw = json.dumps(DEFAULT_THEME)
+    assert validator.validate_json(raw).valid
+    assert validator.validate_json(raw + "\n").valid
+    assert validator.hits == 2
+    assert validator.validate_json("{not json").errors[0]["path"] == ""
+
+def test_validate_lines_across_chunk_boundaries():
+    lines = [json.dumps(DEFAULT_THEME).encode(), b"", json.dumps(invalid_theme()).encode(), b"[1, 2]"]
+    body = b"\n".join(lines)
+
+    async def chunks():
+        for start in range(0, len(body), 100):
+            yield body[start:start + 100]
+
+    async def collect():
+        return b"".join([chunk async for chunk in validate_lines(chunks(), 1024 * 1024)])
+
+    results = [json.loads(line) for line in asyncio.run(collect()).splitlines()]
+    assert [(result["line"], result["valid"]) for result in results] == [(1, True), (3, False), (4, False)]
+    assert results[2]["errors"] == [{"path": "", "message": "must be object"}]
+
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    monkeypatch.setattr(settings, "VALIDATION_MAX_LINE_BYTES", 4096)
+    oversized = dict(DEFAULT_THEME, description="x" * 5000)
+    body = "\n".join([json.dumps(DEFAULT_THEME), json.dumps(oversized), "{oops", json.dumps(DEFAULT_THEME)]) + "\n"
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/validate/batch", content=body.encode(), headers={"Content-Type": "application/x-ndjson"}
+        )
+        single = client.post("/api/validate/", json=invalid_theme()).json()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [(result["line"], result["valid"]) for result in results] == [(1, True), (2, False), (3, False), (4, True)]
+    assert results[1]["errors"][0]["message"] == "line is longer than 4096 bytes"
+    assert results[0]["digest"] == results[3]["digest"]
+    assert not single["valid"] and len(single["errors"]) == 6
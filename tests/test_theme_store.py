@@ -0,0 +1,226 @@
+import asyncio
+import threading
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.config import settings
+from app.models.theme import Theme
+from app.services.theme_store import MemoryThemeStore, SQLiteThemeStore, StoreChange, ThemeStore
+from app.services.theme_service import ThemeService
+
+def make_theme(theme_id, name="Test Theme"):
+    return Theme(
+        id=theme_id,
+        name=name,
+        components={"app": {"background": "#000000"}},
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
+    )
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "themes.db")
+
+def test_stores_must_implement_the_whole_interface():
+    class PartialStore(ThemeStore):
+        def get(self, theme_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+def test_sqlite_store_survives_reopen(db_path):
+    store = SQLiteThemeStore(db_path)
+    store.put(make_theme("one"))
+    store.set_meta("current_theme_id", "one")
+    store.close()
+
+    reopened = SQLiteThemeStore(db_path)
+    assert reopened.get("one").name == "Test Theme"
+    assert reopened.get_meta("current_theme_id") == "one"
+    reopened.close()
+
+def test_sqlite_store_uses_wal(db_path):
+    store = SQLiteThemeStore(db_path)
+    mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+    store.close()
+
+def test_sqlite_store_cache_invalidated_on_write(db_path):
+    store = SQLiteThemeStore(db_path)
+    store.put(make_theme("one"))
+    assert [theme.id for theme in store.list()] == ["one"]
+
+    store.put(make_theme("two", name="Second"))
+    assert [theme.id for theme in store.list()] == ["one", "two"]
+    assert store.get_by_name("Second").id == "two"
+
+    store.delete("one")
+    assert store.get("one") is None
+    assert [theme.id for theme in store.list()] == ["two"]
+    store.close()
+
+def test_memory_store_basic_operations():
+    store = MemoryThemeStore()
+    store.put(make_theme("one"))
+    assert "one" in store
+    assert store.get_by_name("Test Theme").id == "one"
+    store.delete("one")
+    assert store.list() == []
+
+def test_current_theme_survives_service_restart(db_path):
+    service = ThemeService(store=SQLiteThemeStore(db_path))
+    service.store.put(make_theme("custom"))
+    asyncio.run(service.apply_theme("custom"))
+    asyncio.run(service.close())
+
+    restarted = ThemeService(store=SQLiteThemeStore(db_path))
+    current = asyncio.run(restarted.get_current_theme())
+    assert current.id == "custom"
+    assert current.is_active
+    assert not restarted.store.get("default").is_active
+    asyncio.run(restarted.close())
+
+def test_sqlite_store_sync_picks_up_other_writers(db_path):
+    worker_a, worker_b = SQLiteThemeStore(db_path), SQLiteThemeStore(db_path)
+    worker_a.put(make_theme("one"))
+    assert worker_b.get("one").name == "Test Theme"
+    assert worker_b.sync() == [StoreChange("theme", "one")]
+    assert worker_b.get("one").name == "Test Theme"
+
+    worker_a.put(make_theme("one", name="Renamed"))
+    worker_a.set_meta("current_theme_id", "one")
+    # Served from the cache until the change is synced
+    assert worker_b.get("one").name == "Test Theme"
+    assert worker_b.sync() == [StoreChange("theme", "one"), StoreChange("meta", "current_theme_id")]
+    assert worker_b.get("one").name == "Renamed"
+    assert worker_b.get_meta("current_theme_id") == "one"
+
+    # A worker's own writes are never reported back to it
+    worker_b.delete("one")
+    assert worker_b.sync() == []
+    assert worker_a.sync() == [StoreChange("theme", "one")]
+    assert worker_a.get("one") is None
+    worker_a.close()
+    worker_b.close()
+
+def test_sqlite_store_sync_resets_after_missed_changes(db_path, monkeypatch):
+    monkeypatch.setattr(SQLiteThemeStore, "CHANGE_LOG_SIZE", 2)
+    worker_a, worker_b = SQLiteThemeStore(db_path), SQLiteThemeStore(db_path)
+    worker_a.put(make_theme("one"))
+    assert [theme.id for theme in worker_b.list()] == ["one"]
+    for theme_id in ("two", "three", "four"):
+        worker_a.put(make_theme(theme_id))
+    assert worker_b.sync() == [StoreChange("reset", None)]
+    assert [theme.id for theme in worker_b.list()] == ["one", "two", "three", "four"]
+    worker_a.close()
+    worker_b.close()
+
+def test_workers_follow_theme_applied_by_another(db_path, monkeypatch):
+    monkeypatch.setattr(settings, "THEME_SYNC_INTERVAL_SECONDS", 0.001)
+
+    async def scenario():
+        worker_a = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_b = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_b.start()
+        subscription = worker_b.events.subscribe()
+        worker_a.store.put(make_theme("custom"))
+        await worker_a.apply_theme("custom")
+
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+        assert (event.theme_id, event.version) == ("custom", worker_a.response_cache.theme(worker_a.store.get("custom")).etag)
+        assert (await worker_b.get_current_theme()).id == "custom"
+        assert not worker_b.store.get("default").is_active
+        assert (await worker_b.get_all_themes_response()).body == (await worker_a.get_all_themes_response()).body
+        # Both the deactivated default and the applied theme arrive; only one event is sent
+        await asyncio.sleep(0.01)
+        assert subscription.queue.empty()
+        await worker_a.close()
+        await worker_b.close()
+
+    asyncio.run(scenario())
+
+def test_worker_notifies_its_own_subscribers_without_polling(db_path):
+    async def scenario():
+        worker = ThemeService(store=SQLiteThemeStore(db_path))
+        worker.start()
+        subscription = worker.events.subscribe()
+        worker.store.put(make_theme("custom"))
+        await worker.apply_theme("custom")
+        # Published by the in-process broker, well before the next sync
+        event = subscription.queue.get_nowait()
+        assert event.theme_id == "custom"
+        assert settings.THEME_SYNC_INTERVAL_SECONDS >= 0.25
+        await worker.close()
+
+    asyncio.run(scenario())
+
+def test_apply_and_reset_leave_read_themes_unchanged(db_path):
+    async def scenario():
+        service = ThemeService(store=SQLiteThemeStore(db_path))
+        service.store.put(make_theme("custom"))
+        default_before, custom_before = service.store.get("default"), service.store.get("custom")
+        await service.apply_theme("custom")
+        assert default_before.is_active and not custom_before.is_active
+        assert service.store.get("custom").is_active and not service.store.get("default").is_active
+
+        custom_applied = service.store.get("custom")
+        await service.reset_theme()
+        assert custom_applied.is_active
+        assert service.store.get("default").is_active and not service.store.get("custom").is_active
+        await service.close()
+
+    asyncio.run(scenario())
+
+def test_concurrent_applies_on_two_workers_leave_one_theme_active(db_path):
+    setup = SQLiteThemeStore(db_path)
+    for theme_id in ("one", "two"):
+        setup.put(make_theme(theme_id))
+    setup.close()
+    rounds = 20
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def worker(theme_id):
+        async def run():
+            service = ThemeService(store=SQLiteThemeStore(db_path))
+            for _ in range(rounds):
+                await asyncio.to_thread(barrier.wait)
+                await service.apply_theme(theme_id)
+            await service.close()
+
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+
+    threads = [threading.Thread(target=worker, args=(theme_id,)) for theme_id in ("one", "two")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    store = SQLiteThemeStore(db_path)
+    active = [theme.id for theme in store.list() if theme.is_active]
+    assert active == [store.get_meta("current_theme_id")]
+    store.close()
+
+def test_reads_see_other_workers_writes_without_waiting_for_the_poll(db_path):
+    async def scenario():
+        worker_a = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_b = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_b.start()
+        assert (await worker_b.get_current_theme()).id == "default"
+        worker_a.store.put(make_theme("custom"))
+        await worker_a.apply_theme("custom")
+        assert (await worker_b.get_current_theme()).id == "custom"
+        # The theme another worker applied cannot be deleted, even before the poll
+        with pytest.raises(HTTPException) as excinfo:
+            await worker_b.delete_theme("custom")
+        assert excinfo.value.status_code == 400
+        await worker_a.close()
+        await worker_b.close()
+
+    asyncio.run(scenario())
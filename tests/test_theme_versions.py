@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.theme import PatchOperation, Theme
+from app.routers.themes import get_theme_service
+from app.services.theme_service import ThemeService
+from app.services.theme_store import MemoryThemeStore, SQLiteThemeStore
+from app.services.theme_versions import ThemeVersionStore
+from app.utils.json_patch import apply_patch, diff_documents
+
+def make_theme(components, theme_id="versioned"):
+    now = datetime.utcnow()
+    return Theme(id=theme_id, name="Versioned", components=components, created_at=now, updated_at=now)
+
+def test_patches_share_unchanged_branches():
+    components = {"button": {"primary": {"background": "#000"}, "danger": {"background": "#f00"}}, "card": {"text": "#fff"}}
+    patched = apply_patch(components, [{"op": "replace", "path": "/button/primary/background", "value": "#111"}])
+
+    assert components["button"]["primary"]["background"] == "#000"
+    assert patched["card"] is components["card"]
+    assert patched["button"]["danger"] is components["button"]["danger"]
+    assert diff_documents(components, patched) == [
+        {"op": "replace", "path": "/button/primary/background", "value": "#111"}
+    ]
+
+def test_trimmed_versions_release_their_assets():
+    store = ThemeVersionStore(MemoryThemeStore(), 2, lambda components: {value for value in components.values() if value.startswith("asset")})
+    theme = make_theme({"logo": "asset-a"})
+    store.record(theme, "create")
+    store.record(theme.copy(update={"components": {"logo": "asset-b"}}), "update")
+    assert store.asset_digests(theme.id) == {"asset-a", "asset-b"}
+
+    latest = theme.copy(update={"components": {"logo": "asset-c"}})
+    store.record(latest, "update")
+    assert [version["version"] for version in store.list(latest)] == [2, 3]
+    assert store.get(latest, 1) is None
+    assert store.asset_digests(theme.id) == {"asset-b", "asset-c"}
+
+def test_versions_stored_in_sqlite_share_unchanged_nodes(tmp_path):
+    db_path = str(tmp_path / "themes.db")
+    components = {"button": {"primary": {"background": "#000"}, "danger": {"background": "#f00"}}, "card": {"text": "#fff"}}
+    writer = SQLiteThemeStore(db_path)
+    store = ThemeVersionStore(writer, 2, lambda components: set())
+    theme = make_theme(components)
+    store.record(theme, "create")
+    nodes = writer._conn.execute("SELECT COUNT(*) FROM version_nodes").fetchone()[0]
+    for color in ("#111", "#222", "#333"):
+        patch = [{"op": "replace", "path": "/button/primary/background", "value": color}]
+        theme = theme.copy(update={"components": apply_patch(theme.components, patch)})
+        store.record(theme, "patch")
+    # Each edit adds only the objects on its path: the root, "button" and "primary"
+    assert writer._conn.execute("SELECT COUNT(*) FROM version_nodes").fetchone()[0] <= nodes + 3 * 3
+    writer.close()
+
+    reader = SQLiteThemeStore(db_path)
+    previous, latest = reader.get_version(theme.id, 3), reader.get_version(theme.id, 4)
+    assert latest.components == theme.components
+    assert previous.components["button"]["primary"]["background"] == "#222"
+    assert latest.components["card"] is previous.components["card"]
+    assert latest.components["button"]["danger"] is previous.components["button"]["danger"]
+    # Trimmed versions' nodes are swept: two versions reach five distinct objects
+    assert reader._conn.execute("SELECT COUNT(*) FROM version_nodes").fetchone()[0] == 5 + 3
+    reader.close()
+
+def test_versions_are_shared_by_workers_and_kept_across_restarts(tmp_path):
+    db_path = str(tmp_path / "themes.db")
+
+    async def scenario():
+        worker_a = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_b = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_a.store.put(worker_a.store.get("default").copy(update={"id": "shared", "is_active": False}))
+        for worker, color in ((worker_a, "#111111"), (worker_b, "#222222")):
+            worker.sync_shared_state()
+            etag = (await worker.get_theme_response("shared")).etag
+            patch = [{"op": "replace", "path": "/app/background", "value": color}]
+            await worker.patch_theme("shared", [PatchOperation(**operation) for operation in patch], etag)
+        for worker in (worker_a, worker_b):
+            versions = await worker.get_theme_versions("shared")
+            assert [(version["version"], version["operation"]) for version in versions] == [
+                (1, "initial"), (2, "patch"), (3, "patch")
+            ]
+        assert (await worker_a.get_theme_version("shared", 3)).components["app"]["background"] == "#222222"
+        await worker_a.close()
+        await worker_b.close()
+
+        restarted = ThemeService(store=SQLiteThemeStore(db_path))
+        assert len(await restarted.get_theme_versions("shared")) == 3
+        await restarted.rollback_theme("shared", 2)
+        assert restarted.store.get("shared").components["app"]["background"] == "#111111"
+        await restarted.close()
+
+    asyncio.run(scenario())
+
+def test_versions_diff_and_rollback():
+    with TestClient(app) as client:
+        theme_service = get_theme_service()
+        default_theme = theme_service.store.get("default")
+        theme_service.store.put(default_theme.copy(update={"id": "versions-test", "is_active": False}))
+        try:
+            for color in ("#111111", "#222222"):
+                etag = client.get("/api/themes/versions-test").headers["etag"]
+                patch = [{"op": "replace", "path": "/app/background", "value": color}]
+                assert client.patch("/api/themes/versions-test", json=patch, headers={"If-Match": etag}).status_code == 200
+
+            versions = client.get("/api/themes/versions-test/versions").json()
+            assert [(version["version"], version["operation"]) for version in versions] == [
+                (1, "initial"), (2, "patch"), (3, "patch")
+            ]
+            diff = client.get("/api/themes/versions-test/versions/diff?from=1").json()
+            assert diff == {
+                "from": 1, "to": 3,
+                "changes": [{"op": "replace", "path": "/components/app/background", "value": "#222222"}]
+            }
+            assert client.get("/api/themes/versions-test/versions/2").json()["components"]["app"]["background"] == "#111111"
+
+            response = client.post("/api/themes/versions-test/versions/1/rollback")
+            assert response.status_code == 200
+            assert response.json()["components"]["app"]["background"] == "#0a0a0a"
+            theme = theme_service.store.get("versions-test")
+            # The restored components are the first version's, not a copy
+            assert theme.components is theme_service.versions.get(theme, 1).components
+            assert theme_service.versions.latest(theme).summary()["operation"] == "rollback"
+            assert theme_service.versions.latest(theme).based_on == 1
+            assert client.get("/api/themes/versions-test/versions/diff?from=1&to=4").json()["changes"] == []
+
+            assert client.get("/api/themes/versions-test/versions/99").status_code == 404
+            assert client.post("/api/themes/default/versions/1/rollback").status_code == 400
+        finally:
+            client.delete("/api/themes/versions-test")
+        assert theme_service.store.version_summaries("versions-test") == []
+
+def test_assets_of_versions_recorded_by_other_workers_are_kept(tmp_path):
+    db_path = str(tmp_path / "themes.db")
+    digests = {color: color * 64 for color in "abc"}
+
+    async def scenario():
+        worker_a = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_b = ThemeService(store=SQLiteThemeStore(db_path))
+        worker_a.store.put(worker_a.store.get("default").copy(update={"id": "retained", "is_active": False}))
+        for worker, color in ((worker_a, "a"), (worker_b, "b"), (worker_a, "c")):
+            worker.sync_shared_state()
+            etag = (await worker.get_theme_response("retained")).etag
+            logo = f"/assets/{color * 2}/{digests[color]}.webp"
+            patch = PatchOperation(op="add", path="/app/backgroundImage", value=logo)
+            await worker.patch_theme("retained", [patch], etag)
+
+        # Worker A's last commit keeps the asset of the version worker B recorded
+        assert set(worker_a.asset_processor.index.theme_assets("retained")) == set(digests.values())
+        await worker_b.delete_theme("retained")
+        assert worker_a.asset_processor.index.theme_assets("retained") == []
+        await worker_a.close()
+        await worker_b.close()
+
+    asyncio.run(scenario())